@@ -1,3 +1,16 @@
+import collections
+import contextlib
+import json
+import fnmatch
+import numbers
+import random
+import re
+import shlex
+import sys
+import time
+import traceback
+import weakref
+
 import hou
 
 #
@@ -32,38 +45,62 @@ def currentTake():
     '''
         Return the current take.
     '''
-    currentName = hou.expandString('$ACTIVETAKE')
+    currentName = _active_take.get()
     if currentName == "Main":
         print("Current take is Main take")
         return None
     else:
         return _readScript(currentName)
     
-def ls(name_only=False, pattern="", pattern_ignore_case=False):
+def ls(name_only=False, pattern="", pattern_ignore_case=False, lazy=False):
     '''
         Return the list of takes in the scene.
         Return a list of Take object or a list of string if name_only is set to True.
         A Houdini-style pattern can be set with pattern.
+        lazy: (bool) If set to True, return a generator of Take objects whose members
+                     are only read from the scene when they are first accessed.
     '''
 
     if name_only:
         return  _listTakeNames()
 
-    out_list = []
-    for take in _listTakeNames():
-        if take == "Main":
-            continue
-        
-        if pattern:
-            
-            m = hou.patternMatch(pattern, take, pattern_ignore_case)
-            if m == 1:
-                out_list.append(_readScript(take, make_current=False))
+    take_names = [take for take in _listTakeNames() if take != "Main"]
 
-        else:
-            out_list.append(_readScript(take, make_current=False))
-        
-    return out_list
+    if pattern:
+        take_names = _matcher(pattern, pattern_ignore_case).filter(take_names)
+
+    if lazy:
+        return (_takeProxy(take) for take in take_names)
+
+    return _readScripts(take_names)
+
+def readAll(root=None):
+    '''
+        Return the list of all the takes of the scene as Take objects, the takes'
+        data are read with as few hscript calls as possible.
+        root: (Take or str) If set, only this take and its children are read.
+    '''
+
+    if root is None:
+        take_names = [n for n in _listTakeNames() if n != "Main"]
+
+    else:
+        if isinstance(root, Take):
+            root = root.name
+
+        if not _take_index.find(root):
+            raise TakeError(root + " not found in take list.")
+
+        take_names = [n for n in _take_index.subtree(root) if n != "Main"]
+
+    return _readScripts(take_names)
+
+def snapshot(root=None):
+    '''
+        Same as readAll() but return a dictionnary {take name: Take}.
+    '''
+
+    return dict((take.name, take) for take in readAll(root))
 
 def setAutoMode(toggle=True):
     '''
@@ -74,7 +111,7 @@ def setAutoMode(toggle=True):
     else:
         toggle = "off"
         
-    result = hou.hscript("takeautomode " + toggle)
+    result = _hscript("takeautomode " + toggle)
     if result[1]:
         raise TakeError(result[1])
 
@@ -91,29 +128,53 @@ def setTake(take):
     else:
         take = str(take)
 
-    result = hou.hscript("takeset " + take)
-    
-    if result[1]:
-        raise TakeSetError("Take '{0}' not found.".format(take))
-    
-    else:
-        return True
-    
+    _active_take.set(take, TakeSetError, "Take '{0}' not found.".format(take))
+    return True
+
 def returnToMainTake():
     '''
         Set Main take as current take.
     '''
-    result = hou.hscript("takeset Main")
-    if result[1]:
-        raise TakeSetError(result[1])
+    _active_take.set("Main")
 
     return True
 
+@contextlib.contextmanager
+def activeTake(take):
+    '''
+        Context manager making the given take ( Take object or take name ) the
+        current take inside the "with" block, the previous current take is
+        restored once at the end of the block:
+
+            with PyTake2.activeTake(take):
+                take.includeParms(parms)
+                ...
+    '''
+    if isinstance(take, Take):
+        take_name = take.name
+    else:
+        take_name = str(take)
+
+    previous = _active_take.get()
+
+    _active_take.set(take_name, TakeSetError,
+                     "Take '{0}' not found.".format(take_name))
+
+    _active_take.blocks.append(take_name)
+    try:
+        yield take
+
+    finally:
+        _active_take.blocks.pop()
+        if not previous in _take_index:
+            previous = "Main"
+        _active_take.set(previous)
+
 def takeFromName(take_name):
     '''
         Return a Take object from a given take name.
     '''
-    if not take_name in _listTakeNames():
+    if not _take_index.find(take_name):
         raise TakeError(take_name + " not found in take list.")
 
     out_take = _readScript(take_name)
@@ -125,785 +186,3474 @@ def takeFromFile(file_path, parent=""):
         file_path: (str) File to load.
         parent: (str) Name of parent take, if empty, parent take will be current take
         returns a Take object.
+        Can't be called inside a batch() block: the loaded take's name is only known
+        once the file is loaded.
     '''
+    if _transaction is not None:
+        raise TakeError("takeFromFile() can not be called inside a batch() block: " + file_path)
 
-    take_list_before = _listTakeNames()
+    take_list_before = set(_listTakeNames())
 
     if parent:
         parent = "-p " + parent
-    
-    result = hou.hscript("takeload {0} {1}".format(parent, file_path))
+
+    result = _hscript("takeload {0} {1}".format(parent, file_path))
     if result[1]:
         raise TakeError(result[1])
 
-    take_list_after= _listTakeNames()
-    
+    # The loaded take's name is only known by Houdini, the index
+    # has to be read again.
+    _take_index.refresh()
+
     # Find take's name
-    take_name = list(set(take_list_after) - set(take_list_before))[0]
-    out_take = _readScript(take_name)
-    return out_take
+    take_names = [n for n in _listTakeNames() if not n in take_list_before]
+    if not take_names:
+        raise TakeError("No take loaded from file: " + file_path)
 
+    _events.edited(take_names, tree=True)
 
-# Take members container
-class TakeMember(object):
+    out_take = _readScript(take_names[0])
+    return out_take
+
+def syncTakes(takes, target):
     '''
-        Used internally by Take objects to store take's members ( nodes and parameters ).
+        Make the members of several takes match target ( see Take.diff() ).
+        takes: (list) Take objects or take names.
+        target: (Take, str or dict) Take object, take name or spec dictionnary.
+        The takes are read with a single hscript call if needed, then only the
+        differences are sent, in a single batch of commands.
+        Return a dictionnary {take name: TakeDiff}.
     '''
-    __slots__ = ["flags", "parms", "node"]
+    target_members = _targetMembers(target)
+    take_objects = _readMembers(takes)
 
-    def __init__(self, node=None, flags=[], parms=[]):
-        
-        self.node = node
+    diffs = [(take, _diffMembers(take.name, take.take_members, target_members))
+             for take in take_objects]
+    _applyDiffs(diffs)
 
-        if flags is not None and not hasattr(flags, "__iter__"):
-            self.flags = [flags]
-        else:
-            self.flags = []
+    return dict((take.name, diff) for take, diff in diffs)
 
-        self.parms = parms
+def createTakes(specs):
+    '''
+        Create several takes at once and return the list of Take objects.
+        specs is a list of dictionnaries, all keys are optional:
+            name: (str) Name of the take ( "pytake" by default ), incremented if already used.
+            parent: (Take, str or int) Parent take, if empty, parent take will be current take.
+                    A string can be the name of a take given by a previous spec,
+                    an int is the index of a previous spec.
+            nodes: (list) hou.Node or node paths whose parameters are all included.
+            parms: (list) hou.Parm or hou.ParmTuple objects to include.
+            flags: (list) (node, flag) tuples of flags to include, flag being
+                          "render_flag", "display_flag", "bypass_flag" or "r", "d", "b".
+                          A (node, flag, value) tuple also sets the flag in the take.
+            values: (dict or list) {parm: value} or (parm, value) tuples, the parameters
+                                   ( hou.Parm or hou.ParmTuple ) are included and set
+                                   to the given value in the take.
+            set_to_current: (bool) The take is set as current take at the end,
+                                   if several specs set it, the last one is used.
+        Everything is checked and named before anything is sent to Houdini, then all
+        the takes and their members are created by a few batched hscript calls and
+        the current take is switched once at the end.
+    '''
 
-    def __str__(self):
+    default_parent = _active_take.get()
+    if default_parent == "Main":
+        default_parent = ""
 
-        return ("Node: {0}\n"
-                "Flags included {1}\n"
-                "Parms included: {2}".format(self.node, self.flags, self.parms))
+    names = []
+    requested = {}
+    entries = []
+    final_take = None
 
-    def __repr__(self):
+    # Check specs and allocate names
+    for i, spec in enumerate(specs):
 
-        return self.__str__()
+        parent = spec.get("parent", "")
+        if isinstance(parent, Take):
+            parent = parent.getName()
 
+        elif isinstance(parent, int):
+            if not 0 <= parent < i:
+                raise TakeCreationError("Spec {0}: parent index {1} does not "
+                                        "refer to a previous spec.".format(i, parent))
+            parent = names[parent]
 
-# Main Take classe
-class Take(object):
-    '''
-        The Take class, to create a new take instanciate this class.
-        name: (str) Name of the take.
-        parent: (Take) Parent take, if empty, parent take will be current take.
-        set_to_current: (bool) If set to True, the take will be set as current take.
-        include_node: (hou.Node or string) A hou.Node object or a node path to be included in the take.
-                                           It can be a list of hou.Node or string.
-        include_parm: (hou.parm or hou.parmTuple) a parm ( or parm tuple ) object to be included in the take.
-                                                  It can be a list.
-                                            
-        _add_to_scene: (bool) Must be set to True used only internally.
-    '''
-    
-    def __init__(self, name="pytake", parent="", set_to_current=False,
-                 include_node=None, include_parm=None, _add_to_scene=True):
-        
-        if not hasattr(include_parm, "__iter__"):
-            if include_parm is None:
-                include_parm = []
-            else:
-                include_parm = [include_parm]
+        elif parent in requested:
+            parent = requested[parent]
+
+        elif parent and not _take_index.find(parent):
+            raise TakeCreationError("Spec {0}: parent take '{1}' not found.".format(i, parent))
 
-        if not hasattr(include_node, "__iter__"):
-            if include_node is None:
-                include_node = []
-            else:
-                include_node = [include_node]
-            
-        self.set_to_current = set_to_current
-        self.take_members = {}
-        
-        # Construc take's name
-        if _add_to_scene:
-            self.name = _incName(_checkName(name))
-        else:
-            self.name = _checkName(name)
-            
-        # Construct parent string
         if not parent:
-            if hou.expandString('$ACTIVETAKE') != "Main":
-                parent = hou.expandString('$ACTIVETAKE')
-        else:
-            if isinstance(parent, Take):
-                parent = parent.getName()
+            parent = default_parent
 
-        if parent:
-            self._parent = "-p " + parent
-            self.parent = parent
-        else:
-            self._parent = ""
-            self.parent = parent
+        name = _checkName(spec.get("name", "pytake"))
+        allocated = _incName(name)
+        requested.setdefault(name, allocated)
+        name = allocated
+        names.append(name)
 
-            
-        # Create Take and add it to the list of takes
-        if _add_to_scene:
-            self._createTake()
+        nodes = spec.get("nodes", [])
+        if isinstance(nodes, str) or not hasattr(nodes, "__iter__"):
+            nodes = [nodes]
+        nodes = _convertNode(nodes)
 
-        # if node or parms included add it
-        if include_parm:
-            self.includeParms(include_parm)
+        parms = spec.get("parms", [])
+        if not hasattr(parms, "__iter__"):
+            parms = [parms]
 
-        if include_node:
-            for n in include_node:
-                self.includeParmsFromNode(n)
-            
-        # set current
-        if _add_to_scene:
-            if self.set_to_current:
-                hou.hscript("takeset " + self.name)
-            else:
-                hou.hscript("takeset Main")
+        flags = []
+        for flag_spec in spec.get("flags", []):
+            node, flag = flag_spec[:2]
+            flag_value = flag_spec[2] if len(flag_spec) > 2 else None
 
-    def __str__(self):
-        
-        out = "PyTake '"
-        out += self.name + "'\n"
-        out += "Members:\n"
-        for k, v in self.take_members.iteritems():
-            out += "  -{0}:\n {1}\n".format(k, str(v))
-        
-        return out
-    
-    def __repr__(self):
+            node = _convertNode(node)
+            letter = _FLAG_LETTERS.get(flag, flag)
+            _checkFlag(node, letter)
+            flags.append((node, letter, flag_value))
 
-        return self.__str__()
+        if spec.get("set_to_current"):
+            final_take = name
 
-    #Create the take and add it to the scene if auto_set
-    def _createTake(self):
-        
-        if self.name in _listTakeNames():
-            raise TakeCreationError("Can not add take '{0}', already found in take list.".format(self.name))
+        values = _parmValues(spec.get("values", []))
 
-        
-        result = hou.hscript("takeadd {0} {1}".format(self._parent, self.name))
-        
-        if not result[1]:
-            return True
-        
-        else:
-            raise TakeCreationError("Can not create take named: " + self.name)
-    
-    # Include a flag (Display / Render ) in the current take.
-    def _includeExcludeFlag(self, flag, node, includeFlag, set_flag, flag_value):
-        
-        # Check if node_path is correct
-        node = self._convertNode(node)
-        node_path = node.path()
-        
-        # Check if the node has correct flag
-        if flag == "-d":
-            try:
-                node.isDisplayFlagSet()
-                self._updateSavedData(node, parm=None, flag="display_flag")
-            except AttributeError:
-                raise InvalidFlagType(("Node: {0} does not have"
-                                       " display flag.".format(node_path)))
+        entries.append((name, parent, nodes, parms, flags, values))
 
-        elif flag == "-b":
-            try:
-                node.isBypassed()
-                self._updateSavedData(node, parm=None, flag="bypass_flag")
-            except AttributeError:
-                raise InvalidFlagType("Node: {0} does not have bypass flag.".format(node_path))
+    if final_take is None:
+        final_take = "Main"
+        if _active_take.blocks:
+            final_take = _active_take.blocks[-1]
 
-        else:
-            try:
-                node.isRenderFlagSet()
-                self._updateSavedData(node, parm=None, flag="render_flag")
-            except AttributeError:
-                raise InvalidFlagType("Node: {0} does not have render flag.".format(node_path))
-        
-        # Check include / excluse flag
-        includeFlag = "-u"
-        if includeFlag:
-            includeFlag = ""
-        
+    # Send all the commands
+    buffer = _CommandBuffer()
+    for name, parent, nodes, parms, flags, values in entries:
 
-        self.setCurrent()
+        # The parent is always given, takeadd would use the current
+        # take, which is switched by the previous specs.
+        parent = "-p " + (parent or "Main")
 
-        result = hou.hscript("takeinclude {0} {1} {2}".format(includeFlag, flag, node_path))
-        if result[1]:
-            raise TakeError(result[1])
-        
-        # Set flag if set_flag and return True
-        if flag == "-d" and set_flag and includeFlag != "-u":
-            node.setDisplayFlag(flag_value)
-            return True
-            
-        if flag == "-r" and set_flag and includeFlag != "-u":
-            node.setRenderFlag(flag_value)
-            return True
-            
-        if flag == "-b" and set_flag and includeFlag != "-u":
-            node.bypass(flag_value)
-            return True
+        buffer.add("takeadd {0} {1}".format(parent, name), TakeCreationError,
+                   "Can not create take named: " + name, idempotent=False)
 
-    def _updateSavedData(self, node, parm=None, flag=None, include=True):
+        if not nodes and not parms and not flags and not values:
+            continue
 
-        if parm is None and flag is None:
-            return
+        buffer.add("takeset " + name, TakeSetError)
+        for node in nodes:
+            buffer.add("takeinclude {0} *".format(node.path()), TakeSetError)
+        for parm in parms:
+            buffer.add("takeinclude {0} {1}".format(parm.node().path(), parm.name()),
+                       TakeSetError)
+        for node, letter, flag_value in flags:
+            buffer.add("takeinclude -{0} {1}".format(letter, node.path()), TakeSetError)
+            if flag_value is not None:
+                buffer.add("opset -{0} {1} {2}".format(letter, "on" if flag_value else "off",
+                                                       node.path()))
+        for parm, value in values:
+            buffer.add("takeinclude {0} {1}".format(parm.node().path(), parm.name()),
+                       TakeSetError)
+            buffer.add(_setParmCommand(parm, value))
+
+    buffer.add("takeset " + final_take, TakeSetError)
+
+    try:
+        buffer.flush()
+    except TakeError:
+        # Some takes may have been created
+        _take_index.invalidate()
+        _active_take.invalidate()
+        raise
+
+    _active_take.name = final_take
+
+    # Update the index and build the Take objects
+    out_takes = []
+    for name, parent, nodes, parms, flags, values in entries:
+
+        _take_index.add(name, parent or "Main")
+        _events.edited([name], tree=True)
+
+        out_take = Take(name, parent=parent, _add_to_scene=False)
+        _live_takes[name] = out_take
+        out_take._updateNodesParms([(node, None) for node in nodes])
+        out_take._updateNodesParms(_groupByNode(parms))
+        for node, letter, flag_value in flags:
+            out_take._updateSavedData(node, flag=_FLAG_LABELS[letter])
+            if flag_value is not None:
+                out_take.take_members[node.path()][_FLAG_LABELS[letter]] = bool(flag_value)
+        out_take._updateSavedValues(values)
+
+        out_takes.append(out_take)
+
+    return out_takes
+
+def copyTakes(take, count=1, name="", parent=None, recursive=False, set_to_current=False):
+    '''
+        Copy a take count times and return the list of the copies as Take objects.
+        take: (Take or str) Take to copy.
+        name: (str) Name of the copies ( incremented if already used ), take's name
+                    followed by "_copy" by default.
+        parent: (Take or str) Parent of the copies, take's parent by default.
+        recursive: (bool) Copy the children of the take as well.
+        set_to_current: (bool) The last copy is set as current take at the end.
+        Each copy is created with "takeadd" then filled with "takemerge" ( parameters,
+        flags and their values ), all the copies are created by a few batched hscript
+        calls and the current take is switched once at the end.
+    '''
+    if isinstance(take, Take):
+        take_object = take
+        take = take.getName()
+    else:
+        take_object = None
+
+    if not _take_index.find(take) or take == "Main":
+        raise TakeError("Can not find take: " + take)
+
+    if isinstance(parent, Take):
+        parent = parent.getName()
+    if not parent:
+        parent = _take_index.parentOf(take)
+    elif not _take_index.find(parent):
+        raise TakeError("Take {0} not found in take list.".format(parent))
+
+    sources = [take]
+    if recursive:
+        sources = _take_index.subtree(take)
+
+    name = _checkName(name or take + "_copy")
+
+    # [(source, copy name, copy parent)], parents before their children
+    entries = []
+    roots = []
+    for _ in range(count):
+
+        names = {}
+        for source in sources:
+            if source == take:
+                copy_name = _incName(name)
+                copy_parent = parent
+                roots.append(copy_name)
+            else:
+                copy_name = _incName(source)
+                copy_parent = names[_take_index.parentOf(source)]
 
-        node = self._convertNode(node)
-        node_path = node.path()
+            names[source] = copy_name
+            entries.append((source, copy_name, copy_parent))
 
-        member = self.take_members.get(node_path)
+    final_take = roots[-1] if set_to_current and roots else "Main"
+    if not set_to_current and _active_take.blocks:
+        final_take = _active_take.blocks[-1]
 
-        if not member:
-            
-            if parm is None:
-                _parm = []
-            else:
-                _parm = [parm]
+    buffer = _CommandBuffer()
+    for source, copy_name, copy_parent in entries:
+        buffer.add("takeadd -p {0} {1}".format(copy_parent, copy_name), TakeCreationError,
+                   "Can not create take named: " + copy_name, idempotent=False)
+        buffer.add("takemerge {0} {1}".format(copy_name, source), TakeError, idempotent=False)
 
-            member = TakeMember(node=node,
-                           parms=_parm,
-                           flags=flag)
+    buffer.add("takeset " + final_take, TakeSetError)
 
-            if include:
-                self.take_members[node_path] = member
-        
-        if include:
+    try:
+        buffer.flush()
+    except:
+        _take_index.invalidate()
+        _active_take.invalidate()
+        raise
 
-            if flag is not None:
-                if not flag in member.flags:
-                    member.flags.append(flag)
+    _active_take.name = final_take
 
-            if parm:
-                pn = parm.name()
-                if not pn in member.parms:
-                    member.parms.append(pn)
-        else:
-            if flag is not None:
-                if flag in member.flags:
-                    member.flags.pop(member.flags.index(flag))
+    # Members of the copied take, if already read
+    members = None
+    if take_object is not None and take_object._take_members is not None:
+        members = take_object._take_members
 
-            if parm:
-                pn = parm.name()
-                if pn in member.parms:
-                    member.parms.pop(member.parms.index(pn))
+    out_takes = []
+    for source, copy_name, copy_parent in entries:
 
-        # flush empty member
-        if len(member.flags) == 0 and len(member.parms) == 0:
-            self.take_members.pop(node_path)
+        _take_index.add(copy_name, copy_parent)
+        _events.edited([copy_name], tree=True)
 
-    def _convertNode(self, node):
+        if not copy_name in roots:
+            continue
 
-        if isinstance(node, str):
-            node = hou.node(node)
-            if node is None:
-                raise InvalidNode(node)
-            return node
+        out_take = _takeProxy(copy_name, new=True)
+        if members is not None:
+            out_take.take_members = dict((node_path, member.clone())
+                                         for node_path, member in members.items())
+        out_takes.append(out_take)
 
-        if hasattr(node, "__iter__"):
-            
-            out_node = []
-            for n in node:
+    return out_takes
+
+def exportTakes(file_path, takes=None, values=False):
+    '''
+        Save several takes in a single file, which can be loaded with importTakes().
+        file_path: (str) File to write.
+        takes: (list) Take objects or take names, if None all the takes of the scene are saved.
+        values: (bool) If set to True, the values of the parameters and flags are saved too.
+        The file holds a header line and one line per take ( JSON ), parents are
+        saved before their children, takes are read and written by chunks.
+        Return the number of takes saved.
+    '''
+    if takes is None:
+        names = [n for n in _listTakeNames() if n != "Main"]
+    else:
+        names = [t.getName() if isinstance(t, Take) else t for t in takes]
+        for name in names:
+            if not _take_index.find(name):
+                raise TakeError("Can not find take: " + name)
 
-                if isinstance(n, str):
-                    _n = hou.node(n)
-                    if _n is None:
-                        raise InvalidNode(n)
-                    out_node.append(_n)
+        # Take list order, so parents come first
+        order = dict((n, i) for i, n in enumerate(_listTakeNames()))
+        names.sort(key=lambda n: order[n])
 
-                elif isinstance(n, hou.Node):
-                    out_node.append(n)
+    exported = set(names)
 
-            return out_node
+    with open(file_path, "w") as f:
 
-        if not isinstance(node, hou.Node):
-            raise InvalidNode(str(node))
+        header = {"format": _EXPORT_FORMAT, "version": _EXPORT_VERSION,
+                  "takes": len(names), "values": bool(values)}
+        f.write(json.dumps(header) + "\n")
 
-        return node
+        for i in range(0, len(names), _EXPORT_CHUNK_SIZE):
 
-    # Include flags
-    def includeRenderFlag(self, node, include=True, set_flag=False, flag_value=True):
-        '''
-            Include render flag of the node_path in the take.
-            node: (str) path of the node or instance of hou.Node()
-            include: (bool) Flag Include / Exclude switch.
-            set_flag: (bool) Set the node's render flag.
-            flag_value: (bool) Value of the flag to be set.
+            for take in _readMembers(names[i:i + _EXPORT_CHUNK_SIZE]):
 
-            Raise a InvalidFlagType if the given node doesn't have a render flag
-            
-        '''
-        self._includeExcludeFlag("-r", node, include, set_flag, flag_value)
-        
-    def includeDisplayFlag(self, node, include=True, set_flag=False, flag_value=True):
-        '''
-            Include display flag of the node_path in the take.
-            node: (str) path of the node or instance of hou.Node()
-            toggle: (bool) Flag Include / Exclude switch.
-            set_flag: (bool) Set the node's render flag.
-            flag_value: (bool) Value of the flag to be set.
+                data = take.toDict(values=values)
 
-            Raise a InvalidFlagType if the given node doesn't have a display flag
-        '''
-        self._includeExcludeFlag("-d", node, include, set_flag, flag_value)
-        
-    def includeBypassFlag(self, node, include=True, set_flag=False, flag_value=True):
-        '''
-            Include bypass flag of the node_path in the take.
-            node: (str) path of the node or instance of hou.Node()
-            toggle: (bool) Flag Include / Exclude switch.
-            set_flag: (bool) Set the node's render flag.
-            flag_value: (bool) Value of the flag to be set.
+                # Parents not saved are replaced by the import's parent
+                if not data["parent"] in exported:
+                    data["parent"] = ""
 
-            Raise a InvalidFlagType if the given node doesn't have a bypass flag
-        '''
-        self._includeExcludeFlag("-b", node, include, set_flag, flag_value)
-        
-    # Include parameters
-    def includeParms(self, parms, include=True):
-        ''' 
-            Include given hou.Parm or hou.ParmTuple object(s) in the take.
-        '''
+                f.write(json.dumps(data) + "\n")
 
-        if not hasattr(parms, "__iter__"):
-            parms = [parms]
+    return len(names)
 
-        self.setCurrent()
+def importTakes(file_path, parent="", skip_missing=False, set_to_current=False):
+    '''
+        Create the takes saved with exportTakes() and return them as a list of Take objects.
+        file_path: (str) File to load.
+        parent: (Take or str) Parent of the top level takes of the file, if empty,
+                              parent take will be current take.
+        skip_missing: (bool) If set to True, the nodes and parameters not found in the
+                             scene are skipped, else an InvalidNode / TakeError is raised.
+        set_to_current: (bool) If set to True, the last take is set as current take.
+        Takes whose name is already used are renamed ( incremented ), all the takes
+        are created by createTakes().
+    '''
+    specs = []
+    spec_index = {}
 
-        include_flag = ""
-        if not include:
-            include_flag = "-u"
+    with open(file_path) as f:
 
-        for parm in parms:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = {}
 
-            node = parm.node()
-            node_path = node.path()
-            parm_string = parm.name()
-            
-            result = hou.hscript("takeinclude {0} {1} {2}".format(include_flag,
-                                                                  node_path,
-                                                                  parm_string))
-            if result[1]:
-                raise TakeSetError(result[1])
+        if header.get("format") != _EXPORT_FORMAT:
+            raise TakeError("Not a PyTake2 takes file: " + file_path)
 
-            self._updateSavedData(node, parm)
+        if header.get("version", 0) > _EXPORT_VERSION:
+            raise TakeError("Takes file version {0} is not supported: {1}".format(
+                            header.get("version"), file_path))
 
-    def includeParmsFromNode(self, node, parms_name_filter=None, include=True):
-        '''
-            Include parameters from a given hou.Node or node path object.
-            Parameters can be filtered with an houdini-style pattern matching "parms_name_filter"
-            which can be either a single string or a list of string.
-        '''
+        for line in f:
 
-        if not hasattr(parms_name_filter, "__iter__"):
-            if parms_name_filter is None:
-                parms_name_filter = []
+            if not line.strip():
+                continue
+
+            data = json.loads(line)
+
+            spec = {"name": data["name"], "parms": [], "flags": [], "values": []}
+            if data["parent"] in spec_index:
+                spec["parent"] = spec_index[data["parent"]]
             else:
-                parms_name_filter = [parms_name_filter]
+                spec["parent"] = parent
 
-        # Check node
-        node = self._convertNode(node)
-        node_path = node.path()
-        
-        # Include flag
-        if include:
-            include_flag = ""
-        else:
-            include_flag = "-u"
-        
-        self.setCurrent()
+            for node_path, member in data["members"].items():
 
-        # whole node ( no filer )
-        if not parms_name_filter:
-            result = hou.hscript("takeinclude {0} {1} *".format(include_flag,
-                                                                node_path))
-            if result[1]:
-                raise TakeSetError(result[1])
+                node = hou.node(node_path)
+                if node is None:
+                    if skip_missing:
+                        continue
+                    raise InvalidNode(node_path)
 
-            for parm in node.parms():
-                self._updateSavedData(node, parm)
+                member_values = member.get("values", {})
 
-        # with filter name
-        else:
-            parms = []
-            for parm in node.parms():
-                for f in parms_name_filter:
-                    if hou.patternMatch(f, parm.name()) == 1:
-                        parms.append(parm)
-                        break
-            
-            self.includeParms(parms)
-    
-    def includeParmsFromTake(self, take, force=False):
-        '''
-            Include all parms from a given take to this take.
-            The take parameter can be either a Take object or a take name.
-            force: (bool) Force a source take has the same included parameter as the destination,
-                          the source will overwrite the destination
-        '''
+                for parm_name in member["parms"]:
+                    parm = node.parm(parm_name)
+                    if parm is None:
+                        if skip_missing:
+                            continue
+                        raise TakeError("Parameter {0} not found on node {1}.".format(parm_name,
+                                                                                     node_path))
 
-        if isinstance(take, Take):
-            name = take.getName()
-        else:
-            name = take
+                    if parm_name in member_values:
+                        spec["values"].append((parm, member_values[parm_name]))
+                    else:
+                        spec["parms"].append(parm)
 
-        if name not in _listTakeNames():
-            raise TakeError("Can not find take: " + name)
-        
-        if force:
-            force = "-f"
-        else:
-            force = ""
-        
-        result = hou.hscript("takemerge {0} {1} {2}".format(force, self.name, name))
-        if result[1]:
-            raise TakeError(result[1])
-        
-        tmp = dict(self.take_members.items() + take.getTakeMembers().items())
-        self.take_members = tmp
-        
-        return True
-    
-    def getTakeMembers(self):
-        '''
-            return a dictionnary of TakeMembers objects included in the take.
-        '''
-        
-        if self.name not in _listTakeNames():
-            raise TakeError("Can not find take: " + self.name)
-        
-        return self.take_members
-    
-    def getTakeMembersStr(self):
-        '''
-            return a string version of take's members.
-        '''
-        if self.name not in _listTakeNames():
-            raise TakeError("Can not find take: " + self.name)
-        
-        out = "Nodes and parms included in take: "+ self.name + "\n\n"
+                for letter in member["flags"]:
+                    if skip_missing and not hasattr(node, _FLAG_METHODS[letter]):
+                        continue
+                    spec["flags"].append((node, letter,
+                                          member_values.get(_FLAG_LABELS[letter])))
+
+            spec_index[data["name"]] = len(specs)
+            specs.append(spec)
+
+    if set_to_current and specs:
+        specs[-1]["set_to_current"] = True
+
+    return createTakes(specs)
+
+def refresh():
+    '''
+        Read the take list of the scene again.
+        PyTake2 keeps an index of the take names which is updated by every
+        PyTake2 operation, call refresh() when takes have been edited
+        outside of PyTake2 ( take list UI, hscript ... ).
+        The current take is read again as well, and the members of the Take
+        objects returned by PyTake2 are read again on next access.
+    '''
+    _take_index.refresh()
+    _active_take.invalidate()
+    _invalidateTakes()
+
+def takeIndexStats():
+    '''
+        Return a dictionnary of the take names index counters:
+        hits: lookups served by the index.
+        misses: lookups which needed a "takels" call.
+        refreshes: total number of "takels" calls.
+        invalidations: number of times the index was discarded.
+    '''
+    return {"hits": _take_index.hits,
+            "misses": _take_index.misses,
+            "refreshes": _take_index.refreshes,
+            "invalidations": _take_index.invalidations}
+
+def setProfiling(toggle=True):
+    '''
+        Turn the hscript profiler on / off, returns the HscriptProfiler
+        ( None when turned off ).
+        When off, the only cost left is one test per hscript call.
+    '''
+    global _profiler
+
+    if not toggle:
+        _profiler = None
+
+    elif _profiler is None:
+        _profiler = HscriptProfiler()
+
+    return _profiler
+
+def getProfiler():
+    '''
+        Return the active HscriptProfiler, None if profiling is off.
+    '''
+    return _profiler
+
+@contextlib.contextmanager
+def profile():
+    '''
+        Context manager profiling the hscript calls sent inside the "with" block,
+        the previous profiler ( if any ) is restored at the end of the block:
+
+            with PyTake2.profile() as profiler:
+                PyTake2.readAll()
+            print(profiler.report())
+    '''
+    global _profiler
+
+    previous = _profiler
+    profiler = HscriptProfiler()
+
+    _profiler = profiler
+    try:
+        yield profiler
+
+    finally:
+        _profiler = previous
+
+@contextlib.contextmanager
+def batch(label="PyTake2 batch"):
+    '''
+        Context manager recording the take edits made inside the "with" block
+        ( Take creation, includeParms(), includeParmsFromNode(), include*Flag(),
+        setParent(), remove() ... ), they are sent to Houdini at the end of the
+        block as a single batch of commands, in a single undo group:
+
+            with PyTake2.batch():
+                take = PyTake2.Take("shot")
+                take.includeParmsFromNode(nodes)
+                take.includeDisplayFlag(node)
+
+        If an error is raised inside the block, nothing is sent.
+        If a command fails when the batch is sent, the whole batch is undone
+        and the error is raised.
+        Take objects and the take index are updated inside the block as if the
+        commands were sent, but reading the scene ( ls(), readAll(), values ... )
+        inside the block returns the takes as they were before it.
+        A batch() block inside another one is part of the outer batch.
+    '''
+    global _transaction
+
+    if _transaction is not None:
+        yield
+        return
+
+    # The current take must be known, the scene can't be read in the block
+    _active_take.get()
+
+    transaction = _Transaction(label)
+    _transaction = transaction
+    try:
+        yield
+
+    except:
+        _transaction = None
+        refresh()
+        raise
+
+    _transaction = None
+    transaction.commit()
+
+
+# Take members container
+class TakeMember(object):
+    '''
+        A node included in a take: its included parameters and flags.
+        Parameter names are interned and kept in an ordered set, flags are
+        stored as a bitmask, so membership checks are O(1) and a member stays
+        small even with many included parameters.
+        A TakeMember can be read as a dictionnary {parm name or flag label: value},
+        values are only evaluated when they are requested, with the member's take
+        ( take: name of the take holding the member ) set as current take, and each
+        parm tuple is evaluated once.
+    '''
+    __slots__ = ["node", "take", "_parms", "_flag_bits", "_values"]
+
+    def __init__(self, node=None, flags=[], parms=[], take=None):
         
-        for key in self.take_members.keys():
-            out += key + ":\n"
-            if self.take_members[key]:
-                for i in self.take_members[key].keys():
-                    out += " "*4 + str(i) + " : " + str(self.take_members[key][i]) + "\n"
-                out += "\n"
-                
-        return out
-    
-    def isCurrent(self):
-        ''' 
-            Returns True if the take is the current take, False otherwise.
+        self.node = node
+        self.take = take
+        self._parms = _OrderedSet()
+        self._flag_bits = 0
+        self._values = None
+
+        if flags is not None and not hasattr(flags, "__iter__"):
+            flags = [flags]
+
+        for flag in flags or []:
+            self.addFlag(flag)
+
+        for parm in parms or []:
+            self.addParm(parm)
+
+    # Members
+    @property
+    def flags(self):
         '''
-        if self.name == hou.expandString("$ACTIVETAKE"):
-            return True
-        return False
-    
-    def setCurrent(self):
-        ''' 
-            Set take as current take.
+            List of the included flags labels ( "render_flag", "display_flag", "bypass_flag" ).
         '''
-        result = hou.hscript("takeset " + self.name)
-        
-        if result[1]:
-            raise TakeSetError("Take '{0}' not found.".format(self.name))
+        return [_FLAG_LABELS[f] for f in _FLAG_ORDER if self._flag_bits & _FLAG_BITS[f]]
 
-        return True
-    
-    def setName(self, name):
+    @property
+    def parms(self):
         '''
-            Rename the current take.
+            List of the included parameters names.
         '''
-        if name == self.name:
-            return False
-        
-        name = _incName(_checkName(name))
-        
-        result = hou.hscript("takename " + self.name + " " + name)
-        if result[1]:
-            raise TakeError(result[1])
-        
-        self.name = name
-        return name
-       
-    def setParent(self, parent):
+        return list(self._parms)
+
+    def hasParm(self, parm):
+
+        if not isinstance(parm, str):
+            parm = parm.name()
+        return parm in self._parms
+
+    def addParm(self, parm):
         '''
-            Set the current take's parent, it can be either a Take object, a take name
-            or None. 
-            If None, the take's parent will be set to Main take.
+            Add a parameter, parm can be a name, a hou.Parm or a hou.ParmTuple
+            ( all its components are added ).
         '''
+        if isinstance(parm, str):
+            self._parms[_intern(parm)] = None
 
-        if parent is None:
-            result = hou.hscript("takemove {0} Main".format(self.getName()))
-            if result[1]:
-                raise TakeError(result[1])
-            self.parent = "Main"
-            self._parent = "-p Main"
+        elif isinstance(parm, hou.ParmTuple):
+            for p in parm:
+                self._parms[_intern(p.name())] = None
 
         else:
+            self._parms[_intern(parm.name())] = None
 
-            if isinstance(parent, Take):
-                parent = parent.getName()
-
-            if not parent in _listTakeNames():
-                raise TakeError("Take {0} not found in take list.".format(parent))
+    def removeParm(self, parm):
 
-            result = hou.hscript("takemove {0} {1}".format(self.getName(),
-                                                           parent))
-            if result[1]:
-                raise TakeError(result[1])
+        if isinstance(parm, str):
+            names = [parm]
+        elif isinstance(parm, hou.ParmTuple):
+            names = [p.name() for p in parm]
+        else:
+            names = [parm.name()]
 
-            self.parent = parent
-            self._parent = "-p " + parent
+        for name in names:
+            self._parms.pop(name, None)
+            if self._values:
+                self._values.pop(name, None)
 
-    def getName(self):
+    def addParms(self, parms):
         '''
-            Return take's name
+            Add many parameters at once ( names, hou.Parm or hou.ParmTuple ).
         '''
-        if self.name not in _listTakeNames():
-            raise TakeError("Can not find take: " + self.name)
-        
-        return self.name
+        self._parms.update([(_intern(name), None) for name in _parmNames(parms)])
 
-    def getParent(self):
+    def removeParms(self, parms=None):
         '''
-            Return the take's parent as Take object, or None.
+            Remove many parameters at once, all the parameters if parms is None.
         '''
-        if not self.parent:
-            return None
+        if parms is None:
+            self._parms.clear()
+            if self._values:
+                for name in list(self._values):
+                    if not name in _FLAG_LETTERS:
+                        del self._values[name]
+            return
 
-        return takeFromName(self.parent)
-    
-    def copy(self, name="", set_current=False):
+        for name in _parmNames(parms):
+            self._parms.pop(name, None)
+            if self._values:
+                self._values.pop(name, None)
+
+    def hasFlag(self, flag):
+
+        return bool(self._flag_bits & _flagBit(flag))
+
+    def addFlag(self, flag):
         '''
-            Return a copy of that take and add it to the list of take.
+            Add a flag, by label ( "display_flag" ) or letter ( "d" ).
         '''
-        if self.name not in _listTakeNames():
-            raise TakeError("Can not find take: " + self.name)
-        
-        if not name:
-            name = self.name + "_copy"
-            
-        out_take = Take(name)
-        for k in self.take_members:
-            
-            p = hou.parm(k)
-            if p is None:
-                p = hou.parmTuple(k)
+        self._flag_bits |= _flagBit(flag)
 
-            if p is None:
-                continue
+    def removeFlag(self, flag):
 
-            out_take.includeParms(k, self.take_members[k])
-        
-        if set_current:
-            setTake(name)
-        else:
-            returnToMainTake()
-        
-        return out_take
+        bit = _flagBit(flag)
+        self._flag_bits &= ~bit
 
-    def remove(self, recursive=False):
+        if self._values:
+            for letter, flag_bit in _FLAG_BITS.items():
+                if flag_bit == bit:
+                    self._values.pop(_FLAG_LABELS[letter], None)
+
+    def update(self, member):
         '''
-            Remove the take from the take list.
-            recursive: (bool) if True, remove all child takes as well.
+            Add the parameters and flags of another TakeMember.
         '''
-        if recursive:
-            recursive = "-R"
-        else:
-            recursive = ""
-        
-        result = hou.hscript("takerm " + recursive + " " + self.name)
-        if result[1]:
-            raise TakeDeleteError(result[1])
-        else:
-            return True
-        
-    def existInScene(self):
+        for name in member._parms:
+            self._parms[name] = None
+        self._flag_bits |= member._flag_bits
+
+    def clone(self):
         '''
-            Return True if take exists in the scene, False if not.
+            Return a new TakeMember with the same parameters and flags, values
+            are not copied.
         '''
-        return self.name in _listTakeNames()
-    
-    def saveToFile(self, file_path, recursive=False):
+        member = TakeMember(node=self.node, take=self.take)
+        member.update(self)
+        return member
+
+    def isEmpty(self):
+
+        return not self._parms and not self._flag_bits
+
+    # Values
+    @property
+    def pending(self):
         '''
-            Save the given take to a external file.
-            file_path: (str) A valid path where to save the file.
-            recursive: (bool) if True, save as well as children take of the node.
+            True if some values have not been evaluated yet.
         '''
-        
-        if not self.name in _listTakeNames():
-            raise TakeError(self.name + " not found in take list.")
-        
-        if recursive:
-            recursive = "-R"
-        else:
-            recursive = ""
-        
-        result = hou.hscript("takesave -o {0} {1} {2}".format(file_path, recursive, self.name) )
-        if result[1]:
-            raise TakeError(result[1])
-        else:
-            return True
-        
-        
-#############
-# Utilities #
-#############
+        return len(self._values or ()) < len(self)
 
-def _incName(name):
-    '''
-        Check if any take with the current given "name"
-        Already exists, if yes, increment the name of the take by an int.
-    ''' 
-       
-    ind = 1
-    digic_len = 0
-    while name in _listTakeNames():
+    def _resolve(self, key):
 
-        digit_part = ""
-        
-        rever_name = list(name)[::-1]
-        
-        for i in rever_name:
-            if not i.isdigit():
-                break
+        # Values are evaluated in the member's take
+        if (self.take is not None and _transaction is None
+                and self.take != _active_take.get()):
+            with activeTake(self.take):
+                self._resolve(key)
+            return
+
+        if self._values is None:
+            self._values = {}
+
+        if key in self._parms:
+            parm = self.node.parm(key)
+            if parm is None:
+                parm_tuple = self.node.parmTuple(key)
             else:
-                digit_part = str(i) + digit_part
-        
-        digic_len = len(digit_part)
-        
-        if digit_part:
-            digit_part = int(digit_part)
-            name = name[0:-digic_len]
-            name += str(digit_part+1)
-        
-        # Incremente only once
-        else:
-            name += str(ind)
-            ind += 1
+                parm_tuple = parm.tuple()
 
-    return name
+            # All the included components of the tuple are set at once
+            if parm_tuple is not None:
+                for p, value in zip(parm_tuple, parm_tuple.eval()):
+                    if p.name() in self._parms:
+                        self._values[p.name()] = value
+
+            if not key in self._values:
+                self._values[key] = parm.eval() if parm is not None else None
 
-def _checkName(name):
-    '''
-        Check if the given name has only legal char.
-        If not, replace illegal char with _
-    '''    
-    out_name = ""
-    legal_chars = "abcdefghijklmnopqrstuvwxyz0123456789_"
-    
-    for c in name:
-        if c.lower() in legal_chars:
-            out_name += c
-            
         else:
-            out_name += "_"
-            
-    return out_name
+            letter = _FLAG_LETTERS[key]
+            self._values[key] = _flagValue(self.node, letter)
 
-def _listTakeNames():
-    '''
-        Return all takes' name of the scene
-    '''
-    
-    return [n.replace(" ", "") for n in hou.hscript("takels")[0].split("\n") if n]
+    def evaluate(self):
+        '''
+            Evaluate all the pending values of the member.
+        '''
+        if not self.pending:
+            return self
 
-def _readScript(take_name, make_current=True):
+        if (self.take is not None and _transaction is None
+                and self.take != _active_take.get()):
+            with activeTake(self.take):
+                return self.evaluate()
+
+        for key in self.keys():
+            if self._values is None or not key in self._values:
+                self._resolve(key)
+
+        return self
+
+    def keys(self):
+
+        return self.parms + self.flags
+
+    def __len__(self):
+
+        return len(self._parms) + bin(self._flag_bits).count("1")
+
+    def __iter__(self):
+
+        return iter(self.keys())
+
+    def __contains__(self, key):
+
+        if key in self._parms:
+            return True
+        return key in _FLAG_LETTERS and self.hasFlag(key)
+
+    def __getitem__(self, key):
+
+        if not key in self:
+            raise KeyError(key)
+
+        if self._values is None or not key in self._values:
+            self._resolve(key)
+
+        return self._values[key]
+
+    def __setitem__(self, key, value):
+
+        if not key in self:
+            raise KeyError(key)
+
+        if self._values is None:
+            self._values = {}
+        self._values[key] = value
+
+    def get(self, key, default=None):
+
+        if key in self:
+            return self[key]
+        return default
+
+    def values(self):
+
+        # One take switch for all the values, not one per key
+        self.evaluate()
+        return [self[k] for k in self.keys()]
+
+    def items(self):
+
+        self.evaluate()
+        return [(k, self[k]) for k in self.keys()]
+
+    def copy(self):
+
+        return dict(self.items())
+
+    def __eq__(self, other):
+
+        if isinstance(other, TakeMember):
+            return (self.node == other.node and self._flag_bits == other._flag_bits
+                    and self.parms == other.parms)
+
+        return self.copy() == other
+
+    def __ne__(self, other):
+
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __str__(self):
+
+        return ("Node: {0}\n"
+                "Flags included {1}\n"
+                "Parms included: {2}".format(self.node, self.flags, self.parms))
+
+    def __repr__(self):
+
+        return self.__str__()
+
+
+# Main Take classe
+class Take(object):
+    '''
+        The Take class, to create a new take instanciate this class.
+        name: (str) Name of the take.
+        parent: (Take) Parent take, if empty, parent take will be current take.
+        set_to_current: (bool) If set to True, the take will be set as current take.
+        include_node: (hou.Node or string) A hou.Node object or a node path to be included in the take.
+                                           It can be a list of hou.Node or string.
+        include_parm: (hou.parm or hou.parmTuple) a parm ( or parm tuple ) object to be included in the take.
+                                                  It can be a list.
+                                            
+        _add_to_scene: (bool) Must be set to True used only internally.
+    '''
+    
+    def __init__(self, name="pytake", parent="", set_to_current=False,
+                 include_node=None, include_parm=None, _add_to_scene=True):
+        
+        if isinstance(include_parm, str) or not hasattr(include_parm, "__iter__"):
+            if include_parm is None:
+                include_parm = []
+            else:
+                include_parm = [include_parm]
+
+        # A node path is a str, which is iterable with Python 3
+        if isinstance(include_node, str) or not hasattr(include_node, "__iter__"):
+            if include_node is None:
+                include_node = []
+            else:
+                include_node = [include_node]
+            
+        self.set_to_current = set_to_current
+        self._take_members = {}
+
+        # Node paths of the members discarded by an invalidation, still watched
+        self._watched_nodes = ()
+
+        # Construc take's name
+        if _add_to_scene:
+            self.name = _incName(_checkName(name))
+        else:
+            self.name = _checkName(name)
+
+        # Construct parent string
+        if not parent:
+            if _add_to_scene and _active_take.get() != "Main":
+                parent = _active_take.get()
+        else:
+            if isinstance(parent, Take):
+                parent = parent.getName()
+
+        if parent:
+            self._parent = "-p " + parent
+            self.parent = parent
+        else:
+            self._parent = ""
+            self.parent = parent
+
+            
+        # Create Take and add it to the list of takes
+        if _add_to_scene:
+            self._createTake()
+
+        # if node or parms included add it
+        if include_parm:
+            self.includeParms(include_parm)
+
+        if include_node:
+            self.includeParmsFromNode(include_node)
+            
+        # set current
+        if _add_to_scene:
+            if self.set_to_current:
+                _active_take.set(self.name)
+            else:
+                _active_take.restore("Main")
+
+    def __str__(self):
+        
+        out = "PyTake '"
+        out += self.name + "'\n"
+        out += "Members:\n"
+        for k, v in self.take_members.items():
+            out += "  -{0}:\n {1}\n".format(k, str(v))
+        
+        return out
+    
+    def __repr__(self):
+
+        return self.__str__()
+
+    @property
+    def take_members(self):
+        '''
+            Dictionnary of the take's members, read from the scene on first access
+            for takes returned by ls(lazy=True).
+        '''
+        if self._take_members is None:
+            self.take_members = _parseScript(_takeScript(self.name))
+
+        return self._take_members
+
+    @take_members.setter
+    def take_members(self, members):
+
+        # The nodes stay watched until the members are read again, so
+        # reading them back doesn't add their callbacks again
+        if members is None and self._take_members is not None:
+            self._watched_nodes = list(self._take_members)
+
+        self._take_members = members
+        if members is not None:
+            for member in members.values():
+                member.take = self.name
+            _events.watch(members)
+
+    #Create the take and add it to the scene if auto_set
+    def _createTake(self):
+        
+        if self.name in _take_index:
+            raise TakeCreationError("Can not add take '{0}', already found in take list.".format(self.name))
+
+        
+        result = _hscript("takeadd {0} {1}".format(self._parent, self.name))
+
+        # The name may be used by a take added outside of PyTake2,
+        # the index is read again and a new name is given
+        if result[1] and _take_index.find(self.name):
+            self.name = _incName(self.name)
+            result = _hscript("takeadd {0} {1}".format(self._parent, self.name))
+
+        # takeadd may switch to the new take
+        _active_take.reset(self.name)
+
+        if not result[1]:
+            _take_index.add(self.name, self.parent or "Main")
+            _live_takes[self.name] = self
+            _events.edited([self.name], tree=True)
+            return True
+        
+        else:
+            raise TakeCreationError("Can not create take named: " + self.name)
+    
+    def _updateSavedData(self, node, parm=None, flag=None, include=True):
+
+        if parm is None and flag is None:
+            return
+
+        node = self._convertNode(node)
+        node_path = node.path()
+
+        member = self.take_members.get(node_path)
+
+        if member is None:
+            if not include:
+                return
+
+            member = TakeMember(node=node, take=self.name)
+            self.take_members[node_path] = member
+            _events.watchNode(node)
+
+        if include:
+
+            if flag is not None:
+                member.addFlag(flag)
+
+            if parm is not None:
+                member.addParm(parm)
+        else:
+            if flag is not None:
+                member.removeFlag(flag)
+
+            if parm is not None:
+                member.removeParm(parm)
+
+        # flush empty member
+        if member.isEmpty():
+            self.take_members.pop(node_path, None)
+
+    def _updateNodesParms(self, nodes_parms, include=True):
+        '''
+            Bulk version of _updateSavedData() for parameters.
+            nodes_parms: list of ( hou.Node, parms ), parms being a list of names,
+                         hou.Parm or hou.ParmTuple, or None for all the node's parameters.
+        '''
+        for node, parms in nodes_parms:
+
+            node_path = node.path()
+            member = self.take_members.get(node_path)
+
+            if include:
+                if parms is None:
+                    parms = node.parms()
+
+                if member is None:
+                    member = TakeMember(node=node, take=self.name)
+                    self.take_members[node_path] = member
+                    _events.watchNode(node)
+
+                member.addParms(parms)
+
+            else:
+                if member is None:
+                    continue
+
+                member.removeParms(parms)
+                if member.isEmpty():
+                    del self.take_members[node_path]
+
+    def _convertNode(self, node):
+
+        return _convertNode(node)
+
+    # Include flags
+    def includeFlags(self, nodes, flags, include=True, set_flag=False, flag_value=True):
+        '''
+            Include flags of one or many nodes in the take.
+            nodes: hou.Node, node path, node path pattern ( "/obj/geo*" ) or a list of them.
+            flags: (str or list) Flag labels ( "render_flag", "display_flag", "bypass_flag" )
+                                 or letters ( "r", "d", "b" ).
+            include: (bool) Flag Include / Exclude switch.
+            set_flag: (bool) Set the nodes' flags ( if included ).
+            flag_value: (bool) Value of the flags to be set.
+            All the nodes and flags are sent to Houdini in a single batch of commands.
+
+            Raise a InvalidFlagType if a node doesn't have one of the flags.
+        '''
+        if isinstance(flags, str):
+            flags = [flags]
+
+        nodes = _resolveNodes(nodes)
+        letters = [_FLAG_LETTERS.get(flag, flag) for flag in flags]
+        for node in nodes:
+            for letter in letters:
+                _checkFlag(node, letter)
+
+        include_flag = ""
+        if not include:
+            include_flag = "-u"
+
+        buffer = _CommandBuffer()
+        self._bufferSetCurrent(buffer)
+
+        for node in nodes:
+            for letter in letters:
+                buffer.add("takeinclude {0} -{1} {2}".format(include_flag, letter, node.path()),
+                           TakeSetError)
+
+            if set_flag and include:
+                buffer.add("opset {0} {1}".format(
+                           " ".join(["-{0} {1}".format(letter, "on" if flag_value else "off")
+                                     for letter in letters]),
+                           node.path()))
+
+        buffer.flush()
+
+        for node in nodes:
+            for letter in letters:
+                self._updateSavedData(node, flag=_FLAG_LABELS[letter], include=include)
+
+    def includeRenderFlag(self, node, include=True, set_flag=False, flag_value=True):
+        '''
+            Include render flag of the node_path in the take.
+            node: (str) path of the node or instance of hou.Node(), a node path pattern
+                        or a list of them.
+            include: (bool) Flag Include / Exclude switch.
+            set_flag: (bool) Set the node's render flag.
+            flag_value: (bool) Value of the flag to be set.
+
+            Raise a InvalidFlagType if the given node doesn't have a render flag
+            
+        '''
+        self.includeFlags(node, "r", include, set_flag, flag_value)
+        
+    def includeDisplayFlag(self, node, include=True, set_flag=False, flag_value=True):
+        '''
+            Include display flag of the node_path in the take.
+            node: (str) path of the node or instance of hou.Node(), a node path pattern
+                        or a list of them.
+            toggle: (bool) Flag Include / Exclude switch.
+            set_flag: (bool) Set the node's render flag.
+            flag_value: (bool) Value of the flag to be set.
+
+            Raise a InvalidFlagType if the given node doesn't have a display flag
+        '''
+        self.includeFlags(node, "d", include, set_flag, flag_value)
+        
+    def includeBypassFlag(self, node, include=True, set_flag=False, flag_value=True):
+        '''
+            Include bypass flag of the node_path in the take.
+            node: (str) path of the node or instance of hou.Node(), a node path pattern
+                        or a list of them.
+            toggle: (bool) Flag Include / Exclude switch.
+            set_flag: (bool) Set the node's render flag.
+            flag_value: (bool) Value of the flag to be set.
+
+            Raise a InvalidFlagType if the given node doesn't have a bypass flag
+        '''
+        self.includeFlags(node, "b", include, set_flag, flag_value)
+        
+    # Include parameters
+    def includeParms(self, parms, include=True):
+        ''' 
+            Include given hou.Parm or hou.ParmTuple object(s) in the take.
+            All the parameters are sent to Houdini in a single batch of commands.
+        '''
+
+        if not hasattr(parms, "__iter__"):
+            parms = [parms]
+
+        include_flag = ""
+        if not include:
+            include_flag = "-u"
+
+        buffer = _CommandBuffer()
+        self._bufferSetCurrent(buffer)
+
+        for parm in parms:
+
+            node_path = parm.node().path()
+            parm_string = parm.name()
+
+            buffer.add("takeinclude {0} {1} {2}".format(include_flag,
+                                                       node_path,
+                                                       parm_string),
+                       TakeSetError)
+
+        buffer.flush()
+
+        self._updateNodesParms(_groupByNode(parms), include=include)
+
+    def setParmValues(self, values):
+        '''
+            Include the given parameters in the take and set their values in the take.
+            values: (dict or list) {parm: value} or (parm, value) tuples, parm being a
+                                   hou.Parm or a hou.ParmTuple ( with a tuple of values ).
+            All the parameters are sent to Houdini in a single batch of commands.
+        '''
+        values = _parmValues(values)
+
+        buffer = _CommandBuffer()
+        self._bufferSetCurrent(buffer)
+
+        for parm, value in values:
+            buffer.add("takeinclude {0} {1}".format(parm.node().path(), parm.name()),
+                       TakeSetError)
+            buffer.add(_setParmCommand(parm, value))
+
+        buffer.flush()
+
+        self._updateSavedValues(values)
+
+    def _updateSavedValues(self, values):
+
+        for parm, value in values:
+            self._updateSavedData(parm.node(), parm)
+
+            # Expressions and strings ( expanded ) are evaluated when requested
+            member = self.take_members[parm.node().path()]
+            if isinstance(parm, hou.ParmTuple):
+                for p, v in zip(parm, value):
+                    if isinstance(v, numbers.Number):
+                        member[p.name()] = v
+            elif isinstance(value, numbers.Number):
+                member[parm.name()] = value
+
+    def includeParmsFromNode(self, node, parms_name_filter=None, include=True):
+        '''
+            Include parameters from a given hou.Node or node path object, or from a list of them.
+            Parameters can be filtered with an houdini-style pattern matching "parms_name_filter"
+            which can be either a single string or a list of string.
+            All the nodes are sent to Houdini in a single batch of commands.
+        '''
+
+        if not hasattr(parms_name_filter, "__iter__"):
+            if parms_name_filter is None:
+                parms_name_filter = []
+            else:
+                parms_name_filter = [parms_name_filter]
+
+        # Check nodes
+        if isinstance(node, str) or not hasattr(node, "__iter__"):
+            node = [node]
+        nodes = [self._convertNode(n) for n in node]
+        
+        # Include flag
+        if include:
+            include_flag = ""
+        else:
+            include_flag = "-u"
+
+        # whole node ( no filer )
+        if not parms_name_filter:
+            buffer = _CommandBuffer()
+            self._bufferSetCurrent(buffer)
+            for n in nodes:
+                buffer.add("takeinclude {0} {1} *".format(include_flag, n.path()),
+                           TakeSetError)
+            buffer.flush()
+
+            self._updateNodesParms([(n, None) for n in nodes], include=include)
+
+        # with filter name
+        else:
+            parms = []
+            for n in nodes:
+                parms.extend(_matchParms(n, parms_name_filter))
+            self.includeParms(parms, include=include)
+    
+    def includeParmsFromTake(self, take, force=False):
+        '''
+            Include all parms from a given take to this take.
+            The take parameter can be either a Take object or a take name.
+            force: (bool) Force a source take has the same included parameter as the destination,
+                          the source will overwrite the destination
+        '''
+
+        if isinstance(take, Take):
+            name = take.getName()
+        else:
+            name = take
+
+        if not _take_index.find(name):
+            raise TakeError("Can not find take: " + name)
+        
+        if force:
+            force = "-f"
+        else:
+            force = ""
+        
+        self._edited()
+        result = _hscript("takemerge {0} {1} {2}".format(force, self.name, name))
+        if result[1]:
+            raise TakeError(result[1])
+        
+        if not isinstance(take, Take):
+            take = _takeProxy(name)
+
+        for node_path, member in take.getTakeMembers().items():
+            own_member = self.take_members.get(node_path)
+            if own_member is None:
+                own_member = TakeMember(node=member.node, take=self.name)
+                self.take_members[node_path] = own_member
+            own_member.update(member)
+        
+        return True
+    
+    def diff(self, target):
+        '''
+            Return a TakeDiff of the parameters and flags to include and exclude to make
+            this take's members match target.
+            target can be a Take object, a take name or a spec dictionnary
+            {node ( hou.Node or path ): list of parm names and flag labels}, like:
+                {"/obj/geo1": ["tx", "r", "display_flag"]}
+        '''
+        return _diffMembers(self.getName(), self.getTakeMembers(), _targetMembers(target))
+
+    def sync(self, target):
+        '''
+            Make this take's members match target ( see diff() ), only the differences
+            are sent to Houdini, in a single batch of commands.
+            The current take is left unchanged. Return the applied TakeDiff.
+        '''
+        diff = self.diff(target)
+        _applyDiffs([(self, diff)])
+        return diff
+
+    def getTakeMembers(self):
+        '''
+            return a dictionnary of TakeMembers objects included in the take.
+        '''
+        
+        if not _take_index.find(self.name):
+            raise TakeError("Can not find take: " + self.name)
+        
+        return self.take_members
+
+    def evaluateAll(self):
+        '''
+            Evaluate the values of all the parameters and flags included in the take,
+            node by node and with the take set as current take.
+            Values of a take read from the scene are otherwise only evaluated when
+            they are requested, member by member, in the take they belong to.
+            return the dictionnary of take's members.
+        '''
+
+        members = self.getTakeMembers()
+        pending = [m for m in members.values() if m.pending]
+        if not pending:
+            return members
+
+        with activeTake(self):
+            for member in pending:
+                member.evaluate()
+
+        return members
+
+    def toDict(self, values=False):
+        '''
+            Return the take as a dictionnary which can be saved as JSON:
+            {"name": str, "parent": str ( "" for Main ),
+             "members": {node path: {"parms": [parm names], "flags": flag letters ( "rdb" ),
+                                     "values": {parm name or flag label: value}}}}
+            values: (bool) If set to True, the values are read in the take and saved:
+                           string parameters are saved unexpanded, parameters with an
+                           expression as {"expression": str, "language": str}, ramp
+                           parameters raise a TakeError.
+        '''
+        if values:
+            if _transaction is None and self.name != _active_take.get():
+                with activeTake(self.name):
+                    return self.toDict(values=True)
+
+        parent = _take_index.parentOf(self.getName())
+        if parent is None or parent == "Main":
+            parent = ""
+
+        members = {}
+        for node_path, member in self.take_members.items():
+            data = {"parms": member.parms,
+                    "flags": "".join([_FLAG_LETTERS[f] for f in member.flags])}
+            if values:
+                data["values"] = dict([(flag, member[flag]) for flag in member.flags])
+                for parm_name in member.parms:
+                    parm = member.node.parm(parm_name)
+                    data["values"][parm_name] = _exportValue(parm) if parm is not None else None
+            members[node_path] = data
+
+        return {"name": self.name, "parent": parent, "members": members}
+
+    def getTakeMembersStr(self):
+        '''
+            return a string version of take's members.
+        '''
+        if not _take_index.find(self.name):
+            raise TakeError("Can not find take: " + self.name)
+        
+        out = "Nodes and parms included in take: "+ self.name + "\n\n"
+        
+        for key, member in self.evaluateAll().items():
+            out += key + ":\n"
+            for name, value in member.items():
+                out += " "*4 + name + " : " + str(value) + "\n"
+            out += "\n"
+
+        return out
+    
+    def isCurrent(self):
+        ''' 
+            Returns True if the take is the current take, False otherwise.
+        '''
+        if self.name == _active_take.get():
+            return True
+        return False
+    
+    def setCurrent(self):
+        ''' 
+            Set take as current take.
+        '''
+        _active_take.set(self.name, TakeSetError,
+                         "Take '{0}' not found.".format(self.name))
+
+        return True
+
+    def _bufferSetCurrent(self, buffer):
+        '''
+            Add the "takeset" command of setCurrent() to a command buffer.
+        '''
+        self._edited()
+        _active_take.bufferSet(buffer, self.name, TakeSetError,
+                               "Take '{0}' not found.".format(self.name))
+
+    def _edited(self):
+        '''
+            Called before the take is edited: if another Take object of the same take
+            is live ( created with Take(name, _add_to_scene=False) ), its members are
+            read again on next access.
+        '''
+        live = _live_takes.get(self.name)
+        if live is not None and live is not self:
+            live.take_members = None
+
+        _events.edited([self.name])
+    
+    def setName(self, name):
+        '''
+            Rename the current take.
+        '''
+        if name == self.name:
+            return False
+        
+        name = _incName(_checkName(name))
+        
+        result = _hscript("takename " + self.name + " " + name)
+        if result[1]:
+            raise TakeError(result[1])
+
+        _take_index.rename(self.name, name)
+        _events.edited([self.name, name], tree=True)
+        if _active_take.name == self.name:
+            _active_take.name = name
+
+        # Re-key the live take
+        if _live_takes.get(self.name) is self:
+            del _live_takes[self.name]
+        else:
+            _invalidateTakes([self.name])
+        _live_takes[name] = self
+
+        self.name = name
+        if self._take_members is not None:
+            for member in self._take_members.values():
+                member.take = name
+        return name
+       
+    def setParent(self, parent):
+        '''
+            Set the current take's parent, it can be either a Take object, a take name
+            or None. 
+            If None, the take's parent will be set to Main take.
+        '''
+
+        if parent is None:
+            result = _hscript("takemove {0} Main".format(self.getName()))
+            if result[1]:
+                raise TakeError(result[1])
+            _take_index.move(self.name, "Main")
+            _events.edited([self.name], tree=True)
+            self.parent = "Main"
+            self._parent = "-p Main"
+
+        else:
+
+            if isinstance(parent, Take):
+                parent = parent.getName()
+
+            if not _take_index.find(parent):
+                raise TakeError("Take {0} not found in take list.".format(parent))
+
+            if parent == self.name or self.name in _take_index.ancestorsOf(parent):
+                raise TakeError("Can not move take {0} under itself or one of its "
+                                "children ( {1} ).".format(self.name, parent))
+
+            result = _hscript("takemove {0} {1}".format(self.getName(),
+                                                           parent))
+            if result[1]:
+                raise TakeError(result[1])
+
+            _take_index.move(self.name, parent)
+            _events.edited([self.name], tree=True)
+            self.parent = parent
+            self._parent = "-p " + parent
+
+    def getName(self):
+        '''
+            Return take's name
+        '''
+        if not _take_index.find(self.name):
+            raise TakeError("Can not find take: " + self.name)
+        
+        return self.name
+
+    def getParent(self):
+        '''
+            Return the take's parent as Take object, or None.
+        '''
+        parent = _take_index.parentOf(self.getName())
+
+        # Main is not returned as a Take object
+        if parent is None or parent == "Main":
+            self.parent = ""
+            self._parent = ""
+            return None
+
+        self.parent = parent
+        self._parent = "-p " + parent
+        return _takeProxy(parent)
+
+    def getChildren(self):
+        '''
+            Return the list of the take's children as Take objects.
+            Like getParent(), getAncestors() and getDescendants(), the takes are
+            found in PyTake2's take index and their members are only read from
+            the scene when they are first accessed.
+        '''
+        return [_takeProxy(n) for n in _take_index.childrenOf(self.getName())]
+
+    def getAncestors(self):
+        '''
+            Return the list of the take's parents as Take objects, from its
+            parent to the top level take ( Main is not returned ).
+        '''
+        return [_takeProxy(n) for n in _take_index.ancestorsOf(self.getName())
+                if n != "Main"]
+
+    def getDescendants(self):
+        '''
+            Return the list of the take's children, their children and so on
+            as Take objects ( same order as the take list ).
+        '''
+        return [_takeProxy(n) for n in _take_index.subtree(self.getName())[1:]]
+
+    def getDepth(self):
+        '''
+            Return the depth of the take in the take tree, a top level take is 1.
+        '''
+        return _take_index.depthOf(self.getName())
+    
+    def copy(self, name="", set_current=False, parent=None, recursive=False, count=1):
+        '''
+            Return a copy of that take and add it to the list of take.
+            name: (str) Name of the copy, take's name followed by "_copy" by default.
+            parent: (Take or str) Parent of the copy, take's parent by default.
+            recursive: (bool) Copy the children of the take as well.
+            count: (int) Number of copies, if above 1 the list of the copies is returned.
+            See copyTakes().
+        '''
+        copies = copyTakes(self, count=count, name=name, parent=parent,
+                           recursive=recursive, set_to_current=set_current)
+        if count == 1:
+            return copies[0]
+
+        return copies
+
+    def remove(self, recursive=False):
+        '''
+            Remove the take from the take list.
+            recursive: (bool) if True, remove all child takes as well.
+        '''
+        if not _take_index.find(self.name):
+            raise TakeDeleteError("Can not find take: " + self.name)
+
+        if recursive:
+            recursive = "-R"
+            removed = _take_index.subtree(self.name)
+        else:
+            recursive = ""
+            removed = [self.name]
+        
+        result = _hscript("takerm " + recursive + " " + self.name)
+        if result[1]:
+            raise TakeDeleteError(result[1])
+        else:
+            _take_index.remove(self.name, recursive=bool(recursive))
+            _events.edited(removed, tree=True)
+            for name in removed:
+                _live_takes.pop(name, None)
+            _events.prune()
+            if not _active_take.name in _take_index:
+                _active_take.reset("Main")
+            return True
+        
+    def existInScene(self):
+        '''
+            Return True if take exists in the scene, False if not.
+        '''
+        return _take_index.find(self.name)
+    
+    def saveToFile(self, file_path, recursive=False):
+        '''
+            Save the given take to a external file.
+            file_path: (str) A valid path where to save the file.
+            recursive: (bool) if True, save as well as children take of the node.
+        '''
+        
+        if not _take_index.find(self.name):
+            raise TakeError(self.name + " not found in take list.")
+        
+        if recursive:
+            recursive = "-R"
+        else:
+            recursive = ""
+        
+        result = _hscript("takesave -o {0} {1} {2}".format(file_path, recursive, self.name) )
+        if result[1]:
+            raise TakeError(result[1])
+        else:
+            return True
+
+
+# Pattern matching
+class PatternMatcher(object):
+    '''
+        Houdini-style patterns compiled once and matched in Python, same results
+        as hou.patternMatch():
+        "*" and "?" wildcards, "[abc]" character sets, space separated lists of
+        patterns and "^" exclusions ( "t* ^tz" matches "tx" and "ty" ).
+        patterns: (str or list) A pattern, or a list of patterns: a name matches
+                                if any of them matches.
+        ignore_case: (bool) Case insensitive matching.
+    '''
+
+    def __init__(self, patterns, ignore_case=False):
+
+        if isinstance(patterns, str):
+            patterns = [patterns]
+
+        self.patterns = list(patterns)
+        self.ignore_case = ignore_case
+
+        re_flags = re.IGNORECASE if ignore_case else 0
+
+        # Patterns without exclusions are all merged in a single expression
+        simple = []
+
+        # Other patterns, as runs of inclusions / exclusions, last run first
+        self._rules = []
+
+        for pattern in self.patterns:
+
+            runs = []
+            for token in pattern.split():
+                include = not token.startswith("^")
+                if not include:
+                    token = token[1:]
+                if not token:
+                    continue
+
+                expression = fnmatch.translate(token)
+                if runs and runs[-1][0] == include:
+                    runs[-1][1].append(expression)
+                else:
+                    runs.append((include, [expression]))
+
+            if len(runs) == 1 and runs[0][0]:
+                simple.extend(runs[0][1])
+
+            elif runs:
+                self._rules.append([(include, re.compile("|".join(expressions), re_flags))
+                                    for include, expressions in reversed(runs)])
+
+        self._simple = None
+        if simple:
+            self._simple = re.compile("|".join(simple), re_flags).match
+
+    def match(self, name):
+
+        if self._simple is not None and self._simple(name):
+            return True
+
+        # The last token matching the name decides
+        for runs in self._rules:
+            for include, expression in runs:
+                if expression.match(name):
+                    if include:
+                        return True
+                    break
+
+        return False
+
+    def filter(self, names):
+        '''
+            Return the list of the given names which match.
+        '''
+        match = self.match
+        return [name for name in names if match(name)]
+
+    def __repr__(self):
+
+        return "PatternMatcher({0!r})".format(self.patterns)
+
+
+# Take differences
+class TakeDiff(object):
+    '''
+        Parameters and flags to include ( added ) and to exclude ( removed ) to make a
+        take match another take or a spec, see Take.diff().
+        added, removed: dictionnaries {node path: TakeMember}.
+        Only the members are compared, not the values of the parameters.
+    '''
+
+    def __init__(self, take_name=""):
+
+        self.take_name = take_name
+        self.added = {}
+        self.removed = {}
+
+    def isEmpty(self):
+
+        return not self.added and not self.removed
+
+    def __len__(self):
+        '''
+            Number of parameters and flags to include or exclude.
+        '''
+        return (sum([len(m) for m in self.added.values()]) +
+                sum([len(m) for m in self.removed.values()]))
+
+    def _addCommands(self, buffer):
+        '''
+            Add the "takeinclude" commands applying the diff to a command buffer,
+            the take has to be current.
+        '''
+        for include_flag, members in (("-u", self.removed), ("", self.added)):
+            for node_path, member in members.items():
+
+                if member.parms:
+                    buffer.add("takeinclude {0} {1} {2}".format(include_flag, node_path,
+                                                                " ".join(member.parms)),
+                               TakeSetError)
+
+                flags = " ".join(["-" + _FLAG_LETTERS[f] for f in member.flags])
+                if flags:
+                    buffer.add("takeinclude {0} {1} {2}".format(include_flag, flags, node_path),
+                               TakeSetError)
+
+    def _updateMembers(self, take_members):
+        '''
+            Apply the diff to a take's members dictionnary.
+        '''
+        for node_path, member in self.removed.items():
+            own_member = take_members.get(node_path)
+            if own_member is None:
+                continue
+            for name in member.parms:
+                own_member.removeParm(name)
+            for flag in member.flags:
+                own_member.removeFlag(flag)
+            if own_member.isEmpty():
+                take_members.pop(node_path)
+
+        for node_path, member in self.added.items():
+            own_member = take_members.get(node_path)
+            if own_member is None:
+                own_member = TakeMember(node=member.node, take=self.take_name)
+                take_members[node_path] = own_member
+            own_member.update(member)
+
+    def __str__(self):
+
+        out = "Take diff '" + self.take_name + "'\n"
+        for sign, members in (("+", self.added), ("-", self.removed)):
+            for node_path in sorted(members):
+                member = members[node_path]
+                out += "  {0} {1}: {2}\n".format(sign, node_path,
+                                                 ", ".join(member.parms + member.flags))
+
+        return out
+
+    def __repr__(self):
+
+        return self.__str__()
+
+
+#############
+# Utilities #
+#############
+
+def _incName(name):
+    '''
+        Check if any take with the current given "name"
+        Already exists, if yes, increment the name of the take by an int.
+    '''
+
+    return _take_index.allocator.allocate(name)
+
+def _splitName(name):
+    '''
+        Split a take name in a base name and a numeric suffix,
+        return (base, suffix value, suffix length), "shot_010" => ("shot_", 10, 3)
+    '''
+    i = len(name)
+    while i > 0 and name[i - 1].isdigit():
+        i -= 1
+
+    if i == len(name):
+        return name, 0, 0
+
+    return name[:i], int(name[i:]), len(name) - i
+
+def _checkName(name):
+    '''
+        Check if the given name has only legal char.
+        If not, replace illegal char with _
+    '''    
+    out_name = ""
+    legal_chars = "abcdefghijklmnopqrstuvwxyz0123456789_"
+    
+    for c in name:
+        if c.lower() in legal_chars:
+            out_name += c
+            
+        else:
+            out_name += "_"
+            
+    return out_name
+
+def _convertNode(node):
+    '''
+        Return the hou.Node of a node path, or a list of hou.Node from a list of
+        nodes and paths. Raise InvalidNode if a node is not found.
+    '''
+
+    if isinstance(node, str):
+        out_node = hou.node(node)
+        if out_node is None:
+            raise InvalidNode(node)
+        return out_node
+
+    if hasattr(node, "__iter__"):
+        
+        out_node = []
+        for n in node:
+
+            if isinstance(n, str):
+                _n = hou.node(n)
+                if _n is None:
+                    raise InvalidNode(n)
+                out_node.append(_n)
+
+            elif isinstance(n, hou.Node):
+                out_node.append(n)
+
+        return out_node
+
+    if not isinstance(node, hou.Node):
+        raise InvalidNode(str(node))
+
+    return node
+
+# Compiled PatternMatcher objects, and parm match results per node type and filters.
+# Both are emptied when they grow above _MATCH_CACHE_SIZE entries.
+_matchers = {}
+_parm_matches = {}
+_MATCH_CACHE_SIZE = 256
+
+def _matcher(patterns, ignore_case=False):
+    '''
+        Return a cached PatternMatcher.
+    '''
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    key = (tuple(patterns), ignore_case)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        if len(_matchers) >= _MATCH_CACHE_SIZE:
+            _matchers.clear()
+        matcher = PatternMatcher(patterns, ignore_case)
+        _matchers[key] = matcher
+
+    return matcher
+
+def _matchParms(node, patterns):
+    '''
+        Return the parms of node whose name matches any of the patterns.
+        Results are cached per node type, a parameter name is matched once
+        for all the nodes of the same type.
+    '''
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    key = (node.type().nameWithCategory(), tuple(patterns))
+    results = _parm_matches.get(key)
+    if results is None:
+        if len(_parm_matches) >= _MATCH_CACHE_SIZE:
+            _parm_matches.clear()
+        results = {}
+        _parm_matches[key] = results
+
+    matcher = None
+    parms = []
+    for parm in node.parms():
+
+        name = parm.name()
+        matched = results.get(name)
+
+        # Not matched yet ( first node of this type, spare or multi parm )
+        if matched is None:
+            if matcher is None:
+                matcher = _matcher(patterns)
+            matched = matcher.match(name)
+            results[name] = matched
+
+        if matched:
+            parms.append(parm)
+
+    return parms
+
+def _groupByNode(parms):
+    '''
+        Return the given hou.Parm or hou.ParmTuple objects as a list of
+        ( node, [parms] ), nodes in the order they first appear.
+    '''
+    groups = _OrderedSet()
+    for parm in parms:
+        node = parm.node()
+        group = groups.get(node.path())
+        if group is None:
+            group = (node, [])
+            groups[node.path()] = group
+        group[1].append(parm)
+
+    return list(groups.values())
+
+def _targetMembers(target):
+    '''
+        Return the members dictionnary of a diff target: a Take object,
+        a take name or a spec {node: list of parm names and flag labels}.
+    '''
+    if isinstance(target, Take):
+        return target.getTakeMembers()
+
+    if isinstance(target, str):
+        if not _take_index.find(target):
+            raise TakeError("Can not find take: " + target)
+        return _takeProxy(target).take_members
+
+    members = {}
+    for node, names in target.items():
+
+        node = _convertNode(node)
+        member = TakeMember(node=node)
+
+        for name in names:
+
+            if name in _FLAG_LETTERS:
+                if not hasattr(node, _FLAG_METHODS[_FLAG_LETTERS[name]]):
+                    raise InvalidFlagType("Node: {0} does not have {1}.".format(node.path(), name))
+                member.addFlag(name)
+                continue
+
+            # Same lookup as _parseScript(), parm tuple names are expanded
+            parm_tuple = node.parmTuple(name)
+            if parm_tuple is not None and parm_tuple.name() == name:
+                member.addParm(parm_tuple)
+
+            elif node.parm(name) is not None:
+                member.addParm(name)
+
+            else:
+                raise TakeError("Parameter {0} not found on node {1}.".format(name, node.path()))
+
+        if not member.isEmpty():
+            members[node.path()] = member
+
+    return members
+
+def _diffMembers(take_name, current, target):
+    '''
+        Return the TakeDiff turning the current members dictionnary into the target one.
+    '''
+    diff = TakeDiff(take_name)
+    empty = TakeMember()
+
+    for node_path in set(current) | set(target):
+
+        current_member = current.get(node_path, empty)
+        target_member = target.get(node_path, empty)
+
+        for source, other, members in ((target_member, current_member, diff.added),
+                                       (current_member, target_member, diff.removed)):
+
+            parms = [p for p in source._parms if not p in other._parms]
+            flag_bits = source._flag_bits & ~other._flag_bits
+            if not parms and not flag_bits:
+                continue
+
+            member = TakeMember(node=source.node, parms=parms)
+            member._flag_bits = flag_bits
+            members[node_path] = member
+
+    return diff
+
+def _applyDiffs(diffs):
+    '''
+        Apply a list of (Take, TakeDiff) with a single command buffer, the
+        current take is left unchanged.
+    '''
+    diffs = [(take, diff) for take, diff in diffs if not diff.isEmpty()]
+    if not diffs:
+        return
+
+    previous = _active_take.get()
+
+    buffer = _CommandBuffer()
+    for take, diff in diffs:
+        take._bufferSetCurrent(buffer)
+        diff._addCommands(buffer)
+
+    _active_take.bufferSet(buffer, previous)
+    buffer.flush()
+
+    for take, diff in diffs:
+        diff._updateMembers(take.take_members)
+
+def _parmValues(values):
+    '''
+        Return a list of (parm, value) tuples from a {parm: value} dictionnary
+        or a list of tuples.
+    '''
+    if hasattr(values, "items"):
+        values = values.items()
+
+    return list(values)
+
+def _hscriptValue(value):
+    '''
+        Format a parameter value as an hscript argument, strings are quoted
+        so they are not expanded.
+    '''
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+
+    if isinstance(value, numbers.Real):
+        return repr(float(value))
+
+    value = str(value)
+    if not "'" in value:
+        return "'" + value + "'"
+
+    return '"' + value.replace('"', '\\"') + '"'
+
+def _isExpression(value):
+
+    return isinstance(value, dict) and "expression" in value
+
+def _exportValue(parm):
+    '''
+        Return the value of a hou.Parm as saved by exportTakes(): the expression
+        and its language ( {"expression": str, "language": "Hscript" or "Python"} ),
+        the unexpanded string of a string parameter or the value.
+        Ramps can't be set back by hscript, a TakeError is raised.
+    '''
+    try:
+        return {"expression": parm.expression(),
+                "language": parm.expressionLanguage().name()}
+    except hou.OperationFailed:
+        pass
+
+    value = parm.eval()
+    if isinstance(value, hou.Ramp):
+        raise TakeError("Can not save the value of ramp parameter: " + parm.path())
+
+    if isinstance(value, str):
+        return parm.unexpandedString()
+
+    return value
+
+def _setParmCommand(parm, value):
+    '''
+        Return the hscript commands setting a hou.Parm or a hou.ParmTuple
+        ( value being a tuple ) to the given value.
+        A {"expression": str, "language": "Hscript" or "Python"} value sets
+        an expression on the parameter.
+    '''
+    if isinstance(parm, hou.ParmTuple):
+        parms = list(parm)
+    else:
+        parms = [parm]
+        value = [value]
+
+    if not any([_isExpression(v) for v in value]):
+        return "opparm {0} {1} ( {2} )".format(parm.node().path(), parm.name(),
+                                               " ".join([_hscriptValue(v) for v in value]))
+
+    commands = []
+    for p, v in zip(parms, value):
+        if not _isExpression(v):
+            commands.append(_setParmCommand(p, v))
+            continue
+
+        language = "p" if v.get("language") == "Python" else "h"
+        commands.append("chadd {0} {1}".format(p.node().path(), p.name()))
+        commands.append("chkey -t 0 -F {0} -l {1} {2}".format(_hscriptValue(v["expression"]),
+                                                              language, p.path()))
+
+    return "; ".join(commands)
+
+def _resolveNodes(nodes):
+    '''
+        Return a list of hou.Node from a hou.Node, a node path, a node path pattern
+        ( "/obj/geo*", the pattern is matched against the children names of "/obj" )
+        or a list of them. Raise InvalidNode if a node is not found.
+    '''
+    if isinstance(nodes, str) or not hasattr(nodes, "__iter__"):
+        nodes = [nodes]
+
+    out_nodes = []
+    for node in nodes:
+
+        if not isinstance(node, str) or not _NODE_PATTERN_CHARS.intersection(node):
+            out_nodes.append(_convertNode(node))
+            continue
+
+        parent_path, _, pattern = node.rpartition("/")
+        parent = hou.node(parent_path or "/")
+        if parent is None or not node.startswith("/"):
+            raise InvalidNode(node)
+
+        matcher = _matcher(pattern)
+        out_nodes.extend([n for n in parent.children() if matcher.match(n.name())])
+
+    return out_nodes
+
+_NODE_PATTERN_CHARS = frozenset("*?[")
+
+def _listTakeNames():
+    '''
+        Return all takes' name of the scene
+    '''
+
+    return _take_index.list()
+
+def _parseTakeList(takels_output):
+    '''
+        Parse the indented output of "takels".
+        Return the list of take names and a dictionnary {take: parent take}.
+    '''
+
+    names = []
+    parents = {}
+    stack = []
+
+    for line in takels_output.split("\n"):
+
+        name = line.strip()
+        if not name:
+            continue
+
+        indent = len(line) - len(line.lstrip())
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+
+        if stack:
+            parents[name] = stack[-1][1]
+        else:
+            parents[name] = None
+
+        stack.append((indent, name))
+        names.append(name)
+
+    return names, parents
+
+class _NameAllocator(object):
+    '''
+        Keep the highest numeric suffix used by each base name of the take index,
+        to give a free take name in constant time: if "shot_004" is the highest
+        "shot_" take, the next free name is "shot_005".
+        Names given but not yet created are reserved until the index is read again.
+    '''
+
+    def __init__(self, index):
+
+        self.index = index
+        self.suffixes = {}
+        self.reserved = set()
+
+    def rebuild(self, names):
+
+        self.suffixes = {}
+        self.reserved = set()
+        for name in names:
+            self.use(name)
+
+    def use(self, name):
+
+        base, suffix, _ = _splitName(name)
+        if suffix > self.suffixes.get(base, -1):
+            self.suffixes[base] = suffix
+
+    def _isFree(self, name):
+
+        return not name in self.index and not name in self.reserved
+
+    def _next(self, name):
+
+        base, _, length = _splitName(name)
+        suffix = self.suffixes.get(base, 0) + 1
+        self.suffixes[base] = suffix
+
+        new_name = base + str(suffix).zfill(length)
+        self.reserved.add(new_name)
+        return new_name
+
+    def allocate(self, name):
+        '''
+            Return name if it is free, else the next free name with the same base name.
+        '''
+        if self._isFree(name):
+            self.reserved.add(name)
+            self.use(name)
+            return name
+
+        return self._next(name)
+
+class _TakeIndex(object):
+    '''
+        Index of the scene's take names, stored as a set ( lookups ), dictionnaries
+        of parents, ordered children and depths ( Main is 0 ) and an ordered list
+        ( same order as "takels" ) which is rebuilt from the children when needed.
+        It is filled by a single "takels" call the first time it is used, then
+        updated in place by PyTake2's operations. It is read again only when
+        refresh() is called or when a scene event is received.
+    '''
+
+    def __init__(self):
+
+        self.names = []
+        self.parents = {}
+        self.children = {}
+        self.depths = {}
+        self.roots = []
+        self.name_set = set()
+        self.valid = False
+        self.ordered = True
+        self.allocator = _NameAllocator(self)
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def __contains__(self, name):
+
+        self._ensure()
+        return name in self.name_set
+
+    def find(self, name):
+        '''
+            Same as "name in index", but the index is read again once if name is
+            not found: the take may have been added outside of PyTake2 ( Take List,
+            hscript ... ). Not inside a batch() block, the index holds the takes
+            which are not created yet.
+        '''
+        if name in self:
+            return True
+
+        if _transaction is not None:
+            return False
+
+        self.refresh()
+        return name in self.name_set
+
+    def _ensure(self):
+
+        if self.valid:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.refresh()
+
+    def refresh(self):
+
+        result = _hscript("takels")
+        if result[1]:
+            raise TakeError(result[1])
+
+        self.names, self.parents = _parseTakeList(result[0])
+        self.children = dict((n, []) for n in self.names)
+        self.depths = {}
+        self.roots = []
+
+        # Parents are listed before their children
+        for n in self.names:
+            parent = self.parents[n]
+            if parent is None:
+                self.roots.append(n)
+                self.depths[n] = 0
+            else:
+                self.children[parent].append(n)
+                self.depths[n] = self.depths[parent] + 1
+
+        self.name_set = set(self.names)
+        self.valid = True
+        self.ordered = True
+        self.refreshes += 1
+        self.allocator.rebuild(self.names)
+
+    def invalidate(self):
+
+        if self.valid:
+            self.invalidations += 1
+        self.valid = False
+
+    def _walk(self, names):
+        ''' Return the given takes and all their children, in list order. '''
+
+        out = []
+        stack = list(reversed(names))
+        while stack:
+            name = stack.pop()
+            out.append(name)
+            stack.extend(reversed(self.children[name]))
+
+        return out
+
+    def list(self):
+
+        self._ensure()
+        if not self.ordered:
+            self.names = self._walk(self.roots)
+            self.ordered = True
+
+        return list(self.names)
+
+    def parentOf(self, name):
+
+        self._ensure()
+        return self.parents.get(name)
+
+    def childrenOf(self, name):
+
+        self._ensure()
+        return list(self.children.get(name, []))
+
+    def ancestorsOf(self, name):
+        ''' Return the parents of the given take, from its parent to Main. '''
+
+        self._ensure()
+        out = []
+        parent = self.parents.get(name)
+        while parent is not None:
+            out.append(parent)
+            parent = self.parents[parent]
+
+        return out
+
+    def depthOf(self, name):
+
+        self._ensure()
+        return self.depths.get(name)
+
+    def subtree(self, name):
+        ''' Return the given take and all its children, in list order. '''
+
+        self._ensure()
+        return self._walk([name])
+
+    def add(self, name, parent="Main"):
+
+        if not self.valid:
+            return
+
+        if not parent in self.name_set:
+            self.invalidate()
+            return
+
+        # New take is the last child of its parent
+        self.parents[name] = parent
+        self.children[name] = []
+        self.children[parent].append(name)
+        self.depths[name] = self.depths[parent] + 1
+        self.name_set.add(name)
+        self.ordered = False
+        self.allocator.use(name)
+        self.allocator.reserved.discard(name)
+
+    def remove(self, name, recursive=False):
+
+        if not self.valid or not name in self.name_set:
+            return
+
+        parent = self.parents[name]
+        siblings = self.children.get(parent, self.roots)
+        index = siblings.index(name)
+
+        if recursive:
+            removed = self._walk([name])
+            del siblings[index]
+
+        # Children are moved to the parent of the removed take
+        else:
+            removed = [name]
+            siblings[index:index + 1] = self.children[name]
+            for n in self.children[name]:
+                self.parents[n] = parent
+            for n in self._walk(self.children[name]):
+                self.depths[n] -= 1
+
+        for n in removed:
+            self.name_set.discard(n)
+            self.parents.pop(n, None)
+            self.children.pop(n, None)
+            self.depths.pop(n, None)
+
+        self.ordered = False
+
+    def rename(self, name, new_name):
+
+        if not self.valid or not name in self.name_set:
+            return
+
+        parent = self.parents.pop(name)
+        siblings = self.children.get(parent, self.roots)
+        siblings[siblings.index(name)] = new_name
+
+        self.parents[new_name] = parent
+        self.children[new_name] = self.children.pop(name)
+        self.depths[new_name] = self.depths.pop(name)
+        for n in self.children[new_name]:
+            self.parents[n] = new_name
+
+        self.name_set.discard(name)
+        self.name_set.add(new_name)
+        self.ordered = False
+        self.allocator.use(new_name)
+        self.allocator.reserved.discard(new_name)
+
+    def move(self, name, parent):
+
+        if not self.valid:
+            return
+
+        if not name in self.name_set or not parent in self.name_set:
+            self.invalidate()
+            return
+
+        self.children[self.parents[name]].remove(name)
+        self.children[parent].append(name)
+        self.parents[name] = parent
+
+        offset = self.depths[parent] + 1 - self.depths[name]
+        for n in self._walk([name]):
+            self.depths[n] += offset
+
+        self.ordered = False
+
+_take_index = _TakeIndex()
+
+# Active HscriptProfiler, None when profiling is disabled.
+_profiler = None
+
+def _hscript(command):
+    '''
+        Single dispatch point of all the hscript commands sent by PyTake2.
+        Inside a batch() block, the commands editing the scene are recorded
+        and succeed without being sent.
+    '''
+    if _transaction is not None and _transaction.record([(command, TakeError, None,
+                                                           _isIdempotent(command))]):
+        return ("", "")
+
+    if _profiler is None:
+        return hou.hscript(command)
+
+    return _profiler.call(command)
+
+class HscriptProfiler(object):
+    '''
+        Collect the hscript commands sent by PyTake2:
+        number of calls, cumulative and percentile latency per command
+        and the PyTake2 function ( public API ) which sent them.
+        Batched calls are split on "; ", each command name counts the calls
+        holding it and its number of commands, the time of a call is shared
+        between its commands.
+        Percentiles are computed on a bounded sample of the calls' latencies
+        ( max_samples per command ), so the memory used doesn't grow with the
+        number of calls.
+    '''
+
+    def __init__(self, max_samples=1024):
+
+        self.max_samples = max_samples
+        self._random = random.Random(0)
+        self.commands = {}
+        self.callers = {}
+        self.total_calls = 0
+        self.total_time = 0.0
+
+    def call(self, command):
+        '''
+            Send command with hou.hscript() and record it.
+        '''
+        start = time.time()
+        try:
+            return hou.hscript(command)
+        finally:
+            self.record(command, time.time() - start, _publicCaller())
+
+    def record(self, command, elapsed, caller=None):
+
+        counts = {}
+        parts = command.split("; ")
+        for part in parts:
+            name = _commandName(part)
+            counts[name] = counts.get(name, 0) + 1
+
+        for name, count in counts.items():
+            entry = self.commands.get(name)
+            if entry is None:
+                entry = {"calls": 0, "batched": 0, "time": 0.0, "max": 0.0, "latencies": []}
+                self.commands[name] = entry
+
+            entry["calls"] += 1
+            entry["batched"] += count
+            entry["time"] += elapsed * count / len(parts)
+            entry["max"] = max(entry["max"], elapsed)
+
+            # Reservoir sampling of the latencies
+            latencies = entry["latencies"]
+            if len(latencies) < self.max_samples:
+                latencies.append(elapsed)
+            else:
+                i = self._random.randint(0, entry["calls"] - 1)
+                if i < self.max_samples:
+                    latencies[i] = elapsed
+
+        if caller is not None:
+            caller_entry = self.callers.get(caller)
+            if caller_entry is None:
+                caller_entry = {"calls": 0, "time": 0.0}
+                self.callers[caller] = caller_entry
+            caller_entry["calls"] += 1
+            caller_entry["time"] += elapsed
+
+        self.total_calls += 1
+        self.total_time += elapsed
+
+    def reset(self):
+
+        self.__init__(self.max_samples)
+
+    def stats(self):
+        '''
+            Return a dictionnary of the collected data:
+            { "calls": int, "time": float,
+              "commands": { name: { "calls", "batched", "time", "p50", "p90", "p99", "max" } },
+              "callers": { function: { "calls", "time" } } }
+        '''
+        commands = {}
+        for name, entry in self.commands.items():
+            latencies = sorted(entry["latencies"])
+            commands[name] = {"calls": entry["calls"],
+                              "batched": entry["batched"],
+                              "time": entry["time"],
+                              "p50": _percentile(latencies, 50),
+                              "p90": _percentile(latencies, 90),
+                              "p99": _percentile(latencies, 99),
+                              "max": entry["max"]}
+
+        callers = dict((name, dict(entry)) for name, entry in self.callers.items())
+
+        return {"calls": self.total_calls,
+                "time": self.total_time,
+                "commands": commands,
+                "callers": callers}
+
+    def report(self):
+        '''
+            Return the collected data as a human readable string, batched
+        commands are counted in the "batched" column.
+        '''
+        stats = self.stats()
+        lines = ["hscript: {0} calls, {1:.4f}s".format(stats["calls"], stats["time"])]
+
+        lines.append("{0:<16}{1:>8}{2:>10}{3:>11}{4:>11}{5:>11}{6:>11}".format(
+                     "command", "calls", "batched", "total(s)", "p50(ms)", "p90(ms)", "p99(ms)"))
+
+        commands = sorted(stats["commands"].items(), key=lambda item: -item[1]["time"])
+        for name, entry in commands:
+            lines.append("{0:<16}{1:>8}{2:>10}{3:>11.4f}{4:>11.3f}{5:>11.3f}{6:>11.3f}".format(
+                         name, entry["calls"], entry["batched"], entry["time"],
+                         entry["p50"] * 1000.0, entry["p90"] * 1000.0, entry["p99"] * 1000.0))
+
+        if stats["callers"]:
+            lines.append("")
+            lines.append("{0:<32}{1:>8}{2:>11}".format("caller", "calls", "total(s)"))
+            callers = sorted(stats["callers"].items(), key=lambda item: -item[1]["time"])
+            for name, entry in callers:
+                lines.append("{0:<32}{1:>8}{2:>11.4f}".format(name, entry["calls"], entry["time"]))
+
+        return "\n".join(lines)
+
+def _percentile(values, percent):
+    '''
+        Nearest-rank percentile of an already sorted list.
+    '''
+    if not values:
+        return 0.0
+
+    rank = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[rank]
+
+def _publicCaller():
+    '''
+        Return the outermost PyTake2 public function or method in the call
+        stack, as "function" or "Class.method".
+        The whole stack is walked as context managers ( activeTake ) put
+        foreign frames between PyTake2's ones.
+    '''
+    module_globals = globals()
+    caller = None
+
+    frame = sys._getframe(2)
+    while frame is not None:
+
+        if frame.f_globals is module_globals:
+            name = frame.f_code.co_name
+            if not name.startswith("_") or name == "__init__":
+                instance = frame.f_locals.get("self")
+                if instance is not None:
+                    name = type(instance).__name__ + "." + name
+                caller = name
+
+        frame = frame.f_back
+
+    return caller
+
+# Maximum length ( in characters ) of the commands sent by a single hou.hscript() call.
+_HSCRIPT_CHUNK_SIZE = 32768
+
+class _CommandBuffer(object):
+    '''
+        Queue hscript commands and send them with as few hou.hscript() calls as possible,
+        the commands are joined with ";" in chunks of at most max_length characters.
+        If a chunk fails, its commands are sent again one by one to find the faulty
+        one, which raises its own error_class.
+        Commands which can not be sent twice ( idempotent=False ) are not replayed.
+    '''
+
+    def __init__(self, max_length=_HSCRIPT_CHUNK_SIZE):
+
+        self.max_length = max_length
+        self.commands = []
+
+        # Current take once the commands are sent
+        self.take = None
+
+    def __len__(self):
+
+        return len(self.commands)
+
+    def add(self, command, error_class=None, message=None, idempotent=True):
+        '''
+            Queue a command, error_class ( TakeError by default ) is raised with
+            message ( or hscript's error if None ) if the command fails.
+        '''
+        if error_class is None:
+            error_class = TakeError
+
+        self.commands.append((command, error_class, message, idempotent))
+
+    def flush(self):
+        '''
+            Send all the queued commands and return hscript's output.
+        '''
+        output = []
+        chunk = []
+        length = 0
+
+        commands = self.commands
+        self.commands = []
+
+        # Inside a batch() block
+        if _transaction is not None and _transaction.record(commands):
+            commands = []
+
+        for entry in commands:
+
+            if chunk and length + len(entry[0]) + 2 > self.max_length:
+                output.append(self._send(chunk))
+                chunk = []
+                length = 0
+
+            chunk.append(entry)
+            length += len(entry[0]) + 2
+
+        if chunk:
+            output.append(self._send(chunk))
+
+        if self.take is not None:
+            _active_take.name = self.take
+            self.take = None
+
+        return "".join(output)
+
+    def _send(self, chunk):
+
+        result = _hscript("; ".join([entry[0] for entry in chunk]))
+        if not result[1]:
+            return result[0]
+
+        if len(chunk) > 1:
+            for command, error_class, message, idempotent in chunk:
+                if not idempotent:
+                    continue
+
+                replay = _hscript(command)
+                if replay[1]:
+                    _raiseCommandError(error_class, message, replay[1])
+
+            # The error comes from a command which can't be replayed
+            for command, error_class, message, idempotent in chunk:
+                if not idempotent:
+                    _raiseCommandError(error_class, message, result[1])
+
+        _raiseCommandError(chunk[0][1], chunk[0][2], result[1])
+
+# Commands read by hscript without editing the scene, they are still sent inside a batch() block
+_READ_COMMANDS = frozenset(["takels", "takescript", "echo"])
+
+# Commands which fail if sent twice
+_NOT_IDEMPOTENT_COMMANDS = frozenset(["takeadd", "takerm", "takename", "takemove", "takemerge"])
+
+def _commandName(command):
+
+    return command.split(None, 1)[0] if command.strip() else ""
+
+def _isIdempotent(command):
+
+    return not _commandName(command) in _NOT_IDEMPOTENT_COMMANDS
+
+class _Transaction(object):
+    '''
+        Commands recorded by a batch() block, sent by commit() in a single
+        undo group.
+    '''
+
+    def __init__(self, label):
+
+        self.label = label
+        self.buffer = _CommandBuffer()
+
+    def record(self, commands):
+        '''
+            Record a list of command buffer entries, return False ( nothing is
+            recorded ) if they read the scene.
+        '''
+        for entry in commands:
+            if _commandName(entry[0]) in _READ_COMMANDS:
+                return False
+
+        self.buffer.commands.extend(commands)
+        return True
+
+    def commit(self):
+
+        if not len(self.buffer):
+            return
+
+        undo_labels = hou.undos.undoLabels()
+        try:
+            with hou.undos.group(self.label):
+                self.buffer.flush()
+
+        except:
+            # Nothing to undo if the first command failed, the entry
+            # on top of the stack isn't ours
+            if hou.undos.undoLabels() != undo_labels:
+                hou.undos.performUndo()
+            refresh()
+            raise
+
+# Transaction of the running batch() block
+_transaction = None
+
+def _raiseCommandError(error_class, message, hscript_error):
+
+    # A failed batch may have stopped on any take
+    _active_take.invalidate()
+
+    if message is None:
+        message = hscript_error
+    raise error_class(message)
+
+class _ActiveTake(object):
     '''
-        Read take data and create Take() object from it.
+        Name of the current take, checked against $ACTIVETAKE ( expanding it is not
+        an hscript call ) before a switch is skipped, so "takeset" is not sent when
+        the take is already the current one, even if it was switched outside of
+        PyTake2 ( Take List ... ). Inside a batch() block the scene is not edited
+        yet, the name updated by every switch made by PyTake2 is used.
+        While an activeTake() block is running, the switches back to Main done at
+        the end of some operations ( restore() ) go back to the block's take instead,
+        the block restores the previous take once at exit.
     '''
-    
-    if not take_name in _listTakeNames():
-        raise TakeError(take_name + " not found in take list.")
-    
-    script = hou.hscript("takescript " + take_name)
+
+    def __init__(self):
+
+        self.name = None
+        self.blocks = []
+
+    def get(self):
+
+        if _transaction is None or self.name is None:
+            self.name = hou.expandString("$ACTIVETAKE")
+        return self.name
+
+    def invalidate(self):
+
+        self.name = None
+
+    def reset(self, name):
+        '''
+            Called after a command which may have switched the current take:
+            inside a batch() block the scene can't be read, the current take
+            is switched to name, else it is read again when needed.
+        '''
+        self.name = None
+        if _transaction is not None:
+            self.set(name)
+
+    def set(self, name, error_class=None, message=None):
+
+        if name == self.get():
+            return
+
+        result = _hscript("takeset " + name)
+        if result[1]:
+            _raiseCommandError(error_class or TakeSetError, message, result[1])
+
+        self.name = name
+
+    def bufferSet(self, buffer, name, error_class=None, message=None):
+        '''
+            Same as set() but the "takeset" command is added to a command buffer.
+        '''
+        if buffer.take is not None:
+            current = buffer.take
+        else:
+            current = self.get()
+
+        if name == current:
+            return
+
+        buffer.add("takeset " + name, error_class or TakeSetError, message)
+        buffer.take = name
+
+    def restore(self, name):
+
+        if self.blocks:
+            name = self.blocks[-1]
+        self.set(name)
+
+_active_take = _ActiveTake()
+
+# Identity map of the Take objects returned by PyTake2, by take name: as long as a
+# Take object is referenced, the same object is returned for its take and its
+# members are only read again once discarded by _invalidateTakes().
+_live_takes = weakref.WeakValueDictionary()
+
+def _takeProxy(take_name, new=False):
+    '''
+        Return the live Take() object of an existing take, or create one without
+        reading its data, take's members are read on first access.
+        new: (bool) Always create a new object ( newly created take ).
+    '''
+
+    if not new:
+        out_take = _live_takes.get(take_name)
+        if out_take is not None:
+            return out_take
+
+    parent = _take_index.parentOf(take_name)
+    if parent == "Main":
+        parent = ""
+
+    out_take = Take(take_name, parent=parent, _add_to_scene=False)
+    out_take.take_members = None
+    _live_takes[take_name] = out_take
+    return out_take
+
+def _invalidateTakes(take_names=None):
+    '''
+        Discard the members of the live Take objects of the given takes ( all if None ),
+        they are read again on next access.
+    '''
+    if take_names is None:
+        take_names = list(_live_takes.keys())
+
+    for take_name in take_names:
+        take = _live_takes.get(take_name)
+        if take is not None:
+            take.take_members = None
+
+    _events.prune()
+
+def _takeScript(take_name):
+    '''
+        Return the output of "takescript" for the given take.
+    '''
+
+    script = _hscript("takescript " + take_name)
     if script[1]:
         raise TakeError(script[1])
-    
+
+    return script[0]
+
+# Header of the files written by exportTakes()
+_EXPORT_FORMAT = "pytake2_takes"
+_EXPORT_VERSION = 2
+
+# Number of takes read at once by exportTakes()
+_EXPORT_CHUNK_SIZE = 500
+
+# Line echoed before each take script read by _readScripts()
+_SCRIPT_MARKER = "__pytake2_takescript__"
+
+def _takeScripts(take_names):
+    '''
+        Return a dictionnary {take name: "takescript" output} for the given takes,
+        all the scripts are read by a single command buffer and split on markers.
+    '''
+
+    buffer = _CommandBuffer()
+    for take_name in take_names:
+        buffer.add("echo {0} {1}".format(_SCRIPT_MARKER, take_name))
+        buffer.add("takescript " + take_name)
+
+    scripts = {}
+    lines = None
+    for line in buffer.flush().split("\n"):
+
+        if line.startswith(_SCRIPT_MARKER):
+            lines = []
+            scripts[line[len(_SCRIPT_MARKER):].strip()] = lines
+
+        elif lines is not None:
+            lines.append(line)
+
+    return dict((k, "\n".join(v)) for k, v in scripts.items())
+
+def _readScripts(take_names):
+    '''
+        Read the data of several takes at once and return a list of Take() objects,
+        the live Take objects whose members are already read are not read again.
+    '''
+
+    return _readMembers(take_names)
+
+def _readMembers(takes):
+    '''
+        Return a list of Take objects from a list of Take objects or take names,
+        the members of all the takes not read yet are read with a single command buffer.
+    '''
+    take_objects = []
+    names = []
+    for take in takes:
+        if not isinstance(take, Take):
+            if not _take_index.find(take):
+                raise TakeError("Can not find take: " + take)
+            take = _takeProxy(take)
+
+        if take._take_members is None:
+            names.append(take.name)
+        take_objects.append(take)
+
+    scripts = _takeScripts(names)
+    for take in take_objects:
+        if take._take_members is None:
+            take.take_members = _parseScript(scripts.get(take.name, ""))
+
+    return take_objects
+
+def _readScript(take_name, make_current=True):
+    '''
+        Read take data and create Take() object from it.
+    '''
+
+    if not _take_index.find(take_name):
+        raise TakeError(take_name + " not found in take list.")
+
+    out_take = _takeProxy(take_name)
+    if out_take._take_members is None:
+        out_take.take_members = _parseScript(_takeScript(take_name))
+
     # Make current take
     if make_current:
-        result = hou.hscript("takeset " + take_name)
-        if result[1]:
-            raise TakeError(result[1])
-    
+        _active_take.set(take_name, TakeError)
+
+    #returnToMainTake()
+    return out_take
+
+# Flags of "takeinclude" lines and the member labels they are stored with
+_FLAG_LABELS = {"r": "render_flag",
+                "d": "display_flag",
+                "b": "bypass_flag"}
+_FLAG_METHODS = {"r": "isRenderFlagSet",
+                 "d": "isDisplayFlagSet",
+                 "b": "isBypassed"}
+_FLAG_LETTERS = dict((label, letter) for letter, label in _FLAG_LABELS.items())
+
+# Bits of TakeMember's flags mask, and the order flags are listed in
+_FLAG_BITS = {"r": 1, "d": 2, "b": 4}
+_FLAG_ORDER = ("r", "d", "b")
+
+def _flagBit(flag):
+    '''
+        Return the TakeMember's mask bit of a flag label ( "display_flag" ) or letter ( "d" ).
+    '''
+    letter = _FLAG_LETTERS.get(flag, flag)
+    if not letter in _FLAG_BITS:
+        raise InvalidFlagType("Unknown flag: " + str(flag))
+
+    return _FLAG_BITS[letter]
+
+def _checkFlag(node, letter):
+    '''
+        Raise InvalidFlagType if the flag letter is unknown or if the node doesn't have this flag.
+    '''
+    if not letter in _FLAG_BITS:
+        raise InvalidFlagType("Unknown flag: " + str(letter))
+
+    if not hasattr(node, _FLAG_METHODS[letter]):
+        raise InvalidFlagType("Node: {0} does not have {1}.".format(node.path(),
+                                                                   _FLAG_LABELS[letter]))
+
+def _parmNames(parms):
+    '''
+        Generator of the parameter names of names, hou.Parm or hou.ParmTuple
+        ( names of all its components ) objects.
+    '''
+    for parm in parms:
+        if isinstance(parm, str):
+            yield parm
+        elif isinstance(parm, hou.ParmTuple):
+            for p in parm:
+                yield p.name()
+        else:
+            yield parm.name()
+
+# Parameter names are shared by all the members
+try:
+    _intern = sys.intern
+except AttributeError:
+    _intern = intern
+
+# Ordered set of TakeMember's parameter names, dictionnaries keep their
+# insertion order from Python 3.7
+if sys.version_info >= (3, 7):
+    _OrderedSet = dict
+else:
+    _OrderedSet = collections.OrderedDict
+
+def _tokenizeInclude(line):
+    '''
+        Split a "takeinclude" line.
+        Return a tuple (flags, node_path, parm names) where flags is a string of
+        the flag letters found ( "qd" for "takeinclude -q -d /obj/geo1" ),
+        or None if the line has no node path.
+    '''
+
+    if '"' in line or "'" in line:
+        tokens = shlex.split(line)
+    else:
+        tokens = line.split()
+
+    flags = ""
+    i = 1
+    while i < len(tokens) and tokens[i].startswith("-"):
+        flags += tokens[i][1:]
+        i += 1
+
+    if i >= len(tokens):
+        return None
+
+    return flags, tokens[i], tokens[i + 1:]
+
+def _flagValue(node, flag):
+
+    if flag == "d":
+        return node.isDisplayFlagSet()
+    elif flag == "r":
+        return node.isRenderFlagSet()
+    return node.isBypassed()
+
+def _parseScript(script):
+    '''
+        Parse the output of "takescript" and return take's members dictionnary.
+        Each node is looked up once and parm tuples are resolved with a single
+        parmTuple() lookup. Values are not evaluated here, see TakeMember.
+    '''
+
     data_dict = {}
-    
-    script = [n for n in script[0].split("\n") if n.startswith("takeinclude")]
-    
-    for line in script:
-
-        line = line.replace(" -q","")
-        
-        # Display flag found
-        def includeFlagToDic(flag, flag_label):
-            if flag in line:
-                node_path = line.split(" ")[-1]
-                
-                n = hou.node(node_path)
-                if n:
-                    if flag == "-d":
-                        flag_val = n.isDisplayFlagSet()
-                    elif flag == "-r":
-                        flag_val = n.isRenderFlagSet()
-                    else:
-                        flag_val = n.isBypassed()
-                    
-                    if node_path not in data_dict.keys():
-                        data_dict[node_path] = {flag_label:flag_val}
-                    else:
-                        tmp = data_dict[node_path]
-                        tmp[flag_label] = flag_val
-                        data_dict[node_path] = tmp
-            
-        # Render flag found
-        if "-r" in line:
-            includeFlagToDic("-r", "render_flag")
-            
-        # Display flag found
-        elif "-d" in line:
-            includeFlagToDic("-d", "display_flag")
-            
-        # Bypass flag found
-        elif "-b" in line:
-            includeFlagToDic("-b", "bypass_flag")
-        
-        # No flags found
+    nodes = {}
+
+    for line in script.split("\n"):
+
+        if not line.startswith("takeinclude"):
+            continue
+
+        entry = _tokenizeInclude(line)
+        if entry is None:
+            continue
+
+        flags, node_path, parm_names = entry
+
+        if node_path in nodes:
+            n = nodes[node_path]
         else:
-            line_list = line.split(" ")
-            node_path = line_list[1]
             n = hou.node(node_path)
-            if not n:
+            nodes[node_path] = n
+
+        if n is None:
+            continue
+
+        members = data_dict.get(node_path)
+        if members is None:
+            members = TakeMember(node=n)
+
+        for flag in flags:
+            if flag in _FLAG_LABELS:
+                members.addFlag(flag)
+
+        for parm_name in parm_names:
+
+            # Parm tuple, or single parm which is also a tuple of size 1
+            parm_tuple = n.parmTuple(parm_name)
+            if parm_tuple is not None and parm_tuple.name() == parm_name:
+                members.addParm(parm_tuple)
                 continue
-            
-            parm_name = line_list[2]
-            
-            # If parm exists
-            if n.parm(parm_name):
-                if node_path in data_dict:
-                    tmp = data_dict[node_path]
-                    tmp[parm_name] = n.parm(parm_name).eval()
-                    data_dict[node_path] = tmp
-                else:
-                    data_dict[node_path] = {parm_name:n.parm(parm_name).eval()}
-            
+
+            # Component of a parm tuple ( "tx" )
+            parm = n.parm(parm_name)
+            if parm is not None:
+                members.addParm(parm_name)
+
+        if not members.isEmpty():
+            data_dict[node_path] = members
+
+    return data_dict
+
+################
+# Scene events #
+################
+
+# Notifications published to the subscribers ( see subscribe() )
+TAKE_CHANGED = "take_changed"
+TREE_CHANGED = "tree_changed"
+SCENE_REPLACED = "scene_replaced"
+
+class _EventBus(object):
+    '''
+        Publish the scene changes to PyTake2's caches then to the subscribers.
+        Changes come from the hipFile events ( SCENE_REPLACED ), the events of the
+        nodes included in the live takes ( deleted or renamed: TAKE_CHANGED ) and
+        from checkScene() which compares the take list and the take scripts with
+        the previous check ( TREE_CHANGED, TAKE_CHANGED ).
+    '''
+
+    def __init__(self):
+
+        # [(callback, events or None)]
+        self.subscribers = []
+
+        # Watched nodes, by path
+        self.nodes = {}
+        # Number of watched nodes after the last prune()
+        self.pruned_size = 0
+
+        # ( takels output, {take name: script hash} ) of the last checkScene()
+        self.fingerprint = None
+
+        # Changes made by PyTake2 since the last checkScene(), not published
+        self.edited_takes = set()
+        self.edited_tree = False
+
+        # Polling from the event loop
+        self.poll_interval = 0.0
+        self.last_poll = 0.0
+
+    def subscribe(self, callback, events=None):
+
+        self.unsubscribe(callback)
+        if isinstance(events, str):
+            events = [events]
+        self.subscribers.append((callback, None if events is None else frozenset(events)))
+
+    def unsubscribe(self, callback):
+
+        self.subscribers = [(c, e) for c, e in self.subscribers if c != callback]
+
+    def publish(self, event, take_names=None):
+
+        take_names = list(take_names or [])
+
+        # PyTake2's caches
+        if event == SCENE_REPLACED:
+            _take_index.invalidate()
+            _active_take.invalidate()
+            _invalidateTakes()
+            _live_takes.clear()
+            self.unwatchAll()
+            self.fingerprint = None
+            self.edited_takes.clear()
+            self.edited_tree = False
+
+        elif event == TREE_CHANGED:
+            _take_index.invalidate()
+            _active_take.invalidate()
+
+        else:
+            _invalidateTakes(take_names)
+
+        # An error in a subscriber doesn't stop the others
+        for callback, events in list(self.subscribers):
+            if events is None or event in events:
+                try:
+                    callback(event, take_names)
+                except Exception:
+                    traceback.print_exc()
+
+    # Nodes
+    def watch(self, members):
+        '''
+            Watch the nodes of a members dictionnary, the nodes already
+            watched keep their callbacks.
+        '''
+        for node_path, member in members.items():
+            if not node_path in self.nodes and member.node is not None:
+                self.watchNode(member.node)
+
+    def watchNode(self, node):
+
+        node_path = node.path()
+        if node_path in self.nodes:
+            return
+
+        # Nodes of the Take objects collected since the last prune
+        if len(self.nodes) >= 2 * max(self.pruned_size, 512):
+            self.prune()
+
+        try:
+            _removeNodeCallbacks(node)
+            node.addEventCallback((hou.nodeEventType.BeingDeleted,
+                                   hou.nodeEventType.NameChanged), _onNodeEvent)
+
+        # Node events not available in this version of Houdini
+        except AttributeError:
+            return
+
+        self.nodes[node_path] = node
+
+    def unwatchNode(self, node_path):
+
+        node = self.nodes.pop(node_path, None)
+        if node is None:
+            return
+
+        try:
+            node.removeEventCallback((hou.nodeEventType.BeingDeleted,
+                                      hou.nodeEventType.NameChanged), _onNodeEvent)
+        except (hou.ObjectWasDeleted, hou.OperationFailed):
+            pass
+
+    def unwatchAll(self):
+
+        for node_path in list(self.nodes):
+            self.unwatchNode(node_path)
+        self.pruned_size = 0
+
+    def prune(self):
+        '''
+            Stop watching the nodes which are no longer members of a live take
+            ( takes removed or Take objects collected ). The nodes of an invalidated
+            take are the ones of its last members.
+        '''
+        used = set()
+        for take in list(_live_takes.values()):
+            if take._take_members is not None:
+                used.update(take._take_members)
             else:
-                for i in xrange(12):
-                    tmp_parm = n.parm(parm_name + str(i))
-                    if tmp_parm:
-                        if node_path in data_dict:
-                            tmp = data_dict[node_path]
-                            tmp[tmp_parm.name()] = n.parm(tmp_parm.name()).eval()
-                            data_dict[node_path] = tmp
-                        else:
-                            data_dict[node_path] = {tmp_parm.name():\
-                                                    n.parm(tmp_parm.name()).eval()}
-                            
-                for i in ['x','y','z','u','v','w']:
-                    tmp_parm = n.parm(parm_name + str(i))
-                    if tmp_parm:
-                        if node_path in data_dict:
-                            tmp = data_dict[node_path]
-                            tmp[tmp_parm.name()] = n.parm(tmp_parm.name()).eval()
-                            data_dict[node_path] = tmp
-                        else:
-                            data_dict[node_path] = {tmp_parm.name():\
-                                                    n.parm(tmp_parm.name()).eval()}
-            
-    
-    out_take = Take(take_name, _add_to_scene=False)
-    out_take.take_members = data_dict.copy()
-    
-    #returnToMainTake()
-    return out_take
+                used.update(take._watched_nodes)
+
+        for node_path in list(self.nodes):
+            if not node_path in used:
+                self.unwatchNode(node_path)
+
+        self.pruned_size = len(self.nodes)
+
+    def nodeChanged(self, node, event_type):
+
+        # Path of the node when it was watched, a renamed node has a new path
+        node_path = node.path()
+        if not node_path in self.nodes:
+            node_path = None
+            for path, watched in list(self.nodes.items()):
+                if watched == node:
+                    node_path = path
+                    break
+
+        if node_path is None:
+            return
+
+        del self.nodes[node_path]
+        if event_type != hou.nodeEventType.BeingDeleted:
+            self.watchNode(node)
+
+        take_names = [name for name, take in list(_live_takes.items())
+                      if take._take_members is not None and node_path in take._take_members]
+
+        if take_names:
+            self.publish(TAKE_CHANGED, take_names)
+
+    # Polling
+    def edited(self, take_names=(), tree=False):
+        '''
+            Called after PyTake2 changed the given takes ( and the take tree if tree
+            is True ), the next check() records these changes without publishing them.
+        '''
+        if self.fingerprint is None:
+            return
+
+        self.edited_takes.update(take_names)
+        self.edited_tree = self.edited_tree or tree
+
+    def check(self):
+
+        result = _hscript("takels")
+        if result[1]:
+            raise TakeError(result[1])
+
+        names = [n for n in _parseTakeList(result[0])[0] if n != "Main"]
+        scripts = _takeScripts(names)
+        hashes = dict((n, hash(scripts.get(n, "").strip())) for n in names)
+
+        previous = self.fingerprint
+        self.fingerprint = (result[0], hashes)
+
+        edited_takes = self.edited_takes
+        edited_tree = self.edited_tree
+        self.edited_takes = set()
+        self.edited_tree = False
+
+        if previous is None:
+            return []
+
+        events = []
+        if previous[0] != result[0] and not edited_tree:
+            self.publish(TREE_CHANGED, names)
+            events.append(TREE_CHANGED)
+
+        changed = [n for n in names if previous[1].get(n) != hashes[n]
+                   and not n in edited_takes]
+        if changed:
+            self.publish(TAKE_CHANGED, changed)
+            events.append(TAKE_CHANGED)
+
+        return events
+
+    def poll(self):
+
+        now = time.time()
+        if now - self.last_poll < self.poll_interval:
+            return
+
+        self.last_poll = now
+        try:
+            self.check()
+        except TakeError:
+            pass
+
+# Bus of a previous import of the module ( reload ), its node callbacks are removed
+_previous_events = globals().get("_events")
+_events = _EventBus()
+
+def subscribe(callback, events=None):
+    '''
+        Call callback( event, take names ) when takes are changed outside of PyTake2:
+        TAKE_CHANGED: the members of the takes changed ( take list UI, undo, deleted nodes ... )
+        TREE_CHANGED: takes added, removed, renamed or moved, take names is the new take list.
+        SCENE_REPLACED: a hip file was loaded, merged or cleared, take names is empty.
+        events: (str or list) Events to be notified of, all if None.
+        PyTake2's own caches are updated before the subscribers are called.
+        Changes which don't raise any Houdini event are found by checkScene().
+    '''
+    _events.subscribe(callback, events)
+
+def unsubscribe(callback):
+    '''
+        Stop calling a callback added with subscribe().
+    '''
+    _events.unsubscribe(callback)
+
+def checkScene():
+    '''
+        Compare the take list and the take scripts with the previous call and publish
+        the changes ( TREE_CHANGED, TAKE_CHANGED ), return the list of published events.
+        The changes made by PyTake2 itself are not published.
+        The first call only records the scene. Costs two hscript calls.
+    '''
+    return _events.check()
+
+def setPolling(interval=1.0):
+    '''
+        Call checkScene() from Houdini's event loop, at most every interval seconds,
+        0 or None stops the polling. Only available with Houdini's UI.
+    '''
+    try:
+        hou.ui.removeEventLoopCallback(_events.poll)
+    except (AttributeError, hou.OperationFailed):
+        pass
+
+    _events.poll_interval = interval or 0.0
+    if not interval:
+        return
+
+    try:
+        hou.ui.addEventLoopCallback(_events.poll)
+    except AttributeError:
+        _events.poll_interval = 0.0
+        raise TakeError("Polling needs Houdini's UI, call checkScene() instead.")
+
+def _removeNodeCallbacks(node):
+    '''
+        Remove the _onNodeEvent callbacks of this module from a node, including
+        the ones added by a previous import of the module ( reload ).
+    '''
+    for event_types, callback in node.eventCallbacks():
+        if getattr(callback, "__name__", "") == "_onNodeEvent" and \
+           getattr(callback, "__module__", "") == __name__:
+            node.removeEventCallback(event_types, callback)
+
+def _onNodeEvent(node=None, event_type=None, **kwargs):
+    '''
+        A watched node was deleted or renamed.
+    '''
+    _events.nodeChanged(node, event_type)
+
+def _onHipFileEvent(event_type):
+    '''
+        Discard PyTake2's caches when the scene is replaced ( new, load, merge ).
+    '''
+    if event_type in (hou.hipFileEventType.AfterClear,
+                      hou.hipFileEventType.AfterLoad,
+                      hou.hipFileEventType.AfterMerge):
+        _events.publish(SCENE_REPLACED)
+
+def _registerEventCallbacks():
+    '''
+        Register the scene event callbacks, replacing the ones added
+        by a previous import of the module ( reload ).
+    '''
+    try:
+        hip_file = hou.hipFile
+        for callback in hip_file.eventCallbacks():
+            if getattr(callback, "__name__", "") == "_onHipFileEvent" and \
+               getattr(callback, "__module__", "") == __name__:
+                hip_file.removeEventCallback(callback)
+
+        hip_file.addEventCallback(_onHipFileEvent)
+
+    # hipFile events not available in this version of Houdini
+    except AttributeError:
+        pass
+
+    global _previous_events
+    if _previous_events is not None:
+        for node in list(_previous_events.nodes.values()):
+            try:
+                _removeNodeCallbacks(node)
+            except (AttributeError, hou.ObjectWasDeleted):
+                pass
+        _previous_events = None
+
+_registerEventCallbacks()
 
 ##################
 # Errors classes #
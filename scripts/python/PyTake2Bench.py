@@ -0,0 +1,662 @@
+import json
+import sys
+import time
+
+# Outside of Houdini, "--fake" runs the benchmarks on the PyTake2FakeHou stand-in
+if __name__ == "__main__" and "--fake" in sys.argv:
+    import PyTake2FakeHou
+    PyTake2FakeHou.install()
+
+import hou
+import PyTake2
+
+#
+# PyTake2 benchmarks, to be run in a Houdini session ( hython or python shell ):
+#
+#     import PyTake2Bench
+#     PyTake2Bench.run()
+#     PyTake2Bench.runSuite()
+#
+# or outside of Houdini with the fake hou module:
+#
+#     python PyTake2Bench.py --fake --latency 0.0001 --output bench.jsonl
+#     python PyTake2Bench.py --fake --baseline bench.jsonl
+#
+# Each benchmark reports the number of hou.hscript() round-trips and the wall time.
+# Nodes and takes created by the benchmarks are removed at the end.
+#
+
+BENCH_PREFIX = "pytake2_bench"
+
+class HscriptCounter(object):
+    '''
+        Context manager counting the hou.hscript() calls made in its block.
+    '''
+
+    def __init__(self):
+
+        self.calls = 0
+        self.time = 0.0
+        self._hscript = None
+
+    def __enter__(self):
+
+        self._hscript = hou.hscript
+
+        def _counted(command):
+            self.calls += 1
+            return self._hscript(command)
+
+        hou.hscript = _counted
+        self._start = time.time()
+        return self
+
+    def __exit__(self, *args):
+
+        self.time = time.time() - self._start
+        hou.hscript = self._hscript
+        return False
+
+def _report(name, before, after):
+
+    print("{0}:".format(name))
+    print("    before: {0} round-trips, {1:.3f}s".format(before.calls, before.time))
+    print("    after:  {0} round-trips, {1:.3f}s".format(after.calls, after.time))
+
+def _benchNodes(parm_count):
+    '''
+        Create geometry nodes until parm_count parameters are available,
+        return the nodes and the list of parms.
+    '''
+    obj = hou.node("/obj")
+    nodes = []
+    parms = []
+    while len(parms) < parm_count:
+        node = obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, len(nodes)))
+        nodes.append(node)
+        parms.extend(node.parms())
+
+    return nodes, parms[:parm_count]
+
+def _cleanup(nodes):
+
+    PyTake2.returnToMainTake()
+    for take in PyTake2.ls(name_only=True):
+        if take.startswith(BENCH_PREFIX):
+            take = PyTake2.Take(take, _add_to_scene=False)
+            if take.existInScene():
+                take.remove(recursive=True)
+    for node in nodes:
+        node.destroy()
+
+def _legacyIncludeParms(take, parms):
+    '''
+        One "takeinclude" per parameter, as Take.includeParms() did before
+        the command buffer.
+    '''
+    take.setCurrent()
+    for parm in parms:
+        result = hou.hscript("takeinclude {0} {1}".format(parm.node().path(),
+                                                          parm.name()))
+        if result[1]:
+            raise PyTake2.TakeSetError(result[1])
+
+def benchIncludeParms(parm_count=2000):
+    '''
+        Include parm_count parameters in a take, per-parm hscript calls
+        versus Take.includeParms().
+    '''
+    nodes, parms = _benchNodes(parm_count)
+    try:
+        take_before = PyTake2.Take(BENCH_PREFIX + "_legacy")
+        with HscriptCounter() as before:
+            _legacyIncludeParms(take_before, parms)
+
+        take_after = PyTake2.Take(BENCH_PREFIX + "_buffered")
+        with HscriptCounter() as after:
+            take_after.includeParms(parms)
+
+        _report("includeParms ({0} parms)".format(parm_count), before, after)
+
+    finally:
+        _cleanup(nodes)
+
+def benchIncludeParmsFromNode(node_count=100, parms_name_filter=("t*", "r*", "s*")):
+    '''
+        Include filtered parameters from node_count nodes, per-parm hscript
+        calls versus Take.includeParmsFromNode().
+    '''
+    obj = hou.node("/obj")
+    nodes = [obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, i))
+             for i in range(node_count)]
+    try:
+        parms = [p for n in nodes for p in n.parms()
+                 if any(hou.patternMatch(f, p.name()) for f in parms_name_filter)]
+
+        take_before = PyTake2.Take(BENCH_PREFIX + "_legacy")
+        with HscriptCounter() as before:
+            for node in nodes:
+                _legacyIncludeParms(take_before,
+                                    [p for p in parms if p.node() == node])
+
+        take_after = PyTake2.Take(BENCH_PREFIX + "_buffered")
+        with HscriptCounter() as after:
+            for node in nodes:
+                take_after.includeParmsFromNode(node, list(parms_name_filter))
+
+        _report("includeParmsFromNode ({0} nodes, filtered)".format(node_count),
+                before, after)
+
+    finally:
+        _cleanup(nodes)
+
+def benchIncludeNodes(node_count=500):
+    '''
+        Include then exclude whole nodes, one Take.includeParmsFromNode()
+        call per node versus a single call with all the nodes.
+    '''
+    obj = hou.node("/obj")
+    nodes = [obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, i))
+             for i in range(node_count)]
+    try:
+        take_before = PyTake2.Take(BENCH_PREFIX + "_per_node")
+        with HscriptCounter() as before:
+            for node in nodes:
+                take_before.includeParmsFromNode(node)
+            for node in nodes:
+                take_before.includeParmsFromNode(node, include=False)
+
+        take_after = PyTake2.Take(BENCH_PREFIX + "_bulk")
+        with HscriptCounter() as after:
+            take_after.includeParmsFromNode(nodes)
+            take_after.includeParmsFromNode(nodes, include=False)
+
+        _report("includeParmsFromNode ({0} whole nodes)".format(node_count), before, after)
+        if take_before.take_members or take_after.take_members:
+            print("    WARNING: excluded nodes are still members")
+
+    finally:
+        _cleanup(nodes)
+
+def benchIncludeFlags(node_count=300):
+    '''
+        Include and turn off the display flag of node_count nodes, per-node
+        hscript calls versus Take.includeFlags().
+    '''
+    obj = hou.node("/obj")
+    nodes = [obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, i))
+             for i in range(node_count)]
+    try:
+        take_before = PyTake2.Take(BENCH_PREFIX + "_legacy")
+        with HscriptCounter() as before:
+            for node in nodes:
+                take_before.setCurrent()
+                hou.hscript("takeinclude -d " + node.path())
+                node.setDisplayFlag(False)
+
+        take_after = PyTake2.Take(BENCH_PREFIX + "_flags")
+        with HscriptCounter() as after:
+            take_after.includeFlags(nodes, "display_flag", set_flag=True, flag_value=False)
+
+        _report("includeFlags ({0} nodes)".format(node_count), before, after)
+
+    finally:
+        _cleanup(nodes)
+
+def benchBatch(take_count=200):
+    '''
+        Create take_count takes including a node each, immediate edits versus
+        the same edits inside a PyTake2.batch() block.
+    '''
+    obj = hou.node("/obj")
+    nodes = [obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, i))
+             for i in range(take_count)]
+    try:
+        with HscriptCounter() as before:
+            for node in nodes:
+                take = PyTake2.Take(BENCH_PREFIX + "_immediate")
+                take.includeParmsFromNode(node)
+                take.includeDisplayFlag(node)
+
+        with HscriptCounter() as after:
+            with PyTake2.batch():
+                for node in nodes:
+                    take = PyTake2.Take(BENCH_PREFIX + "_batch")
+                    take.includeParmsFromNode(node)
+                    take.includeDisplayFlag(node)
+
+        _report("batch ({0} takes)".format(take_count), before, after)
+
+    finally:
+        _cleanup(nodes)
+
+def _legacyParseScript(script):
+    '''
+        Substring based parser with parm tuple probing, as _readScript() did
+        before the takeinclude tokenizer.
+    '''
+    data_dict = {}
+    for line in [n for n in script.split("\n") if n.startswith("takeinclude")]:
+
+        line = line.replace(" -q", "")
+
+        flag = None
+        for f, label in (("-r", "render_flag"), ("-d", "display_flag"),
+                         ("-b", "bypass_flag")):
+            if f in line:
+                flag = (f, label)
+                break
+
+        if flag:
+            n = hou.node(line.split(" ")[-1])
+            if n:
+                data_dict.setdefault(n.path(), {})[flag[1]] = \
+                    PyTake2._flagValue(n, flag[0][1])
+            continue
+
+        line_list = line.split(" ")
+        n = hou.node(line_list[1])
+        if not n:
+            continue
+
+        parm_name = line_list[2]
+        if n.parm(parm_name):
+            data_dict.setdefault(n.path(), {})[parm_name] = n.parm(parm_name).eval()
+            continue
+
+        for i in list(range(12)) + ['x', 'y', 'z', 'u', 'v', 'w']:
+            tmp_parm = n.parm(parm_name + str(i))
+            if tmp_parm:
+                data_dict.setdefault(n.path(), {})[tmp_parm.name()] = \
+                    n.parm(tmp_parm.name()).eval()
+
+    return data_dict
+
+def _syntheticScript(nodes, line_count):
+    '''
+        Build a take script of line_count "takeinclude" lines on the given nodes.
+    '''
+    patterns = ["takeinclude -q {0} t", "takeinclude -q {0} r",
+                "takeinclude -q {0} s", "takeinclude -q {0} scale",
+                "takeinclude -q {0} tx", "takeinclude -q -d {0}",
+                "takeinclude -q -r {0}"]
+    lines = ["takeadd -c -p Main {0}_script".format(BENCH_PREFIX)]
+    i = 0
+    while len(lines) <= line_count:
+        node_path = nodes[i % len(nodes)].path()
+        lines.append(patterns[(i // len(nodes)) % len(patterns)].format(node_path))
+        i += 1
+
+    return "\n".join(lines) + "\n"
+
+def benchParseScript(line_count=50000, node_count=200):
+    '''
+        Parse a synthetic take script of line_count lines, legacy parser
+        versus PyTake2._parseScript().
+    '''
+    obj = hou.node("/obj")
+    nodes = [obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, i))
+             for i in range(node_count)]
+    try:
+        script = _syntheticScript(nodes, line_count)
+
+        start = time.time()
+        legacy = _legacyParseScript(script)
+        legacy_time = time.time() - start
+
+        start = time.time()
+        parsed = PyTake2._parseScript(script)
+        parse_time = time.time() - start
+
+        print("parseScript ({0} lines, {1} nodes):".format(line_count, node_count))
+        print("    before: {0:.3f}s".format(legacy_time))
+        print("    after:  {0:.3f}s".format(parse_time))
+        if parsed != legacy:
+            print("    WARNING: parsers results differ")
+
+    finally:
+        _cleanup(nodes)
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+def _benchWideNode(parm_count):
+    '''
+        Create a geometry node with parm_count more float parameters
+        ( "a0", "b1", "c2" ... ).
+    '''
+    node = hou.node("/obj").createNode("geo", BENCH_PREFIX + "_wide")
+
+    group = node.parmTemplateGroup()
+    for i in range(parm_count):
+        name = "{0}{1}".format(_LETTERS[i % len(_LETTERS)], i)
+        group.append(hou.FloatParmTemplate(name, name, 1))
+    node.setParmTemplateGroup(group)
+
+    return node
+
+def _comparePatternMatch(name, nodes, filters):
+
+    start = time.time()
+    legacy = []
+    for node in nodes:
+        for parm in node.parms():
+            for f in filters:
+                if hou.patternMatch(f, parm.name()):
+                    legacy.append(parm)
+                    break
+    legacy_time = time.time() - start
+
+    PyTake2._parm_matches.clear()
+    start = time.time()
+    matched = []
+    for node in nodes:
+        matched.extend(PyTake2._matchParms(node, filters))
+    match_time = time.time() - start
+
+    print("{0}:".format(name))
+    print("    before: {0:.3f}s".format(legacy_time))
+    print("    after:  {0:.3f}s".format(match_time))
+    if [p.path() for p in matched] != [p.path() for p in legacy]:
+        print("    WARNING: matches differ")
+
+def benchPatternMatch(node_count=200, filter_count=20, wide_parm_count=2000):
+    '''
+        Filter parameters with filter_count patterns, hou.patternMatch() loops versus
+        the compiled patterns of PyTake2._matchParms(), on node_count nodes and on a
+        single node with wide_parm_count parameters.
+    '''
+    filters = ["{0}*".format(_LETTERS[i % len(_LETTERS)] * (1 + i // len(_LETTERS)))
+               for i in range(filter_count - 1)] + ["t* ^tz"]
+
+    obj = hou.node("/obj")
+    nodes = [obj.createNode("geo", "{0}_{1}".format(BENCH_PREFIX, i))
+             for i in range(node_count)]
+    try:
+        _comparePatternMatch("patternMatch ({0} nodes, {1} filters)".format(node_count,
+                                                                           filter_count),
+                             nodes, filters)
+    finally:
+        _cleanup(nodes)
+
+    wide_node = _benchWideNode(wide_parm_count)
+    try:
+        _comparePatternMatch("patternMatch (1 node, {0} parms, {1} filters)".format(
+                             len(wide_node.parms()), filter_count), [wide_node], filters)
+    finally:
+        _cleanup([wide_node])
+
+def run():
+    '''
+        Run all the before / after benchmarks.
+    '''
+    benchIncludeParms()
+    benchIncludeParmsFromNode()
+    benchIncludeNodes()
+    benchIncludeFlags()
+    benchBatch()
+    benchParseScript()
+    benchPatternMatch()
+
+#########
+# Suite #
+#########
+
+# Sizes ( number of takes, parms ... ) of the suite's benchmarks
+SUITE_SIZES = (10, 100, 1000, 10000)
+
+# A benchmark is reported as a regression if its time is this factor
+# above the baseline's ( and above SUITE_MIN_TIME seconds ).
+SUITE_TIME_TOLERANCE = 1.5
+SUITE_MIN_TIME = 0.05
+
+def _suiteRoot():
+    '''
+        Create the take under which the suite's takes are created.
+    '''
+    PyTake2.returnToMainTake()
+    return PyTake2.Take(BENCH_PREFIX)
+
+def _suiteTakes(root, size, parm=None):
+    '''
+        Create size takes under root, each including parm if given.
+    '''
+    takes = []
+    for i in range(size):
+        take = PyTake2.Take(BENCH_PREFIX + "_take", parent=root)
+        if parm is not None:
+            take.includeParms(parm)
+        takes.append(take)
+
+    return takes
+
+def suiteCreate(root, size):
+    '''
+        Create size empty takes.
+    '''
+    with HscriptCounter() as counter:
+        _suiteTakes(root, size)
+    return counter
+
+def suiteCreateBulk(root, size):
+    '''
+        Create size takes including a parameter with createTakes().
+    '''
+    nodes, parms = _benchNodes(1)
+    try:
+        specs = [{"name": BENCH_PREFIX + "_take", "parent": root, "parms": parms}
+                 for i in range(size)]
+        with HscriptCounter() as counter:
+            PyTake2.createTakes(specs)
+
+    finally:
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+def suiteInclude(root, size):
+    '''
+        Include size parameters in a take.
+    '''
+    nodes, parms = _benchNodes(size)
+    try:
+        take = PyTake2.Take(BENCH_PREFIX + "_include", parent=root)
+        with HscriptCounter() as counter:
+            take.includeParms(parms)
+
+    finally:
+        PyTake2.returnToMainTake()
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+def suiteLs(root, size):
+    '''
+        List size takes with their members.
+    '''
+    nodes, parms = _benchNodes(1)
+    try:
+        _suiteTakes(root, size, parms[0])
+        with HscriptCounter() as counter:
+            PyTake2.ls()
+
+    finally:
+        PyTake2.returnToMainTake()
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+def suiteRead(root, size):
+    '''
+        Read size takes one by one with takeFromName().
+    '''
+    nodes, parms = _benchNodes(1)
+    try:
+        takes = _suiteTakes(root, size, parms[0])
+        with HscriptCounter() as counter:
+            for take in takes:
+                PyTake2.takeFromName(take.name)
+
+    finally:
+        PyTake2.returnToMainTake()
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+def suiteCopy(root, size):
+    '''
+        Copy a take size times.
+    '''
+    nodes, parms = _benchNodes(12)
+    try:
+        template = PyTake2.Take(BENCH_PREFIX + "_template", parent=root)
+        template.includeParms(parms)
+        with HscriptCounter() as counter:
+            for i in range(size):
+                template.copy(BENCH_PREFIX + "_copy")
+
+    finally:
+        PyTake2.returnToMainTake()
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+def suiteCopyBulk(root, size):
+    '''
+        Copy a take size times with a single copy() call.
+    '''
+    nodes, parms = _benchNodes(12)
+    try:
+        template = PyTake2.Take(BENCH_PREFIX + "_template", parent=root)
+        template.includeParms(parms)
+        with HscriptCounter() as counter:
+            template.copy(BENCH_PREFIX + "_copy", count=size)
+
+    finally:
+        PyTake2.returnToMainTake()
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+def suiteMerge(root, size):
+    '''
+        Merge size takes into a single take.
+    '''
+    nodes, parms = _benchNodes(size)
+    try:
+        sources = [PyTake2.Take(BENCH_PREFIX + "_source", parent=root)
+                   for i in range(size)]
+        for take, parm in zip(sources, parms):
+            take.includeParms(parm)
+
+        target = PyTake2.Take(BENCH_PREFIX + "_target", parent=root)
+        with HscriptCounter() as counter:
+            for take in sources:
+                target.includeParmsFromTake(take)
+
+    finally:
+        PyTake2.returnToMainTake()
+        for node in nodes:
+            node.destroy()
+
+    return counter
+
+SUITE = [("create", suiteCreate),
+         ("createbulk", suiteCreateBulk),
+         ("include", suiteInclude),
+         ("ls", suiteLs),
+         ("read", suiteRead),
+         ("copy", suiteCopy),
+         ("copybulk", suiteCopyBulk),
+         ("merge", suiteMerge)]
+
+def _loadResults(file_path):
+
+    results = {}
+    with open(file_path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                result = json.loads(line)
+                results[(result["bench"], result["size"])] = result
+
+    return results
+
+def runSuite(sizes=SUITE_SIZES, benches=None, output=None, baseline=None):
+    '''
+        Run the benchmark suite and return the list of results, a dictionnary
+        {"bench", "size", "calls", "time"} per benchmark and size.
+        benches: (list of str) Names of the benchmarks to run, all if None.
+        output: (str) If set, results are written to this file as JSON lines.
+        baseline: (str) Results file of a previous run, calls or time above
+                        the baseline's are reported as regressions.
+        Returns (results, regressions).
+    '''
+    reference = {}
+    if baseline:
+        reference = _loadResults(baseline)
+
+    results = []
+    regressions = []
+    for name, func in SUITE:
+        if benches and not name in benches:
+            continue
+
+        for size in sizes:
+            root = _suiteRoot()
+            try:
+                counter = func(root, size)
+            finally:
+                _cleanup([])
+
+            result = {"bench": name, "size": size,
+                      "calls": counter.calls, "time": round(counter.time, 6)}
+            results.append(result)
+
+            status = ""
+            previous = reference.get((name, size))
+            if previous is not None:
+                if result["calls"] > previous["calls"] or \
+                   (result["time"] > SUITE_MIN_TIME and
+                    result["time"] > previous["time"] * SUITE_TIME_TOLERANCE):
+                    status = "REGRESSION (baseline: {0} calls, {1:.3f}s)".format(
+                        previous["calls"], previous["time"])
+                    regressions.append(result)
+
+            print("{0:<8} {1:>6} takes: {2:>7} calls {3:>9.3f}s  {4}".format(
+                name, size, result["calls"], result["time"], status))
+
+    if output:
+        with open(output, "w") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    return results, regressions
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="PyTake2 benchmark suite.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Run on the PyTake2FakeHou stand-in.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Fake hou only: cost in seconds of one hscript call.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SUITE_SIZES))
+    parser.add_argument("--bench", nargs="+", default=None,
+                        help="Benchmarks to run: " + ", ".join(n for n, _ in SUITE))
+    parser.add_argument("--output", default=None, help="JSON lines results file.")
+    parser.add_argument("--baseline", default=None,
+                        help="Results file of a previous run to compare with.")
+    args = parser.parse_args()
+
+    if args.fake:
+        PyTake2FakeHou.setLatency(args.latency)
+
+    _, regressions = runSuite(args.sizes, args.bench, args.output, args.baseline)
+    sys.exit(1 if regressions else 0)
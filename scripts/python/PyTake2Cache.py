@@ -0,0 +1,387 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import hou
+import PyTake2
+
+#
+# On-disk cache of the takes read by PyTake2, for tools opening the same hip
+# file again and again ( validation, publishing, farm pre-flight ):
+#
+#     cache = PyTake2Cache.TakeCache()
+#     takes = cache.readAll()
+#
+# Each hip file has an entry ( one JSON-lines file ) holding the parsed members
+# of its takes and the hash of each take script. If the hip file hasn't changed
+# on disk since the entry was written, the takes are rebuilt from the entry
+# without any "takescript" call. Otherwise all the scripts are read by a single
+# batched call and only the takes whose script changed are parsed again.
+# Entries are evicted least recently used first, past max_entries or max_bytes.
+# Several processes can share a cache folder: the index is updated under a lock
+# file and eviction scans the folder, so entries missing from the index are
+# evicted as well.
+#
+
+CACHE_VERSION = 1
+
+# Default cache folder
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "pytake2_cache")
+
+# A lock file older than this ( seconds ) was left by a dead process
+LOCK_TIMEOUT = 30.0
+
+class TakeCache(object):
+    '''
+        On-disk cache of the takes of hip files.
+        directory: (str) Folder of the cache files.
+        max_entries: (int) Maximum number of hip files kept in the cache.
+        max_bytes: (int) Maximum size of the cache files.
+    '''
+
+    def __init__(self, directory=CACHE_DIR, max_entries=64, max_bytes=256 * 1024 * 1024):
+
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # Counters of the last readAll() call
+        self.stats = {"hit": False, "reused": 0, "parsed": 0}
+
+    # Entries
+    def _key(self, hip_path):
+
+        return hashlib.sha1(hip_path.encode("utf-8")).hexdigest()
+
+    def _entryPath(self, key):
+
+        return os.path.join(self.directory, key + ".jsonl")
+
+    def _indexPath(self):
+
+        return os.path.join(self.directory, "index.json")
+
+    def _loadIndex(self):
+
+        try:
+            with open(self._indexPath()) as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def _saveIndex(self, index):
+
+        _writeFile(self._indexPath(), json.dumps(index))
+
+    def _lockPath(self):
+
+        return os.path.join(self.directory, "index.lock")
+
+    def _loadEntry(self, key):
+        '''
+            Return (header, {take name: record}) of an entry, or (None, {}).
+        '''
+        try:
+            with open(self._entryPath(key)) as f:
+                header = json.loads(f.readline())
+                if header.get("version") != CACHE_VERSION:
+                    return None, {}
+
+                records = {}
+                for line in f:
+                    record = json.loads(line)
+                    records[record["name"]] = record
+
+                return header, records
+
+        except (IOError, OSError, ValueError, KeyError):
+            return None, {}
+
+    def _saveEntry(self, key, header, records):
+
+        lines = [json.dumps(header, separators=(",", ":"))]
+        for record in records:
+            lines.append(json.dumps(record, separators=(",", ":")))
+        data = "\n".join(lines) + "\n"
+
+        _writeFile(self._entryPath(key), data)
+
+        with _FileLock(self._lockPath()):
+            index = self._loadIndex()
+            index[key] = {"hip": header["hip"], "used": time.time(), "size": len(data)}
+            self._evict(index, keep=key)
+            self._saveIndex(index)
+
+    def _touch(self, key):
+
+        with _FileLock(self._lockPath()):
+            index = self._loadIndex()
+            if key in index:
+                index[key]["used"] = time.time()
+                self._saveIndex(index)
+
+    def _evict(self, index, keep=None):
+        '''
+            Remove the least recently used entries above max_entries or max_bytes.
+            The entry files of the folder are all taken into account, an entry
+            missing from the index is dated by its modification time.
+        '''
+        entries = {}
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith(".jsonl"):
+                continue
+
+            key = file_name[:-len(".jsonl")]
+            try:
+                stat = os.stat(self._entryPath(key))
+            except OSError:
+                continue
+
+            used = index[key]["used"] if key in index else stat.st_mtime
+            entries[key] = (used, stat.st_size)
+
+        # Index entries whose file was removed
+        for key in list(index):
+            if not key in entries:
+                del index[key]
+
+        keys = sorted(entries, key=lambda k: entries[k][0])
+        total = sum([entries[k][1] for k in keys])
+
+        while keys and (len(keys) > self.max_entries or total > self.max_bytes):
+            key = keys.pop(0)
+            if key == keep:
+                continue
+
+            total -= entries[key][1]
+            index.pop(key, None)
+            try:
+                os.remove(self._entryPath(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        '''
+            Remove all the entries of the cache.
+        '''
+        if not os.path.isdir(self.directory):
+            return
+
+        with _FileLock(self._lockPath()):
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith(".jsonl"):
+                    try:
+                        os.remove(os.path.join(self.directory, file_name))
+                    except OSError:
+                        pass
+
+            self._saveIndex({})
+
+    # Takes
+    def readAll(self):
+        '''
+            Return the list of all the takes of the current scene as Take objects,
+            like PyTake2.readAll(), using the cache when possible.
+        '''
+        hip_path = hou.hipFile.path()
+        key = self._key(hip_path)
+
+        names = [n for n in PyTake2.ls(name_only=True) if n != "Main"]
+        tree = _treeHash(names)
+        hip_state = _hipState(hip_path)
+
+        header, records = self._loadEntry(key)
+
+        self.stats = {"hit": False, "reused": 0, "parsed": 0}
+
+        # Hip file unchanged since the entry was written
+        if (header is not None and hip_state is not None
+                and header.get("hip_state") == hip_state
+                and header.get("tree") == tree
+                and not hou.hipFile.hasUnsavedChanges()):
+
+            takes = _buildTakes(names, records)
+            if takes is not None:
+                self.stats["hit"] = True
+                self.stats["reused"] = len(takes)
+                self._touch(key)
+                return takes
+
+        # Read all the scripts at once, parse only the changed ones
+        scripts = PyTake2._takeScripts(names)
+
+        takes = []
+        new_records = []
+        for name in names:
+
+            script = scripts.get(name, "")
+            script_hash = hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+            take = PyTake2._takeProxy(name)
+            record = records.get(name)
+
+            members = None
+            if record is not None and record["hash"] == script_hash:
+                members = _loadMembers(record["members"])
+
+            if members is None:
+                members = PyTake2._parseScript(script)
+                record = {"name": name, "hash": script_hash,
+                          "members": _dumpMembers(members)}
+                self.stats["parsed"] += 1
+            else:
+                self.stats["reused"] += 1
+
+            take.take_members = members
+            takes.append(take)
+            new_records.append(record)
+
+        # With unsaved changes, the hip file on disk doesn't match the scripts
+        if hou.hipFile.hasUnsavedChanges():
+            hip_state = None
+
+        header = {"version": CACHE_VERSION, "hip": hip_path,
+                  "hip_state": hip_state, "tree": tree}
+        self._saveEntry(key, header, new_records)
+
+        return takes
+
+def _hipState(hip_path):
+    '''
+        Return [modification time, size] of the hip file, None if not found.
+    '''
+    try:
+        stat = os.stat(hip_path)
+    except OSError:
+        return None
+
+    return [stat.st_mtime, stat.st_size]
+
+def _treeHash(names):
+    '''
+        Hash of the take names and parents.
+    '''
+    tree = "\n".join([n + " " + (PyTake2._take_index.parentOf(n) or "") for n in names])
+    return hashlib.sha1(tree.encode("utf-8")).hexdigest()
+
+def _dumpMembers(members):
+    '''
+        Return a take's members as {node path: [parm names, flag letters]}.
+    '''
+    out = {}
+    for node_path, member in members.items():
+        flags = "".join([PyTake2._FLAG_LETTERS[f] for f in member.flags])
+        out[node_path] = [member.parms, flags]
+
+    return out
+
+def _loadMembers(data):
+    '''
+        Rebuild a take's members, return None if a node is not found.
+    '''
+    members = {}
+    for node_path, (parms, flags) in data.items():
+
+        node = hou.node(node_path)
+        if node is None:
+            return None
+
+        # JSON strings are unicode on Python 2, parameter names are str
+        members[node_path] = PyTake2.TakeMember(node=node, flags=list(flags),
+                                                parms=[str(p) for p in parms])
+
+    return members
+
+def _buildTakes(names, records):
+    '''
+        Rebuild the takes from the cache records, return None if the
+        records don't match the scene.
+    '''
+    takes = []
+    for name in names:
+
+        record = records.get(name)
+        if record is None:
+            return None
+
+        members = _loadMembers(record["members"])
+        if members is None:
+            return None
+
+        take = PyTake2._takeProxy(name)
+        take.take_members = members
+        takes.append(take)
+
+    return takes
+
+class _FileLock(object):
+    '''
+        Context manager holding a lock file, created exclusively, between processes.
+        A lock older than LOCK_TIMEOUT is considered left by a dead process and removed,
+        OSError is raised if the lock file can not be created for LOCK_TIMEOUT.
+    '''
+
+    def __init__(self, file_path):
+
+        self.file_path = file_path
+
+    def __enter__(self):
+
+        directory = os.path.dirname(self.file_path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                pass
+
+        start = time.time()
+        while True:
+            try:
+                fd = os.open(self.file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode("utf-8"))
+                os.close(fd)
+                return self
+
+            except OSError:
+                try:
+                    if time.time() - os.path.getmtime(self.file_path) > LOCK_TIMEOUT:
+                        os.remove(self.file_path)
+                        continue
+
+                # No lock file: released meanwhile, or it can not be created at all
+                except OSError:
+                    if time.time() - start > LOCK_TIMEOUT:
+                        raise OSError("Can not create the lock file: " + self.file_path)
+
+                time.sleep(0.01)
+
+    def __exit__(self, *args):
+
+        try:
+            os.remove(self.file_path)
+        except OSError:
+            pass
+        return False
+
+def _writeFile(file_path, data):
+    '''
+        Write a file through a temporary file, so readers never see a partial file.
+    '''
+    directory = os.path.dirname(file_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    tmp_path = "{0}.{1}.tmp".format(file_path, os.getpid())
+    with open(tmp_path, "w") as f:
+        f.write(data)
+
+    try:
+        os.replace(tmp_path, file_path)
+
+    # Python 2
+    except AttributeError:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        os.rename(tmp_path, file_path)
@@ -0,0 +1,307 @@
+import json
+import multiprocessing
+import sys
+import time
+
+#
+# Read the takes of many hip files with a pool of worker processes:
+#
+#     hython PyTake2Extract.py --workers 8 --output takes.jsonl shot_*.hip
+#     hython PyTake2Extract.py --list hip_files.txt --values
+#
+# or from Python:
+#
+#     for record in PyTake2Extract.extract(hip_files, workers=8):
+#         ...
+#
+# Each worker loads its hip files one by one and reads all their takes with
+# PyTake2.readAll(). One JSON line is written per hip file, as soon as it is read:
+#
+#     {"hip": path, "ok": true, "takes": [Take.toDict(), ...],
+#      "load_time": float, "read_time": float, "time": float}
+#     {"hip": path, "ok": false, "error": "TakeError: ...", "time": float}
+#
+# An error in a hip file is reported in its own line and doesn't stop the others.
+# A worker which dies while reading a file ( crash ) or which reads it for longer
+# than the timeout is replaced, the file gets an error record:
+#
+#     {"hip": path, "ok": false, "error": "WorkerError: ...", "time": float}
+#
+# With "--fake", the workers use the PyTake2FakeHou stand-in ( hip files saved by
+# the fake hou.hipFile.save() ), no Houdini license is needed.
+#
+
+# Modules imported by each worker, once hou is available
+hou = None
+PyTake2 = None
+
+def _initWorker(fake=False, latency=0.0):
+    '''
+        Import hou and PyTake2 in a worker ( or in the current process ).
+    '''
+    global hou, PyTake2
+
+    if fake:
+        import PyTake2FakeHou
+        PyTake2FakeHou.install(latency)
+
+    import hou as _hou
+    import PyTake2 as _PyTake2
+
+    hou = _hou
+    PyTake2 = _PyTake2
+
+def _extractFile(args):
+    '''
+        Load a hip file and return its record.
+    '''
+    hip_path, values = args
+    start = time.time()
+
+    record = {"hip": hip_path}
+    try:
+        hou.hipFile.load(hip_path, suppress_save_prompt=True, ignore_load_warnings=True)
+        loaded = time.time()
+
+        takes = PyTake2.readAll()
+        record["takes"] = [take.toDict(values=values) for take in takes]
+        record["ok"] = True
+        record["load_time"] = loaded - start
+        record["read_time"] = time.time() - loaded
+
+    except Exception as e:
+        record["ok"] = False
+        record["error"] = "{0}: {1}".format(type(e).__name__, e)
+
+    record["time"] = time.time() - start
+    return record
+
+def _workerLoop(conn, fake, latency):
+    '''
+        Worker process: read the files received from conn one by one and send back
+        their records, until None is received.
+    '''
+    _initWorker(fake, latency)
+
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        conn.send(_extractFile(task))
+
+class _Worker(object):
+    '''
+        A worker process and the file it is reading.
+    '''
+
+    def __init__(self, context, fake, latency):
+
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_workerLoop, args=(child_conn, fake, latency))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+        self.task = None
+        self.start = None
+        self.count = 0
+
+    def send(self, task):
+
+        self.task = task
+        self.start = time.time()
+        self.conn.send(task)
+
+    def receive(self):
+        '''
+            Return the record of the file, or None if the process died.
+        '''
+        try:
+            record = self.conn.recv()
+        except (EOFError, IOError, OSError):
+            return None
+
+        self.task = None
+        self.count += 1
+        return record
+
+    def errorRecord(self, message):
+
+        return {"hip": self.task[0], "ok": False, "error": "WorkerError: " + message,
+                "time": time.time() - self.start}
+
+    def stop(self):
+
+        try:
+            self.conn.send(None)
+        except (IOError, OSError):
+            pass
+        self.process.join(1.0)
+        self.kill()
+
+    def kill(self):
+
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+def _waitAny(connections, timeout):
+    '''
+        Wait until one of the connections can be read, or timeout ( seconds ).
+    '''
+    try:
+        from multiprocessing.connection import wait
+    except ImportError:
+        wait = None
+
+    if wait is not None:
+        wait(connections, timeout)
+        return
+
+    end = time.time() + timeout
+    while time.time() < end:
+        for conn in connections:
+            if conn.poll():
+                return
+        time.sleep(0.005)
+
+def _context():
+    '''
+        Workers are spawned rather than forked, a Houdini session can't be forked safely.
+    '''
+    if hasattr(multiprocessing, "get_context"):
+        return multiprocessing.get_context("spawn")
+    return multiprocessing
+
+def extract(hip_files, workers=None, values=False, fake=False, latency=0.0,
+            files_per_worker=50, timeout=None):
+    '''
+        Generator of the records ( dictionnaries ) of the given hip files, in the
+        order they are read.
+        workers: (int) Number of worker processes, the number of CPUs by default.
+                       With 0, the files are read in the current process.
+        values: (bool) If set to True, the values of the takes' members are read too.
+        fake: (bool) Use the PyTake2FakeHou stand-in.
+        latency: (float) Latency of the fake hou.hscript() calls.
+        files_per_worker: (int) A worker process is replaced after reading this many
+                                files, to release the memory of the loaded scenes.
+        timeout: (float) A worker reading a file for longer than this ( seconds ) is
+                         killed and replaced, the file gets an error record.
+                         Without timeout, only the workers which die are replaced.
+    '''
+    tasks = [(hip_path, values) for hip_path in hip_files]
+
+    if workers == 0:
+        _initWorker(fake, latency)
+        for task in tasks:
+            yield _extractFile(task)
+        return
+
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+
+    context = _context()
+    tasks.reverse()
+    busy = []
+    idle = []
+    try:
+        while tasks or busy:
+
+            while tasks and len(busy) < workers:
+                if idle:
+                    worker = idle.pop()
+                else:
+                    worker = _Worker(context, fake, latency)
+                worker.send(tasks.pop())
+                busy.append(worker)
+
+            _waitAny([worker.conn for worker in busy], 0.1)
+
+            for worker in list(busy):
+
+                if worker.conn.poll():
+                    record = worker.receive()
+                    if record is None:
+                        busy.remove(worker)
+                        worker.kill()
+                        yield worker.errorRecord("worker died ( exit code {0} ).".format(
+                                                 worker.process.exitcode))
+                        continue
+
+                    busy.remove(worker)
+                    if worker.count >= files_per_worker:
+                        worker.stop()
+                    else:
+                        idle.append(worker)
+                    yield record
+
+                elif not worker.process.is_alive():
+                    busy.remove(worker)
+                    worker.kill()
+                    yield worker.errorRecord("worker died ( exit code {0} ).".format(
+                                             worker.process.exitcode))
+
+                elif timeout is not None and time.time() - worker.start > timeout:
+                    busy.remove(worker)
+                    worker.kill()
+                    yield worker.errorRecord("timed out after {0} seconds.".format(timeout))
+
+    finally:
+        for worker in busy:
+            worker.kill()
+        for worker in idle:
+            worker.stop()
+
+def run(hip_files, output=None, **kwargs):
+    '''
+        Write the records of the given hip files as JSON lines to output ( a file path,
+        stdout if None ), return (number of files read, number of errors).
+    '''
+    if output is None:
+        stream = sys.stdout
+    else:
+        stream = open(output, "w")
+
+    count = 0
+    errors = 0
+    try:
+        for record in extract(hip_files, **kwargs):
+            stream.write(json.dumps(record) + "\n")
+            stream.flush()
+            count += 1
+            if not record["ok"]:
+                errors += 1
+
+    finally:
+        if output is not None:
+            stream.close()
+
+    return count, errors
+
+if __name__ == "__main__":
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read the takes of many hip files.")
+    parser.add_argument("hip_files", nargs="*")
+    parser.add_argument("--list", help="File listing the hip files, one per line.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--values", action="store_true")
+    parser.add_argument("--fake", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds after which a worker reading a file is killed.")
+    args = parser.parse_args()
+
+    hip_files = list(args.hip_files)
+    if args.list:
+        with open(args.list) as f:
+            hip_files.extend([line.strip() for line in f if line.strip()])
+
+    count, errors = run(hip_files, args.output, workers=args.workers, values=args.values,
+                        fake=args.fake, latency=args.latency, timeout=args.timeout)
+
+    sys.stderr.write("{0} hip files read, {1} errors\n".format(count, errors))
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,1340 @@
+'''
+    Pure-Python stand-in for the parts of the Houdini "hou" module used
+    by PyTake2.
+
+    It emulates the take hscript commands ( takels, takeadd, takeinclude,
+    takescript, takeset, takemerge, takemove, takerm, takesave, takeload,
+    takename, takeautomode ) as well as echo, opparm, opset, chadd and
+    chkey, plus a minimal node / parm API.
+    It is meant to benchmark and regression-test PyTake2 outside of a
+    Houdini session, not to reproduce every Houdini behaviour.
+
+    Usage:
+        import PyTake2FakeHou
+        hou = PyTake2FakeHou.install(latency=0.0001)
+        import PyTake2
+'''
+import fnmatch
+import json
+import os
+import sys
+import time
+import types
+
+
+# hscript latency in seconds, added to every hscript() call.
+latency = 0.0
+
+# Number of hscript() calls and of commands executed.
+stats = {"hscript_calls": 0, "commands": 0}
+
+
+def install(latency=0.0, module_name="hou"):
+    '''
+        Register this module as "hou" in sys.modules, reset the scene
+        and return the module.
+        latency: (float) Simulated cost in seconds of one hscript() call.
+    '''
+    module = sys.modules[__name__]
+    setLatency(latency)
+    clear()
+    sys.modules[module_name] = module
+    return module
+
+
+def setLatency(value):
+    '''
+        Set the simulated cost in seconds of one hscript() call.
+    '''
+    global latency
+    latency = float(value)
+
+
+def resetStats():
+    '''
+        Reset the hscript call counters.
+    '''
+    stats["hscript_calls"] = 0
+    stats["commands"] = 0
+
+
+##########
+# Errors #
+##########
+
+class Error(Exception):
+    pass
+
+
+class OperationFailed(Error):
+    pass
+
+
+class PermissionError(Error):
+    pass
+
+
+class ObjectWasDeleted(Error):
+    pass
+
+
+#########
+# Enums #
+#########
+
+class _EnumValue(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def __repr__(self):
+        return self._name
+
+
+class hipFileEventType(object):
+    BeforeClear = _EnumValue("BeforeClear")
+    AfterClear = _EnumValue("AfterClear")
+    BeforeLoad = _EnumValue("BeforeLoad")
+    AfterLoad = _EnumValue("AfterLoad")
+    BeforeMerge = _EnumValue("BeforeMerge")
+    AfterMerge = _EnumValue("AfterMerge")
+    BeforeSave = _EnumValue("BeforeSave")
+    AfterSave = _EnumValue("AfterSave")
+
+
+class exprLanguage(object):
+    Hscript = _EnumValue("Hscript")
+    Python = _EnumValue("Python")
+
+
+class nodeEventType(object):
+    BeingDeleted = _EnumValue("BeingDeleted")
+    NameChanged = _EnumValue("NameChanged")
+    ParmTupleChanged = _EnumValue("ParmTupleChanged")
+    FlagChanged = _EnumValue("FlagChanged")
+    ChildCreated = _EnumValue("ChildCreated")
+    ChildDeleted = _EnumValue("ChildDeleted")
+
+
+###################
+# Nodes and parms #
+###################
+
+_COMPONENT_SUFFIXES = ("x", "y", "z", "w")
+
+
+class ParmTuple(object):
+
+    def __init__(self, node, name, values):
+        self._node = node
+        self._name = name
+        self._default = list(values)
+        if len(values) == 1:
+            self._parms = [Parm(self, name, 0)]
+        else:
+            self._parms = [Parm(self, name + _COMPONENT_SUFFIXES[i]
+                                if len(values) <= 4 else name + str(i + 1), i)
+                           for i in range(len(values))]
+
+    def name(self):
+        return self._name
+
+    def node(self):
+        return self._node
+
+    def path(self):
+        return self._node.path() + "/" + self._name
+
+    def __len__(self):
+        return len(self._parms)
+
+    def __iter__(self):
+        return iter(self._parms)
+
+    def __getitem__(self, index):
+        return self._parms[index]
+
+    def eval(self):
+        return tuple(p.eval() for p in self._parms)
+
+    def set(self, values):
+        for p, v in zip(self._parms, values):
+            p.set(v)
+
+    def __repr__(self):
+        return "<hou.ParmTuple {0} in {1}>".format(self._name, self._node.path())
+
+
+class Parm(object):
+
+    def __init__(self, parm_tuple, name, index):
+        self._tuple = parm_tuple
+        self._name = name
+        self._index = index
+
+    def name(self):
+        return self._name
+
+    def node(self):
+        return self._tuple._node
+
+    def tuple(self):
+        return self._tuple
+
+    def path(self):
+        return self.node().path() + "/" + self._name
+
+    def _rawValue(self):
+        return _scene.parmValue(self.node().path(), self._name,
+                                self._tuple._default[self._index])
+
+    def eval(self):
+        _scene.stats["evals"] += 1
+        value = self._rawValue()
+        if isinstance(value, dict):
+            # Expressions are evaluated as Python, without any variable
+            try:
+                return float(eval(value["expression"], {"__builtins__": {}}))
+            except Exception:
+                return 0.0
+        if isinstance(value, str):
+            return expandString(value)
+        return value
+
+    def set(self, value):
+        _scene.setParmValue(self.node().path(), self._name, value)
+
+    def unexpandedString(self):
+        value = self._rawValue()
+        if not isinstance(value, str):
+            raise OperationFailed("Parameter is not a string: " + self.path())
+        return value
+
+    def expression(self):
+        value = self._rawValue()
+        if not isinstance(value, dict):
+            raise OperationFailed("Parameter has no expression: " + self.path())
+        return value["expression"]
+
+    def expressionLanguage(self):
+        value = self._rawValue()
+        if not isinstance(value, dict):
+            raise OperationFailed("Parameter has no expression: " + self.path())
+        return getattr(exprLanguage, value["language"])
+
+    def setExpression(self, expression, language=None):
+        if language is None:
+            language = exprLanguage.Hscript
+        self.set({"expression": expression, "language": language.name()})
+
+    def __repr__(self):
+        return "<hou.Parm {0} in {1}>".format(self._name, self.node().path())
+
+
+class Ramp(object):
+
+    def __init__(self, basis, keys, values):
+        self._basis = tuple(basis)
+        self._keys = tuple(keys)
+        self._values = tuple(values)
+
+    def basis(self):
+        return self._basis
+
+    def keys(self):
+        return self._keys
+
+    def values(self):
+        return self._values
+
+
+class FloatParmTemplate(object):
+
+    def __init__(self, name, label, num_components=1, default_value=()):
+        self._name = name
+        self._label = label
+        self._default = tuple(default_value) or (0.0,) * num_components
+
+    def name(self):
+        return self._name
+
+    def label(self):
+        return self._label
+
+    def numComponents(self):
+        return len(self._default)
+
+    def defaultValue(self):
+        return self._default
+
+
+class ParmTemplateGroup(object):
+
+    def __init__(self, entries=()):
+        self._entries = list(entries)
+
+    def entries(self):
+        return tuple(self._entries)
+
+    def append(self, template):
+        self._entries.append(template)
+
+
+class NodeType(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def nameWithCategory(self):
+        return "Object/" + self._name
+
+
+# Default parm layout of the node types the fake knows about.
+_NODE_TYPE_PARMS = {
+    "geo": [("t", (0.0, 0.0, 0.0)), ("r", (0.0, 0.0, 0.0)),
+            ("s", (1.0, 1.0, 1.0)), ("scale", (1.0,)),
+            ("tdisplay", (0,)), ("display", (1,))],
+    "null": [("t", (0.0, 0.0, 0.0)), ("r", (0.0, 0.0, 0.0)),
+             ("s", (1.0, 1.0, 1.0)), ("scale", (1.0,)),
+             ("cacheInput", (0,)), ("copyinput", (1,))],
+    "subnet": [],
+}
+
+_FLAGGED_TYPES = ("geo", "null")
+
+
+class Node(object):
+
+    def __init__(self, parent, name, type_name, parms=None):
+        self._parent = parent
+        self._name = name
+        self._type = NodeType(type_name)
+        self._children = []
+        self._tuples = []
+        self._tuple_map = {}
+        self._parm_map = {}
+        self._event_callbacks = []
+        self._has_flags = type_name in _FLAGGED_TYPES
+        self._flags = {"d": True, "r": True, "b": False}
+
+        if parms is None:
+            parms = _NODE_TYPE_PARMS.get(type_name, [])
+        for parm_name, values in parms:
+            self.addParmTuple(parm_name, values)
+
+    def addParmTuple(self, name, values):
+        '''
+            Fake only: add a parm tuple with the given default values.
+        '''
+        pt = ParmTuple(self, name, tuple(values))
+        self._tuples.append(pt)
+        self._tuple_map[name] = pt
+        for p in pt:
+            self._parm_map[p.name()] = p
+        return pt
+
+    def name(self):
+        return self._name
+
+    def path(self):
+        if self._parent is None:
+            return "/"
+        parent_path = self._parent.path()
+        if parent_path == "/":
+            return "/" + self._name
+        return parent_path + "/" + self._name
+
+    def type(self):
+        return self._type
+
+    def parent(self):
+        return self._parent
+
+    def children(self):
+        return tuple(self._children)
+
+    def allSubChildren(self):
+        out = []
+        for c in self._children:
+            out.append(c)
+            out.extend(c.allSubChildren())
+        return tuple(out)
+
+    def node(self, path):
+        if path.startswith("/"):
+            return node(path)
+        return node(self.path().rstrip("/") + "/" + path)
+
+    def glob(self, pattern):
+        return tuple(c for c in self._children
+                     if patternMatch(pattern, c.name()))
+
+    def createNode(self, type_name, node_name=None, parms=None):
+        if node_name is None:
+            i = 1
+            while self._childNamed(type_name + str(i)):
+                i += 1
+            node_name = type_name + str(i)
+        if self._childNamed(node_name):
+            raise OperationFailed("Node name already used: " + node_name)
+        n = Node(self, node_name, type_name, parms)
+        self._children.append(n)
+        _scene.nodes[n.path()] = n
+        return n
+
+    def destroy(self):
+        for c in list(self._children):
+            c.destroy()
+        self._fire(nodeEventType.BeingDeleted)
+        path = self.path()
+        _scene.nodes.pop(path, None)
+        _scene.dropNode(path)
+        if self._parent is not None:
+            self._parent._children.remove(self)
+
+    def _childNamed(self, name):
+        for c in self._children:
+            if c._name == name:
+                return c
+        return None
+
+    def parm(self, name):
+        _scene.stats["lookups"] += 1
+        return self._parm_map.get(name)
+
+    def parmTuple(self, name):
+        _scene.stats["lookups"] += 1
+        return self._tuple_map.get(name)
+
+    def parms(self):
+        return tuple(p for pt in self._tuples for p in pt)
+
+    def parmTuples(self):
+        return tuple(self._tuples)
+
+    def parmTemplateGroup(self):
+        return ParmTemplateGroup([FloatParmTemplate(pt.name(), pt.name(), len(pt),
+                                                    pt._default)
+                                  for pt in self._tuples])
+
+    def setParmTemplateGroup(self, group):
+        # Parms are only added, the existing ones are kept
+        for template in group.entries():
+            if template.name() not in self._tuple_map:
+                self.addParmTuple(template.name(), template.defaultValue())
+
+    # Flags
+    def _flagValue(self, flag):
+        if not self._has_flags:
+            raise AttributeError("Node has no flag")
+        return _scene.flagValue(self.path(), flag, self._flags[flag])
+
+    def _setFlag(self, flag, value):
+        if not self._has_flags:
+            raise AttributeError("Node has no flag")
+        _scene.setFlagValue(self.path(), flag, bool(value), self)
+
+    def isDisplayFlagSet(self):
+        return self._flagValue("d")
+
+    def isRenderFlagSet(self):
+        return self._flagValue("r")
+
+    def isBypassed(self):
+        return self._flagValue("b")
+
+    def setDisplayFlag(self, value):
+        self._setFlag("d", value)
+
+    def setRenderFlag(self, value):
+        self._setFlag("r", value)
+
+    def bypass(self, value):
+        self._setFlag("b", value)
+
+    # Events
+    def addEventCallback(self, event_types, callback):
+        self._event_callbacks.append((tuple(event_types), callback))
+
+    def removeEventCallback(self, event_types, callback):
+        self._event_callbacks = [(e, c) for e, c in self._event_callbacks
+                                 if c is not callback]
+
+    def eventCallbacks(self):
+        return tuple(self._event_callbacks)
+
+    def _fire(self, event_type):
+        for types_, cb in list(self._event_callbacks):
+            if event_type in types_:
+                cb(node=self, event_type=event_type)
+
+    def __repr__(self):
+        return "<hou.Node {0}>".format(self.path())
+
+
+def node(path):
+    if not path:
+        return None
+    if path != "/":
+        path = path.rstrip("/")
+    return _scene.nodes.get(path)
+
+
+def parm(path):
+    node_path, _, name = path.rpartition("/")
+    n = node(node_path)
+    if n is None:
+        return None
+    return n.parm(name)
+
+
+def parmTuple(path):
+    node_path, _, name = path.rpartition("/")
+    n = node(node_path)
+    if n is None:
+        return None
+    return n.parmTuple(name)
+
+
+def patternMatch(pattern, string, ignore_case=False):
+    '''
+        Houdini-style pattern matching: space separated patterns,
+        "*" / "?" wildcards and "^" exclusions.
+    '''
+    result = False
+    if ignore_case:
+        string = string.lower()
+        pattern = pattern.lower()
+    for token in pattern.split():
+        exclude = token.startswith("^")
+        if exclude:
+            token = token[1:]
+        if fnmatch.fnmatchcase(string, token):
+            result = not exclude
+    return 1 if result else 0
+
+
+def expandString(text):
+    if "$ACTIVETAKE" in text:
+        text = text.replace("$ACTIVETAKE", _scene.current)
+    if "$HIPFILE" in text:
+        text = text.replace("$HIPFILE", _scene.hip_path)
+    if "$HIPNAME" in text:
+        name = os.path.splitext(os.path.basename(_scene.hip_path))[0]
+        text = text.replace("$HIPNAME", name)
+    if "$HIP" in text:
+        text = text.replace("$HIP", os.path.dirname(_scene.hip_path))
+    return text
+
+
+#########
+# Takes #
+#########
+
+class _FakeTake(object):
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = []
+        # node_path -> ordered list of included parm names
+        self.parms = {}
+        # node_path -> set of included flags ( "d", "r", "b" )
+        self.flags = {}
+        # (node_path, parm_name) -> value
+        self.values = {}
+        # (node_path, flag) -> bool
+        self.flag_values = {}
+
+    def includesParm(self, node_path, parm_name):
+        return parm_name in self.parms.get(node_path, ())
+
+    def includesFlag(self, node_path, flag):
+        return flag in self.flags.get(node_path, ())
+
+
+class _Scene(object):
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.nodes = {}
+        self.root = Node(None, "", "root", [])
+        self.nodes["/"] = self.root
+        for name in ("obj", "out", "shop", "ch", "img"):
+            n = Node(self.root, name, "manager", [])
+            self.root._children.append(n)
+            self.nodes[n.path()] = n
+        self.takes = {"Main": _FakeTake("Main", None)}
+        self.current = "Main"
+        self.automode = False
+        self.hip_path = os.path.join(os.getcwd(), "untitled.hip")
+        self.unsaved = False
+        self.stats = {"evals": 0, "lookups": 0}
+
+    # Values
+    def _valueTake(self, node_path, parm_name):
+        take = self.takes[self.current]
+        while take is not None and take.name != "Main":
+            if take.includesParm(node_path, parm_name):
+                return take
+            take = self.takes.get(take.parent)
+        return None
+
+    def parmValue(self, node_path, parm_name, default):
+        take = self._valueTake(node_path, parm_name)
+        if take is not None:
+            key = (node_path, parm_name)
+            if key in take.values:
+                return take.values[key]
+        return self.takes["Main"].values.get((node_path, parm_name), default)
+
+    def setParmValue(self, node_path, parm_name, value):
+        take = self.takes[self.current]
+        if take.name != "Main" and not take.includesParm(node_path, parm_name):
+            if not self.automode:
+                raise PermissionError("Parameter is not included in take "
+                                      + take.name)
+            _includeParm(take, node_path, parm_name)
+        take.values[(node_path, parm_name)] = value
+        self.unsaved = True
+
+    def flagValue(self, node_path, flag, default):
+        take = self.takes[self.current]
+        while take is not None and take.name != "Main":
+            if take.includesFlag(node_path, flag):
+                return take.flag_values.get((node_path, flag), default)
+            take = self.takes.get(take.parent)
+        return self.takes["Main"].flag_values.get((node_path, flag), default)
+
+    def setFlagValue(self, node_path, flag, value, n):
+        take = self.takes[self.current]
+        if take.name != "Main" and not take.includesFlag(node_path, flag):
+            if not self.automode:
+                raise PermissionError("Flag is not included in take "
+                                      + take.name)
+            take.flags.setdefault(node_path, set()).add(flag)
+        take.flag_values[(node_path, flag)] = value
+        self.unsaved = True
+        n._fire(nodeEventType.FlagChanged)
+
+    def dropNode(self, node_path):
+        for take in self.takes.values():
+            take.parms.pop(node_path, None)
+            take.flags.pop(node_path, None)
+
+    # Take tree
+    def walk(self, name="Main", depth=0):
+        stack = [(name, depth)]
+        while stack:
+            name, depth = stack.pop()
+            take = self.takes[name]
+            yield take, depth
+            stack.extend((c, depth + 1) for c in reversed(take.children))
+
+    def addTake(self, name, parent):
+        take = _FakeTake(name, parent)
+        self.takes[name] = take
+        self.takes[parent].children.append(name)
+        return take
+
+    def removeTake(self, name, recursive):
+        take = self.takes[name]
+        parent = self.takes[take.parent]
+        index = parent.children.index(name)
+        parent.children.pop(index)
+        if recursive:
+            for c in list(take.children):
+                self.removeTake(c, True)
+        else:
+            for c in take.children:
+                self.takes[c].parent = parent.name
+                parent.children.insert(index, c)
+                index += 1
+        del self.takes[name]
+        if self.current == name or self.current not in self.takes:
+            self.current = "Main"
+
+    def isDescendant(self, name, ancestor):
+        take = self.takes[name]
+        while take.parent is not None:
+            if take.parent == ancestor:
+                return True
+            take = self.takes[take.parent]
+        return False
+
+    # Serialization
+    def takeToDict(self, name):
+        take = self.takes[name]
+        return {"name": take.name,
+                "parent": take.parent,
+                "children": list(take.children),
+                "parms": dict((k, list(v)) for k, v in take.parms.items()),
+                "flags": dict((k, sorted(v)) for k, v in take.flags.items()),
+                "values": [[k[0], k[1], v] for k, v in take.values.items()],
+                "flag_values": [[k[0], k[1], v]
+                                for k, v in take.flag_values.items()]}
+
+    def takeFromDict(self, data, name, parent):
+        take = self.addTake(name, parent)
+        take.parms = dict((k, list(v)) for k, v in data["parms"].items())
+        take.flags = dict((k, set(v)) for k, v in data["flags"].items())
+        take.values = dict(((a, b), v) for a, b, v in data["values"])
+        take.flag_values = dict(((a, b), v) for a, b, v in data["flag_values"])
+        return take
+
+    def toDict(self):
+        nodes = []
+        for path in sorted(self.nodes):
+            n = self.nodes[path]
+            if n._parent is None or n._parent is self.root:
+                continue
+            nodes.append({"path": path,
+                          "type": n._type.name(),
+                          "parms": [[pt.name(), pt._default]
+                                    for pt in n._tuples]})
+        takes = [self.takeToDict(t.name) for t, _ in self.walk()]
+        return {"nodes": nodes, "takes": takes, "current": self.current}
+
+    def fromDict(self, data):
+        self.reset()
+        for n in data["nodes"]:
+            parent_path, _, name = n["path"].rpartition("/")
+            parent = node(parent_path or "/")
+            parent.createNode(n["type"], name,
+                              [(p, tuple(v)) for p, v in n["parms"]])
+        main = data["takes"][0]
+        self.takes["Main"].values = dict(((a, b), v)
+                                         for a, b, v in main["values"])
+        self.takes["Main"].flag_values = dict(((a, b), v)
+                                              for a, b, v in main["flag_values"])
+        for t in data["takes"][1:]:
+            self.takeFromDict(t, t["name"], t["parent"])
+        self.current = data.get("current", "Main")
+
+
+_scene = _Scene()
+
+
+def clear():
+    '''
+        Reset the fake scene: no nodes but the managers and only Main take.
+    '''
+    _scene.reset()
+    resetStats()
+
+
+def sceneStats():
+    '''
+        Fake only: counts of parm evaluations and parm lookups.
+    '''
+    return dict(_scene.stats)
+
+
+###########
+# hscript #
+###########
+
+def _splitCommands(script):
+    commands = []
+    current = []
+    quote = None
+    for c in script:
+        if quote:
+            current.append(c)
+            if c == quote:
+                quote = None
+        elif c in "\"'":
+            quote = c
+            current.append(c)
+        elif c in ";\n":
+            commands.append("".join(current))
+            current = []
+        else:
+            current.append(c)
+    commands.append("".join(current))
+    return [c.strip() for c in commands if c.strip()]
+
+
+def _tokenize(command):
+    tokens = []
+    current = []
+    quote = None
+    has_token = False
+    for c in command:
+        if quote:
+            if c == quote:
+                quote = None
+            else:
+                current.append(c)
+        elif c in "\"'":
+            quote = c
+            has_token = True
+        elif c.isspace():
+            if current or has_token:
+                tokens.append("".join(current))
+                current = []
+                has_token = False
+        else:
+            current.append(c)
+    if current or has_token:
+        tokens.append("".join(current))
+    return tokens
+
+
+def _options(args, with_value=()):
+    opts = {}
+    rest = []
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a.startswith("-") and len(a) > 1 and not rest:
+            for j, letter in enumerate(a[1:]):
+                if letter in with_value:
+                    opts[letter] = args[i + 1]
+                    i += 1
+                    break
+                opts[letter] = True
+        else:
+            rest.append(a)
+        i += 1
+    return opts, rest
+
+
+def hscript(script):
+    '''
+        Run hscript commands separated by newlines or ";".
+        Returns a (stdout, stderr) tuple like hou.hscript().
+    '''
+    # Houdini runs the commands as utf-8 str on Python 2, values read
+    # back from the scene are never unicode.
+    if sys.version_info[0] < 3 and not isinstance(script, str):
+        script = script.encode("utf-8")
+
+    stats["hscript_calls"] += 1
+    if latency:
+        time.sleep(latency)
+
+    out = []
+    err = []
+    for command in _splitCommands(script):
+        stats["commands"] += 1
+        tokens = _tokenize(command)
+        func = _COMMANDS.get(tokens[0])
+        if func is None:
+            err.append("Unknown command: " + tokens[0] + "\n")
+            continue
+        try:
+            result = func(tokens[1:])
+        except _CommandError as e:
+            err.append(str(e) + "\n")
+            continue
+        if result:
+            out.append(result)
+    return "".join(out), "".join(err)
+
+
+class _CommandError(Exception):
+    pass
+
+
+def _takeOrError(name):
+    take = _scene.takes.get(name)
+    if take is None:
+        raise _CommandError("Unknown take: " + name)
+    return take
+
+
+def _cmd_takels(args):
+    opts, rest = _options(args)
+    lines = []
+    for take, depth in _scene.walk():
+        if rest and not any(patternMatch(p, take.name) for p in rest):
+            continue
+        lines.append("    " * depth + take.name + "\n")
+    return "".join(lines)
+
+
+def _cmd_takeadd(args):
+    opts, rest = _options(args, with_value="p")
+    parent = opts.get("p", _scene.current)
+    _takeOrError(parent)
+    if not rest:
+        raise _CommandError("takeadd: missing take name")
+    for name in rest:
+        if name in _scene.takes:
+            raise _CommandError("Take already exists: " + name)
+        _scene.addTake(name, parent)
+        if not opts.get("c"):
+            _scene.current = name
+    _scene.unsaved = True
+    return ""
+
+
+def _includeParm(take, node_path, parm_name):
+    parms = take.parms.setdefault(node_path, [])
+    if parm_name not in parms:
+        parms.append(parm_name)
+
+
+def _cmd_takeinclude(args):
+    opts, rest = _options(args)
+    take = _scene.takes[_scene.current]
+    if take.name == "Main":
+        raise _CommandError("Can not include parameters in Main take")
+    if not rest:
+        raise _CommandError("takeinclude: missing node")
+    n = node(rest[0])
+    if n is None:
+        raise _CommandError("Invalid node: " + rest[0])
+    node_path = n.path()
+    exclude = opts.get("u")
+
+    flags = [f for f in "drb" if opts.get(f)]
+    if flags:
+        if not n._has_flags:
+            raise _CommandError("Node has no flag: " + node_path)
+        for f in flags:
+            if exclude:
+                take.flags.get(node_path, set()).discard(f)
+                take.flag_values.pop((node_path, f), None)
+            else:
+                if not take.includesFlag(node_path, f):
+                    take.flag_values[(node_path, f)] = n._flagValue(f)
+                take.flags.setdefault(node_path, set()).add(f)
+        if not take.flags.get(node_path):
+            take.flags.pop(node_path, None)
+        _scene.unsaved = True
+        return ""
+
+    names = []
+    for pattern in rest[1:]:
+        matched = False
+        for pt in n._tuples:
+            if patternMatch(pattern, pt.name()):
+                names.extend(p.name() for p in pt)
+                matched = True
+                continue
+            for p in pt:
+                if patternMatch(pattern, p.name()):
+                    names.append(p.name())
+                    matched = True
+        if not matched:
+            raise _CommandError("Invalid parameter: {0} {1}".format(node_path,
+                                                                    pattern))
+    for name in names:
+        if exclude:
+            parms = take.parms.get(node_path)
+            if parms and name in parms:
+                parms.remove(name)
+            take.values.pop((node_path, name), None)
+        else:
+            if not take.includesParm(node_path, name):
+                value = n.parm(name).eval()
+                _includeParm(take, node_path, name)
+                take.values[(node_path, name)] = value
+    if node_path in take.parms and not take.parms[node_path]:
+        del take.parms[node_path]
+    _scene.unsaved = True
+    return ""
+
+
+def _scriptLines(take):
+    lines = []
+    parent = take.parent or "Main"
+    lines.append("takeadd -c -p {0} {1}\n".format(parent, take.name))
+    for node_path in sorted(set(take.parms) | set(take.flags)):
+        for f in sorted(take.flags.get(node_path, ())):
+            lines.append("takeinclude -q -{0} {1}\n".format(f, node_path))
+        n = node(node_path)
+        included = set(take.parms.get(node_path, ()))
+        done = set()
+        for name in take.parms.get(node_path, ()):
+            if name in done:
+                continue
+            pt = n._parm_map[name].tuple() if n is not None else None
+            if pt is not None and len(pt) > 1 and \
+                    all(p.name() in included for p in pt):
+                lines.append("takeinclude -q {0} {1}\n".format(node_path,
+                                                                pt.name()))
+                done.update(p.name() for p in pt)
+            else:
+                lines.append("takeinclude -q {0} {1}\n".format(node_path, name))
+                done.add(name)
+    return lines
+
+
+def _cmd_takescript(args):
+    opts, rest = _options(args, with_value="o")
+    if not rest:
+        raise _CommandError("takescript: missing take name")
+    take = _takeOrError(rest[0])
+    return "".join(_scriptLines(take))
+
+
+def _cmd_takeset(args):
+    if not args:
+        raise _CommandError("takeset: missing take name")
+    _takeOrError(args[0])
+    _scene.current = args[0]
+    return ""
+
+
+def _cmd_takemerge(args):
+    opts, rest = _options(args)
+    if len(rest) < 2:
+        raise _CommandError("takemerge: missing take names")
+    dest = _takeOrError(rest[0])
+    for src_name in rest[1:]:
+        src = _takeOrError(src_name)
+        for node_path, names in src.parms.items():
+            for name in names:
+                if dest.includesParm(node_path, name) and not opts.get("f"):
+                    continue
+                _includeParm(dest, node_path, name)
+                if (node_path, name) in src.values:
+                    dest.values[(node_path, name)] = src.values[(node_path, name)]
+        for node_path, flags in src.flags.items():
+            for f in flags:
+                if dest.includesFlag(node_path, f) and not opts.get("f"):
+                    continue
+                dest.flags.setdefault(node_path, set()).add(f)
+                if (node_path, f) in src.flag_values:
+                    dest.flag_values[(node_path, f)] = \
+                        src.flag_values[(node_path, f)]
+    _scene.unsaved = True
+    return ""
+
+
+def _cmd_takemove(args):
+    if len(args) < 2:
+        raise _CommandError("takemove: missing arguments")
+    take = _takeOrError(args[0])
+    parent = _takeOrError(args[1])
+    if take.name == "Main" or parent.name == take.name or \
+            _scene.isDescendant(parent.name, take.name):
+        raise _CommandError("Can not move take {0} under {1}".format(
+            take.name, parent.name))
+    _scene.takes[take.parent].children.remove(take.name)
+    parent.children.append(take.name)
+    take.parent = parent.name
+    _scene.unsaved = True
+    return ""
+
+
+def _cmd_takerm(args):
+    opts, rest = _options(args)
+    if not rest:
+        raise _CommandError("takerm: missing take name")
+    for name in rest:
+        _takeOrError(name)
+        if name == "Main":
+            raise _CommandError("Can not remove Main take")
+        _scene.removeTake(name, opts.get("R"))
+    _scene.unsaved = True
+    return ""
+
+
+def _cmd_takename(args):
+    if len(args) < 2:
+        raise _CommandError("takename: missing arguments")
+    take = _takeOrError(args[0])
+    new_name = args[1]
+    if new_name in _scene.takes:
+        raise _CommandError("Take already exists: " + new_name)
+    del _scene.takes[take.name]
+    parent = _scene.takes[take.parent]
+    parent.children[parent.children.index(take.name)] = new_name
+    for c in take.children:
+        _scene.takes[c].parent = new_name
+    if _scene.current == take.name:
+        _scene.current = new_name
+    take.name = new_name
+    _scene.takes[new_name] = take
+    _scene.unsaved = True
+    return ""
+
+
+def _cmd_takesave(args):
+    opts, rest = _options(args, with_value="o")
+    if not rest:
+        raise _CommandError("takesave: missing take name")
+    take = _takeOrError(rest[0])
+    names = [take.name]
+    if opts.get("R"):
+        names = [t.name for t, _ in _scene.walk(take.name)]
+    data = [_scene.takeToDict(n) for n in names]
+    path = opts.get("o")
+    if not path:
+        return json.dumps(data) + "\n"
+    try:
+        with open(path, "w") as f:
+            json.dump(data, f)
+    except (IOError, OSError) as e:
+        raise _CommandError(str(e))
+    return ""
+
+
+def _cmd_takeload(args):
+    opts, rest = _options(args, with_value="p")
+    if not rest:
+        raise _CommandError("takeload: missing file")
+    parent = opts.get("p", _scene.current)
+    _takeOrError(parent)
+    try:
+        with open(rest[0]) as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError) as e:
+        raise _CommandError(str(e))
+    renamed = {}
+    for t in data:
+        name = t["name"]
+        while name in _scene.takes:
+            name += "1"
+        renamed[t["name"]] = name
+        take_parent = renamed.get(t["parent"], parent)
+        _scene.takeFromDict(t, name, take_parent)
+    _scene.unsaved = True
+    return ""
+
+
+def _cmd_takeautomode(args):
+    _scene.automode = bool(args) and args[0] == "on"
+    return ""
+
+
+def _cmd_echo(args):
+    return " ".join(args) + "\n"
+
+
+def _cmd_opparm(args):
+    if len(args) < 2:
+        raise _CommandError("opparm: missing arguments")
+    n = node(args[0])
+    if n is None:
+        raise _CommandError("Invalid node: " + args[0])
+    i = 1
+    while i < len(args):
+        name = args[i]
+        i += 1
+        values = []
+        if i < len(args) and args[i] == "(":
+            i += 1
+            while args[i] != ")":
+                values.append(args[i])
+                i += 1
+            i += 1
+        pt = n.parmTuple(name)
+        parms = list(pt) if pt is not None else [n.parm(name)]
+        if parms[0] is None:
+            raise _CommandError("Invalid parameter: " + name)
+        try:
+            for p, v in zip(parms, values):
+                p.set(_coerce(v, p.tuple()._default[p._index]))
+        except PermissionError as e:
+            raise _CommandError(str(e))
+    return ""
+
+
+def _channelParm(path):
+    node_path, _, name = path.rpartition("/")
+    n = node(node_path)
+    p = n.parm(name) if n is not None else None
+    if p is None:
+        raise _CommandError("Invalid channel: " + path)
+    return p
+
+
+def _cmd_chadd(args):
+    opts, rest = _options(args)
+    if len(rest) < 2:
+        raise _CommandError("chadd: missing arguments")
+    for name in rest[1:]:
+        p = _channelParm(rest[0] + "/" + name)
+        take = _scene.takes[_scene.current]
+        if take.name != "Main" and not take.includesParm(p.node().path(), name):
+            raise _CommandError("Parameter is not included in take " + take.name)
+    return ""
+
+
+def _cmd_chkey(args):
+    opts, rest = _options(args, with_value=("t", "v", "F", "l"))
+    if not rest:
+        raise _CommandError("chkey: missing arguments")
+    language = {"h": "Hscript", "p": "Python"}.get(opts.get("l", "h"))
+    if language is None:
+        raise _CommandError("chkey: invalid language: " + opts["l"])
+    for path in rest:
+        p = _channelParm(path)
+        try:
+            if "F" in opts:
+                p.set({"expression": opts["F"], "language": language})
+            elif "v" in opts:
+                p.set(_coerce(opts["v"], p.tuple()._default[p._index]))
+        except PermissionError as e:
+            raise _CommandError(str(e))
+    return ""
+
+
+def _coerce(text, default):
+    if isinstance(default, bool):
+        return text not in ("0", "off", "false")
+    if isinstance(default, int):
+        return int(float(text))
+    if isinstance(default, float):
+        return float(text)
+    return text
+
+
+def _cmd_opset(args):
+    i = 0
+    flags = []
+    while i < len(args) and args[i].startswith("-"):
+        flags.append((args[i][1:], args[i + 1] == "on"))
+        i += 2
+    for path in args[i:]:
+        n = node(path)
+        if n is None:
+            raise _CommandError("Invalid node: " + path)
+        try:
+            for f, value in flags:
+                n._setFlag(f, value)
+        except (AttributeError, PermissionError) as e:
+            raise _CommandError(str(e))
+    return ""
+
+
+_COMMANDS = {
+    "takels": _cmd_takels,
+    "takeadd": _cmd_takeadd,
+    "takeinclude": _cmd_takeinclude,
+    "takescript": _cmd_takescript,
+    "takeset": _cmd_takeset,
+    "takemerge": _cmd_takemerge,
+    "takemove": _cmd_takemove,
+    "takerm": _cmd_takerm,
+    "takename": _cmd_takename,
+    "takesave": _cmd_takesave,
+    "takeload": _cmd_takeload,
+    "takeautomode": _cmd_takeautomode,
+    "echo": _cmd_echo,
+    "opparm": _cmd_opparm,
+    "opset": _cmd_opset,
+    "chadd": _cmd_chadd,
+    "chkey": _cmd_chkey,
+}
+
+
+############
+# hip file #
+############
+
+class _HipFile(object):
+
+    def __init__(self):
+        self._callbacks = []
+
+    def path(self):
+        return _scene.hip_path
+
+    def basename(self):
+        return os.path.basename(_scene.hip_path)
+
+    def hasUnsavedChanges(self):
+        return _scene.unsaved
+
+    def addEventCallback(self, callback):
+        self._callbacks.append(callback)
+
+    def removeEventCallback(self, callback):
+        self._callbacks = [c for c in self._callbacks if c is not callback]
+
+    def eventCallbacks(self):
+        return tuple(self._callbacks)
+
+    def _fire(self, event_type):
+        for cb in list(self._callbacks):
+            cb(event_type)
+
+    def clear(self, suppress_save_prompt=True):
+        self._fire(hipFileEventType.BeforeClear)
+        _scene.reset()
+        self._fire(hipFileEventType.AfterClear)
+
+    def save(self, file_name=None):
+        if file_name:
+            _scene.hip_path = os.path.abspath(file_name)
+        self._fire(hipFileEventType.BeforeSave)
+        with open(_scene.hip_path, "w") as f:
+            json.dump(_scene.toDict(), f)
+        _scene.unsaved = False
+        self._fire(hipFileEventType.AfterSave)
+
+    def load(self, file_name, suppress_save_prompt=True, ignore_load_warnings=True):
+        self._fire(hipFileEventType.BeforeLoad)
+        try:
+            with open(file_name) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            raise OperationFailed("Can not load {0}: {1}".format(file_name, e))
+        _scene.fromDict(data)
+        _scene.hip_path = os.path.abspath(file_name)
+        _scene.unsaved = False
+        self._fire(hipFileEventType.AfterLoad)
+
+
+hipFile = _HipFile()
+
+
+#########
+# undos #
+#########
+
+class _UndoGroup(object):
+
+    def __init__(self, label):
+        self.label = label
+
+    def __enter__(self):
+        self._snapshot = json.dumps(_scene.toDict())
+        return self
+
+    def __exit__(self, *exc):
+        # Like Houdini, a group which didn't change anything adds no undo entry
+        if json.dumps(_scene.toDict()) != self._snapshot:
+            undos._snapshots.append((self.label, self._snapshot))
+        return False
+
+
+class _Undos(object):
+
+    def __init__(self):
+        self._snapshots = []
+
+    def group(self, label):
+        return _UndoGroup(label)
+
+    def undoLabels(self):
+        return tuple(label for label, _ in reversed(self._snapshots))
+
+    def performUndo(self):
+        if not self._snapshots:
+            return
+        label, data = self._snapshots.pop()
+        path = _scene.hip_path
+        _scene.fromDict(json.loads(data))
+        _scene.hip_path = path
+
+
+undos = _Undos()
+
+
+# "hou.session" like namespace
+session = types.ModuleType("hou.session")
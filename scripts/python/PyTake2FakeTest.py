@@ -0,0 +1,978 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+# The tests run outside of Houdini, on the PyTake2FakeHou stand-in
+import PyTake2FakeHou
+hou = PyTake2FakeHou.install()
+
+import PyTake2
+import PyTake2Cache
+import PyTake2Extract
+import PyTake2Wedge
+
+#
+# Automated PyTake2 tests, on the fake hou module ( no Houdini license needed ),
+# with Python 2.7 or Python 3:
+#
+#     python PyTake2FakeTest.py
+#     python -m unittest PyTake2FakeTest
+#
+# Each test starts from a new scene: /obj/geo1 ... /obj/geo4 and /obj/geo4/null1.
+# PyTake2Test.run() is the interactive counterpart, in a Houdini session.
+#
+
+def _scene():
+
+    hou.hipFile.clear()
+    obj = hou.node("/obj")
+    for i in range(1, 5):
+        obj.createNode("geo", "geo{0}".format(i))
+    hou.node("/obj/geo4").createNode("null", "null1")
+
+def _members(take):
+
+    return dict((node_path, (member.parms, member.flags))
+                for node_path, member in take.take_members.items())
+
+class _FakeTestCase(unittest.TestCase):
+
+    def setUp(self):
+
+        _scene()
+        self.geo1 = hou.node("/obj/geo1")
+        self.geo2 = hou.node("/obj/geo2")
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+
+        PyTake2.setProfiling(False)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def profile(self, func, *args, **kwargs):
+        '''
+            Return ( result of func, profiler stats of the hscript calls it sent ).
+        '''
+        with PyTake2.profile() as profiler:
+            result = func(*args, **kwargs)
+        return result, profiler.stats()
+
+    def calls(self, func, *args, **kwargs):
+        '''
+            Return ( result of func, number of hscript round-trips ).
+        '''
+        result, stats = self.profile(func, *args, **kwargs)
+        return result, stats["calls"]
+
+    def commandCount(self, stats, name):
+
+        return stats["commands"].get(name, {}).get("batched", 0)
+
+class FakeHouTest(_FakeTestCase):
+
+    def test_take_commands(self):
+
+        out, err = hou.hscript("takeadd -p Main A; takeset A; takeinclude /obj/geo1 t")
+        self.assertEqual(err, "")
+        self.assertEqual(hou.expandString("$ACTIVETAKE"), "A")
+
+        script = hou.hscript("takescript A")[0]
+        self.assertIn("takeinclude -q /obj/geo1 t", script)
+
+        out, err = hou.hscript("takeinclude /obj/missing tx")
+        self.assertNotEqual(err, "")
+
+    def test_hip_file(self):
+
+        hou.hscript("takeadd -p Main A; takeset A; takeinclude /obj/geo1 tx")
+        self.geo1.parm("tx").set(2.0)
+        hou.hscript("takeset Main")
+
+        hip_path = os.path.join(self.directory, "scene.hip")
+        hou.hipFile.save(hip_path)
+        hou.hipFile.clear()
+        self.assertEqual(hou.hscript("takels")[0].split(), ["Main"])
+
+        hou.hipFile.load(hip_path)
+        self.assertEqual(hou.hscript("takels")[0].split(), ["Main", "A"])
+        hou.hscript("takeset A")
+        self.assertEqual(hou.node("/obj/geo1").parm("tx").eval(), 2.0)
+
+    def test_undo_group(self):
+
+        with hou.undos.group("edit"):
+            hou.hscript("takeadd -p Main A")
+
+        # Nothing changed, no undo entry
+        with hou.undos.group("nothing"):
+            pass
+
+        self.assertEqual(hou.undos.undoLabels()[0], "edit")
+        hou.undos.performUndo()
+        self.assertEqual(hou.hscript("takels")[0].split(), ["Main"])
+
+class TakeIndexTest(_FakeTestCase):
+
+    def test_lookups_served_by_index(self):
+
+        PyTake2.Take("A")
+        PyTake2.returnToMainTake()
+        before = PyTake2.takeIndexStats()
+
+        _, stats = self.profile(lambda: [PyTake2.takeFromName("A").existInScene()
+                                         for i in range(20)])
+        self.assertEqual(self.commandCount(stats, "takels"), 0)
+
+        after = PyTake2.takeIndexStats()
+        self.assertEqual(after["refreshes"], before["refreshes"])
+        self.assertEqual(after["misses"], before["misses"])
+        self.assertGreater(after["hits"], before["hits"])
+
+    def test_refresh_counters(self):
+
+        PyTake2.ls()
+        before = PyTake2.takeIndexStats()
+
+        # Discarded by the scene event, read again on next use
+        hou.hipFile.clear()
+        PyTake2.ls()
+        after = PyTake2.takeIndexStats()
+        self.assertEqual(after["invalidations"], before["invalidations"] + 1)
+        self.assertEqual(after["misses"], before["misses"] + 1)
+        self.assertEqual(after["refreshes"], before["refreshes"] + 1)
+
+        PyTake2.refresh()
+        self.assertEqual(PyTake2.takeIndexStats()["refreshes"], after["refreshes"] + 1)
+
+    def test_names_incremented(self):
+
+        takes = PyTake2.createTakes([{"name": "shot"}, {"name": "shot"}])
+        self.assertEqual([t.getName() for t in takes], ["shot", "shot1"])
+        self.assertEqual(PyTake2.Take("shot").getName(), "shot2")
+
+    def test_external_takes(self):
+
+        PyTake2.Take("A")
+        PyTake2.returnToMainTake()
+
+        # Added outside of PyTake2, the index is not aware of them
+        hou.hscript("takeadd -p Main EXT; takeadd -p Main OTHER; takeset Main")
+
+        self.assertEqual(PyTake2.Take("EXT").getName(), "EXT1")
+        self.assertEqual(PyTake2.takeFromName("OTHER").getName(), "OTHER")
+        with self.assertRaises(PyTake2.TakeError):
+            PyTake2.takeFromName("missing")
+
+    def test_tree(self):
+
+        shot, a, b, c = PyTake2.createTakes([{"name": "shot"},
+                                             {"name": "a", "parent": 0},
+                                             {"name": "b", "parent": 1},
+                                             {"name": "c", "parent": 0}])
+
+        self.assertEqual(PyTake2.ls(name_only=True), ["Main", "shot", "a", "b", "c"])
+        self.assertEqual([t.getName() for t in shot.getChildren()], ["a", "c"])
+        self.assertEqual([t.getName() for t in b.getAncestors()], ["a", "shot"])
+        self.assertEqual(b.getDepth(), 3)
+
+        c.setParent(a)
+        a.setName("a_renamed")
+        self.assertEqual(c.getParent().getName(), "a_renamed")
+
+        # The index matches the scene once read again
+        PyTake2.refresh()
+        self.assertEqual([t.getName() for t in a.getChildren()], ["b", "c"])
+
+        a.remove(recursive=True)
+        self.assertEqual(PyTake2.ls(name_only=True), ["Main", "shot"])
+
+    def test_remove_missing(self):
+
+        take = PyTake2.Take("A")
+        PyTake2.returnToMainTake()
+        hou.hscript("takerm A")
+
+        for recursive in (False, True):
+            with self.assertRaises(PyTake2.TakeDeleteError):
+                take.remove(recursive=recursive)
+
+    def test_identity_map(self):
+
+        take = PyTake2.Take("A", include_node="/obj/geo1")
+        self.assertIs(PyTake2.takeFromName("A"), take)
+
+        _, calls = self.calls(PyTake2.takeFromName, "A")
+        self.assertEqual(calls, 0)
+
+        take.setName("B")
+        self.assertIs(PyTake2.takeFromName("B"), take)
+
+        take.remove()
+        self.assertIsNot(PyTake2.Take("B"), take)
+
+    def test_redundant_switch_skipped(self):
+
+        take = PyTake2.Take("A")
+        take.setCurrent()
+        _, stats = self.profile(take.setCurrent)
+        self.assertEqual(self.commandCount(stats, "takeset"), 0)
+
+    def test_external_switch(self):
+
+        PyTake2.Take("A")
+        PyTake2.returnToMainTake()
+
+        # Switched outside of PyTake2
+        hou.hscript("takeset A")
+        PyTake2.returnToMainTake()
+        self.assertEqual(hou.expandString("$ACTIVETAKE"), "Main")
+
+class CommandBufferTest(_FakeTestCase):
+
+    def test_single_call(self):
+
+        take = PyTake2.Take("A")
+        _, calls = self.calls(take.includeParms, self.geo1.parms())
+        self.assertEqual(calls, 1)
+
+    def test_failing_command_replayed(self):
+
+        hou.hscript("takeadd -p Main A; takeset Main")
+
+        buffer = PyTake2._CommandBuffer()
+        buffer.add("takeset A")
+        buffer.add("takeinclude /obj/geo1 tx", PyTake2.TakeSetError)
+        buffer.add("takeinclude /obj/missing tx", PyTake2.TakeSetError, "missing node")
+        buffer.add("takeinclude /obj/geo1 ty", PyTake2.TakeSetError)
+
+        def flush():
+            with self.assertRaises(PyTake2.TakeSetError) as context:
+                buffer.flush()
+            self.assertEqual(str(context.exception), "missing node")
+
+        # The chunk, then its commands one by one up to the failing one
+        _, calls = self.calls(flush)
+        self.assertEqual(calls, 4)
+
+    def test_not_idempotent_not_replayed(self):
+
+        buffer = PyTake2._CommandBuffer()
+        buffer.add("takeadd -p Main A", PyTake2.TakeCreationError, idempotent=False)
+        buffer.add("takeinclude /obj/missing tx", PyTake2.TakeSetError)
+
+        with self.assertRaises(PyTake2.TakeSetError):
+            buffer.flush()
+
+        # Sent once: the take is not added twice
+        self.assertEqual(hou.hscript("takels")[0].split(), ["Main", "A"])
+
+    def test_chunks(self):
+
+        buffer = PyTake2._CommandBuffer(max_length=100)
+        for i in range(20):
+            buffer.add("echo {0}".format(i))
+
+        output, calls = self.calls(buffer.flush)
+        self.assertEqual(output.split(), [str(i) for i in range(20)])
+        self.assertGreater(calls, 1)
+
+class LazyListTest(_FakeTestCase):
+
+    def setUp(self):
+
+        _FakeTestCase.setUp(self)
+        PyTake2.createTakes([{"name": "shot", "parms": [self.geo1.parm("tx")]}
+                             for i in range(10)] + [{"name": "other"}])
+
+        # Members read again on next access
+        PyTake2.refresh()
+
+    def test_no_read_until_used(self):
+
+        takes, stats = self.profile(PyTake2.ls, lazy=True)
+        self.assertEqual(self.commandCount(stats, "takescript"), 0)
+
+        take, stats = self.profile(next, takes)
+        self.assertEqual(self.commandCount(stats, "takescript"), 0)
+        self.assertEqual(take.getName(), "shot")
+
+        members, stats = self.profile(_members, take)
+        self.assertEqual(self.commandCount(stats, "takescript"), 1)
+        self.assertEqual(members, {"/obj/geo1": (["tx"], [])})
+
+    def test_pattern(self):
+
+        names = [t.getName() for t in PyTake2.ls(pattern="shot* ^shot1", lazy=True)]
+        self.assertEqual(names, ["shot"] + ["shot{0}".format(i) for i in range(2, 10)])
+
+    def test_same_as_ls(self):
+
+        lazy = [(t.getName(), _members(t)) for t in PyTake2.ls(lazy=True)]
+        PyTake2.refresh()
+        self.assertEqual(lazy, [(t.getName(), _members(t)) for t in PyTake2.ls()])
+
+class ReadAllTest(_FakeTestCase):
+
+    def setUp(self):
+
+        _FakeTestCase.setUp(self)
+        specs = [{"name": "shot"}]
+        for i in range(100):
+            specs.append({"name": "var", "parent": 0, "parms": [self.geo1.parm("tx")],
+                          "flags": [(self.geo2, "d")]})
+        specs.append({"name": "other", "parms": [self.geo2.parmTuple("r")]})
+        PyTake2.createTakes(specs)
+
+        PyTake2.refresh()
+
+    def test_read_all(self):
+
+        takes, calls = self.calls(PyTake2.readAll)
+        self.assertEqual(len(takes), 102)
+        self.assertLessEqual(calls, 2)
+
+        by_name = dict((t.getName(), t) for t in takes)
+        self.assertEqual(_members(by_name["var50"]), {"/obj/geo1": (["tx"], []),
+                                                      "/obj/geo2": ([], ["display_flag"])})
+        self.assertEqual(_members(by_name["other"]), {"/obj/geo2": (["rx", "ry", "rz"], [])})
+
+    def test_root(self):
+
+        takes = PyTake2.readAll(root="shot")
+        self.assertEqual([t.getName() for t in takes][:3], ["shot", "var", "var1"])
+        self.assertEqual(len(takes), 101)
+
+        with self.assertRaises(PyTake2.TakeError):
+            PyTake2.readAll(root="missing")
+
+    def test_snapshot(self):
+
+        snapshot = PyTake2.snapshot()
+        self.assertEqual(sorted(snapshot), sorted(PyTake2.ls(name_only=True)[1:]))
+        self.assertEqual(snapshot["var7"].getName(), "var7")
+
+        # Members are already read
+        _, calls = self.calls(_members, snapshot["var7"])
+        self.assertEqual(calls, 0)
+
+class MembersTest(_FakeTestCase):
+
+    def test_include_node_path(self):
+
+        take = PyTake2.Take("A", include_node="/obj/geo1")
+        self.assertEqual(list(take.take_members), ["/obj/geo1"])
+
+        _, calls = self.calls(PyTake2.Take, "B", include_node=["/obj/geo1", self.geo2])
+        self.assertLessEqual(calls, 3)
+
+    def test_include_parms_and_flags(self):
+
+        take = PyTake2.Take("A")
+        take.includeParmsFromNode(self.geo1, "t? ^tz")
+        take.includeDisplayFlag(self.geo2)
+        PyTake2.returnToMainTake()
+
+        self.assertEqual(_members(take), {"/obj/geo1": (["tx", "ty"], []),
+                                          "/obj/geo2": ([], ["display_flag"])})
+
+        # Same members read from the scene
+        PyTake2._invalidateTakes()
+        self.assertEqual(_members(take), {"/obj/geo1": (["tx", "ty"], []),
+                                          "/obj/geo2": ([], ["display_flag"])})
+
+    def test_exclude_node(self):
+
+        take = PyTake2.Take("A", include_node=[self.geo1, self.geo2])
+        _, calls = self.calls(take.includeParmsFromNode, self.geo1, include=False)
+        self.assertLessEqual(calls, 1)
+        PyTake2.returnToMainTake()
+
+        PyTake2._invalidateTakes()
+        self.assertEqual(list(take.take_members), ["/obj/geo2"])
+
+class MemberValuesTest(_FakeTestCase):
+
+    def setUp(self):
+
+        _FakeTestCase.setUp(self)
+        self.a = PyTake2.Take("A")
+        self.a.includeParms(self.geo1.parms())
+        self.a.setParmValues({self.geo1.parm("tx"): 5.0})
+        self.b = PyTake2.Take("B")
+        self.b.setParmValues({self.geo1.parm("tx"): 7.0})
+        PyTake2.returnToMainTake()
+
+        PyTake2._invalidateTakes()
+
+    def test_values_in_member_take(self):
+
+        self.assertEqual(self.a.take_members["/obj/geo1"]["tx"], 5.0)
+        self.assertEqual(self.b.take_members["/obj/geo1"]["tx"], 7.0)
+        self.assertEqual(hou.expandString("$ACTIVETAKE"), "Main")
+
+    def test_single_switch(self):
+
+        member = self.a.take_members["/obj/geo1"]
+        self.assertGreater(len(member), 1)
+
+        for method in ("items", "values", "copy"):
+            PyTake2._invalidateTakes()
+            member = self.a.take_members["/obj/geo1"]
+
+            # To the member's take and back
+            _, stats = self.profile(getattr(member, method))
+            self.assertLessEqual(self.commandCount(stats, "takeset"), 2)
+
+        PyTake2._invalidateTakes()
+        member = self.a.take_members["/obj/geo1"]
+        self.assertEqual(dict(member.items())["tx"], 5.0)
+
+    def test_compare_to_dict(self):
+
+        member = self.a.take_members["/obj/geo1"]
+        values = member.copy()
+
+        PyTake2._invalidateTakes()
+        member = self.a.take_members["/obj/geo1"]
+        _, stats = self.profile(member.__eq__, values)
+        self.assertLessEqual(self.commandCount(stats, "takeset"), 2)
+        self.assertEqual(member, values)
+
+class WedgeTest(_FakeTestCase):
+
+    def value(self, name, parm_name):
+
+        take = PyTake2.takeFromName(name)
+        return take.take_members["/obj/geo1"][parm_name]
+
+    def test_cartesian(self):
+
+        wedge = PyTake2Wedge.Wedge("wedge")
+        wedge.addParm(self.geo1.parm("tx"), values=[0.0, 1.0])
+        wedge.addParm(self.geo1.parm("ty"), start=0.0, end=1.0, steps=3)
+
+        self.assertEqual(len(wedge), 6)
+        self.assertEqual(list(wedge.variants()), [(0.0, 0.0), (0.0, 0.5), (0.0, 1.0),
+                                                  (1.0, 0.0), (1.0, 0.5), (1.0, 1.0)])
+        self.assertEqual(wedge.create(), 6)
+
+        wedge_take = PyTake2.takeFromName("wedge")
+        self.assertEqual([t.getName() for t in wedge_take.getChildren()],
+                         ["wedge_{0:04d}".format(i) for i in range(6)])
+        self.assertEqual(self.value("wedge_0004", "tx"), 1.0)
+        self.assertEqual(self.value("wedge_0004", "ty"), 0.5)
+
+    def test_latin_hypercube(self):
+
+        wedge = PyTake2Wedge.Wedge("lhs", mode=PyTake2Wedge.LATIN_HYPERCUBE,
+                                   samples=10, seed=4)
+        wedge.addParm(self.geo1.parm("tx"), start=0.0, end=10.0)
+        wedge.addParm(self.geo1.parmTuple("r"), start=(0.0, 0.0, 0.0), end=(1.0, 1.0, 1.0))
+
+        variants = list(wedge.variants())
+        self.assertEqual(len(variants), 10)
+
+        # Every stratum sampled once
+        self.assertEqual(sorted(int(tx) for tx, r in variants), list(range(10)))
+        for axis in range(3):
+            self.assertEqual(sorted(int(r[axis] * 10) for tx, r in variants), list(range(10)))
+
+        # Same seed, same variants
+        self.assertEqual(list(wedge.variants()), variants)
+
+        self.assertEqual(wedge.create(), 10)
+        self.assertAlmostEqual(self.value("lhs_0003", "tx"), variants[3][0])
+        self.assertAlmostEqual(self.value("lhs_0003", "ry"), variants[3][1][1])
+
+    def test_list(self):
+
+        wedge = PyTake2Wedge.Wedge("list", mode=PyTake2Wedge.LIST)
+        wedge.addParm(self.geo1.parm("tx"), values=[1.0, 2.0, 3.0])
+        wedge.addParm(self.geo1.parm("ty"), values=[4.0, 5.0, 6.0])
+        self.assertEqual(list(wedge.variants()), [(1.0, 4.0), (2.0, 5.0), (3.0, 6.0)])
+
+        with self.assertRaises(PyTake2Wedge.WedgeError):
+            wedge.addParm(self.geo1.parm("tz"), values=[1.0])
+
+        self.assertEqual(wedge.create(), 3)
+        self.assertEqual(self.value("list_0002", "ty"), 6.0)
+
+    def test_chunks(self):
+
+        wedge = PyTake2Wedge.Wedge("wedge", chunk_size=10)
+        wedge.addParm(self.geo1.parm("tx"), start=0.0, end=1.0, steps=25)
+
+        progress = []
+        self.assertEqual(wedge.create(progress=lambda done, total: progress.append(done)), 25)
+        self.assertEqual(progress, [10, 20, 25])
+        self.assertEqual(len(PyTake2.takeFromName("wedge").getChildren()), 25)
+
+    def test_resume(self):
+
+        wedge = PyTake2Wedge.Wedge("wedge", chunk_size=10)
+        wedge.addParm(self.geo1.parm("tx"), start=0.0, end=1.0, steps=25)
+
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(done, total):
+            raise Interrupted()
+
+        with self.assertRaises(Interrupted):
+            wedge.create(progress=interrupt)
+        self.assertEqual(len(PyTake2.takeFromName("wedge").getChildren()), 10)
+
+        # Only the missing variants are created
+        self.assertEqual(wedge.create(), 15)
+        children = PyTake2.takeFromName("wedge").getChildren()
+        self.assertEqual([t.getName() for t in children],
+                         ["wedge_{0:04d}".format(i) for i in range(25)])
+        self.assertEqual(self.value("wedge_0024", "tx"), 1.0)
+
+        # Without resume, a new wedge
+        self.assertEqual(wedge.create(resume=False), 25)
+        self.assertIn("wedge1", PyTake2.ls(name_only=True))
+
+class PatternTest(_FakeTestCase):
+
+    names = ["tx", "ty", "tz", "rx", "scale", "shot", "shot1", "shot12", "Shot2",
+             "a_b", "t", ""]
+
+    patterns = ["*", "t?", "t* ^tz", "^tz t*", "t* ^t? tz", "shot* ^shot1*", "shot? ^*1",
+                "[rt]x", "s*e", "*_*", "^*", "", "shot* ^shot1 shot1"]
+
+    def test_same_as_hou(self):
+
+        for pattern in self.patterns:
+            matcher = PyTake2.PatternMatcher(pattern)
+            for name in self.names:
+                self.assertEqual(matcher.match(name), bool(hou.patternMatch(pattern, name)),
+                                 "{0!r} {1!r}".format(pattern, name))
+
+    def test_ignore_case(self):
+
+        matcher = PyTake2.PatternMatcher("SHOT* ^shot1", ignore_case=True)
+        for name in self.names:
+            self.assertEqual(matcher.match(name),
+                             bool(hou.patternMatch("SHOT* ^shot1", name, ignore_case=True)))
+
+    def test_pattern_list(self):
+
+        # A name matches if any pattern matches
+        patterns = ["t* ^tz", "s*", "^rx"]
+        matcher = PyTake2.PatternMatcher(patterns)
+        for name in self.names:
+            self.assertEqual(matcher.match(name),
+                             any([hou.patternMatch(p, name) for p in patterns]))
+
+        self.assertEqual(matcher.filter(["tx", "tz", "rx", "scale"]), ["tx", "scale"])
+
+    def test_match_parms(self):
+
+        def expected(node):
+            return [p.name() for p in node.parms() if hou.patternMatch("t* ^tz", p.name())]
+
+        names = [p.name() for p in PyTake2._matchParms(self.geo1, "t* ^tz")]
+        self.assertIn("tx", names)
+        self.assertEqual(names, expected(self.geo1))
+
+        # Matches cached per node type, spare parameters are matched as well
+        self.geo2.addParmTuple("tw", (0.0,))
+        names = [p.name() for p in PyTake2._matchParms(self.geo2, "t* ^tz")]
+        self.assertIn("tw", names)
+        self.assertEqual(names, expected(self.geo2))
+
+class BatchTest(_FakeTestCase):
+
+    def test_single_round_trip(self):
+
+        def edit():
+            with PyTake2.batch():
+                for i in range(50):
+                    take = PyTake2.Take("shot")
+                    take.includeParms([self.geo1.parm("tx")])
+                    take.includeDisplayFlag(self.geo2)
+
+        _, calls = self.calls(edit)
+        self.assertLessEqual(calls, 2)
+        self.assertEqual(len(PyTake2.ls(name_only=True)), 51)
+
+    def test_single_undo(self):
+
+        with PyTake2.batch():
+            for i in range(5):
+                PyTake2.Take("shot").includeParms([self.geo1.parm("tx")])
+
+        hou.undos.performUndo()
+        self.assertEqual(hou.hscript("takels")[0].split(), ["Main"])
+
+    def test_rollback(self):
+
+        with hou.undos.group("user edit"):
+            self.geo1.parm("ty").set(9.0)
+
+        with self.assertRaises(PyTake2.TakeError):
+            with PyTake2.batch():
+                PyTake2.Take("A")
+                PyTake2._hscript("takeinclude /obj/missing tx")
+
+        self.assertEqual(PyTake2.ls(name_only=True), ["Main"])
+        self.assertEqual(self.geo1.parm("ty").eval(), 9.0)
+
+        # The first command fails: the previous undo entry is kept
+        with self.assertRaises(PyTake2.TakeError):
+            with PyTake2.batch():
+                PyTake2._hscript("takeinclude /obj/missing tx")
+
+        self.assertEqual(self.geo1.parm("ty").eval(), 9.0)
+        self.assertEqual(hou.undos.undoLabels()[0], "user edit")
+
+    def test_take_from_file(self):
+
+        take = PyTake2.Take("A", include_parm=self.geo1.parm("tx"))
+        file_path = os.path.join(self.directory, "a.take")
+        take.saveToFile(file_path)
+
+        with self.assertRaises(PyTake2.TakeError):
+            with PyTake2.batch():
+                PyTake2.takeFromFile(file_path)
+
+        loaded = PyTake2.takeFromFile(file_path)
+        self.assertEqual(_members(loaded), {"/obj/geo1": (["tx"], [])})
+
+class CopyTest(_FakeTestCase):
+
+    def test_copy_recursive(self):
+
+        template = PyTake2.Take("tpl", include_node="/obj/geo1")
+        template.includeDisplayFlag(self.geo2)
+        PyTake2.Take("child", parent=template, include_parm=self.geo2.parm("tx"))
+        PyTake2.returnToMainTake()
+
+        copies, calls = self.calls(template.copy, name="var", recursive=True, count=10)
+        self.assertEqual(len(copies), 10)
+        self.assertLessEqual(calls, 4)
+
+        PyTake2._invalidateTakes()
+        copy = PyTake2.takeFromName("var3")
+        self.assertEqual(_members(copy), _members(template))
+        self.assertEqual(_members(copy.getChildren()[0]), {"/obj/geo2": (["tx"], [])})
+
+class DiffTest(_FakeTestCase):
+
+    def test_diff_and_sync(self):
+
+        template, take = PyTake2.createTakes([
+            {"name": "tpl", "parms": [self.geo1.parmTuple("t")], "flags": [(self.geo1, "d")]},
+            {"name": "a", "parms": [self.geo1.parm("tx"), self.geo1.parm("scale")]}])
+
+        diff = take.diff(template)
+        self.assertEqual(sorted(diff.added["/obj/geo1"].keys()),
+                         ["display_flag", "ty", "tz"])
+        self.assertEqual(diff.removed["/obj/geo1"].keys(), ["scale"])
+
+        take.sync(template)
+        self.assertTrue(take.diff("tpl").isEmpty())
+
+        PyTake2._invalidateTakes()
+        self.assertEqual(_members(take), _members(template))
+
+    def test_sync_takes(self):
+
+        takes = PyTake2.createTakes([{"name": "s", "parms": [self.geo1.parm("tx")]}
+                                     for i in range(20)])
+
+        diffs, calls = self.calls(PyTake2.syncTakes, takes, {"/obj/geo1": ["ty"]})
+        self.assertEqual(len(diffs), 20)
+        self.assertLessEqual(calls, 3)
+
+        PyTake2._invalidateTakes()
+        self.assertEqual(_members(takes[5]), {"/obj/geo1": (["ty"], [])})
+
+class ExportTest(_FakeTestCase):
+
+    def test_round_trip(self):
+
+        PyTake2.createTakes([{"name": "shot"},
+                             {"name": "a", "parent": 0,
+                              "values": [(self.geo1.parm("tx"), 2.5)],
+                              "flags": [(self.geo1, "d", False)]},
+                             {"name": "b", "parent": 1,
+                              "parms": [self.geo1.parmTuple("r")]}])
+
+        file_path = os.path.join(self.directory, "takes.jsonl")
+        self.assertEqual(PyTake2.exportTakes(file_path, values=True), 3)
+
+        takes = PyTake2.importTakes(file_path)
+        self.assertEqual([t.getName() for t in takes], ["shot1", "a1", "b1"])
+        self.assertIsNone(takes[0].getParent())
+        self.assertEqual([t.getParent().getName() for t in takes[1:]], ["shot1", "a1"])
+
+        with PyTake2.activeTake("a1"):
+            self.assertEqual(self.geo1.parm("tx").eval(), 2.5)
+            self.assertFalse(self.geo1.isDisplayFlagSet())
+        self.assertTrue(self.geo1.isDisplayFlagSet())
+
+    def test_unevaluated_values(self):
+
+        self.geo1.addParmTuple("file", ("",))
+        take = PyTake2.Take("A")
+        take.setParmValues([(self.geo1.parm("tx"), {"expression": "1 + 2",
+                                                     "language": "Python"}),
+                            (self.geo1.parm("file"), "$HIP/tex.png")])
+        PyTake2.returnToMainTake()
+
+        values = take.toDict(values=True)["members"]["/obj/geo1"]["values"]
+        self.assertEqual(values["tx"], {"expression": "1 + 2", "language": "Python"})
+        self.assertEqual(values["file"], "$HIP/tex.png")
+
+        file_path = os.path.join(self.directory, "takes.jsonl")
+        PyTake2.exportTakes(file_path, values=True)
+        imported = PyTake2.importTakes(file_path)[0]
+
+        with PyTake2.activeTake(imported):
+            self.assertEqual(self.geo1.parm("tx").expression(), "1 + 2")
+            self.assertEqual(self.geo1.parm("tx").eval(), 3.0)
+            self.assertEqual(self.geo1.parm("file").unexpandedString(), "$HIP/tex.png")
+
+    def test_ramp(self):
+
+        self.geo1.addParmTuple("ramp", (hou.Ramp(("linear",), (0.0, 1.0), (0.0, 1.0)),))
+        take = PyTake2.Take("A", include_parm=self.geo1.parm("ramp"))
+
+        self.assertEqual(json.loads(json.dumps(take.toDict()))["name"], "A")
+        with self.assertRaises(PyTake2.TakeError):
+            take.toDict(values=True)
+
+class CacheTest(_FakeTestCase):
+
+    def setUp(self):
+
+        _FakeTestCase.setUp(self)
+        PyTake2.createTakes([{"name": "t", "parms": [self.geo1.parm("tx")],
+                              "flags": [(self.geo2, "d")]} for i in range(10)])
+        self.hip_path = os.path.join(self.directory, "scene.hip")
+        hou.hipFile.save(self.hip_path)
+
+        self.cache = PyTake2Cache.TakeCache(os.path.join(self.directory, "cache"))
+
+    def test_warm_load(self):
+
+        self.assertEqual(len(self.cache.readAll()), 10)
+        self.assertFalse(self.cache.stats["hit"])
+
+        hou.hipFile.load(self.hip_path)
+        takes, stats = self.profile(self.cache.readAll)
+        self.assertTrue(self.cache.stats["hit"])
+        self.assertEqual(self.commandCount(stats, "takescript"), 0)
+
+        self.assertEqual(len(takes), 10)
+        self.assertEqual(_members(takes[3]), {"/obj/geo1": (["tx"], []),
+                                              "/obj/geo2": ([], ["display_flag"])})
+
+    def test_changed_take(self):
+
+        self.cache.readAll()
+        PyTake2.takeFromName("t3").includeParms([self.geo1.parm("ty")])
+        hou.hipFile.save(self.hip_path)
+
+        takes, stats = self.profile(self.cache.readAll)
+        self.assertEqual(self.commandCount(stats, "takescript"), 10)
+        self.assertEqual(self.cache.stats["parsed"], 1)
+        self.assertEqual(self.cache.stats["reused"], 9)
+        self.assertEqual(_members(takes[3])["/obj/geo1"], (["tx", "ty"], []))
+
+    def test_eviction(self):
+
+        cache = PyTake2Cache.TakeCache(self.cache.directory, max_entries=1)
+        cache.readAll()
+
+        hou.hipFile.save(os.path.join(self.directory, "other.hip"))
+        cache.readAll()
+
+        entries = [f for f in os.listdir(cache.directory) if f.endswith(".jsonl")]
+        self.assertEqual(len(entries), 1)
+
+    def test_lock_timeout(self):
+
+        # A file in place of the cache folder, the lock file can not be created
+        file_path = os.path.join(self.directory, "file")
+        open(file_path, "w").close()
+        lock = PyTake2Cache._FileLock(os.path.join(file_path, "index.lock"))
+
+        timeout = PyTake2Cache.LOCK_TIMEOUT
+        PyTake2Cache.LOCK_TIMEOUT = 0.1
+        try:
+            with self.assertRaises(OSError):
+                with lock:
+                    pass
+        finally:
+            PyTake2Cache.LOCK_TIMEOUT = timeout
+
+class ExtractTest(_FakeTestCase):
+
+    def setUp(self):
+
+        _FakeTestCase.setUp(self)
+
+        self.hip_files = []
+        for i in range(3):
+            _scene()
+            PyTake2.createTakes([{"name": "shot", "parms": [hou.parm("/obj/geo1/tx")]}
+                                 for j in range(i + 1)])
+            hip_path = os.path.join(self.directory, "scene{0}.hip".format(i))
+            hou.hipFile.save(hip_path)
+            self.hip_files.append(hip_path)
+
+        self.hip_files.append(os.path.join(self.directory, "missing.hip"))
+
+    def check(self, records):
+
+        records = dict((r["hip"], r) for r in records)
+        self.assertEqual(sorted(records), sorted(self.hip_files))
+
+        for i, hip_path in enumerate(self.hip_files[:3]):
+            record = records[hip_path]
+            self.assertTrue(record["ok"])
+            self.assertEqual(len(record["takes"]), i + 1)
+            self.assertEqual(record["takes"][0]["name"], "shot")
+
+        missing = records[self.hip_files[3]]
+        self.assertFalse(missing["ok"])
+        self.assertIn("error", missing)
+
+    def test_current_process(self):
+
+        self.check(PyTake2Extract.extract(self.hip_files, workers=0, fake=True))
+
+    def test_workers(self):
+
+        self.check(PyTake2Extract.extract(self.hip_files, workers=2, fake=True,
+                                          files_per_worker=1))
+
+    def test_timeout(self):
+
+        records = list(PyTake2Extract.extract(self.hip_files[:1], workers=1, fake=True,
+                                              latency=1.0, timeout=0.2))
+        self.assertEqual(len(records), 1)
+        self.assertFalse(records[0]["ok"])
+        self.assertTrue(records[0]["error"].startswith("WorkerError"))
+
+class EventsTest(_FakeTestCase):
+
+    def setUp(self):
+
+        _FakeTestCase.setUp(self)
+        self.events = []
+        PyTake2.subscribe(self.onEvent)
+
+    def tearDown(self):
+
+        PyTake2.unsubscribe(self.onEvent)
+        _FakeTestCase.tearDown(self)
+
+    def onEvent(self, event, take_names):
+
+        self.events.append((event, take_names))
+
+    def test_node_deleted(self):
+
+        take = PyTake2.Take("A", include_node=["/obj/geo1", "/obj/geo2"])
+        PyTake2.returnToMainTake()
+        take.take_members
+
+        self.geo2.destroy()
+        self.assertEqual(self.events, [(PyTake2.TAKE_CHANGED, ["A"])])
+        self.assertEqual(list(take.take_members), ["/obj/geo1"])
+
+    def test_check_scene(self):
+
+        PyTake2.Take("A")
+        PyTake2.returnToMainTake()
+        self.assertEqual(PyTake2.checkScene(), [])
+
+        # Edited outside of PyTake2
+        hou.hscript("takeadd -p Main B")
+        hou.hscript("takeset A; takeinclude /obj/geo1 tx; takeset Main")
+        self.assertEqual(PyTake2.checkScene(), [PyTake2.TREE_CHANGED, PyTake2.TAKE_CHANGED])
+        self.assertIn("A", self.events[-1][1])
+        self.assertEqual(PyTake2.ls(name_only=True), ["Main", "A", "B"])
+
+    def test_scene_replaced(self):
+
+        take = PyTake2.Take("A", include_node="/obj/geo1")
+        take.take_members
+
+        hou.hipFile.clear()
+        self.assertEqual(self.events, [(PyTake2.SCENE_REPLACED, [])])
+        self.assertEqual(PyTake2.ls(name_only=True), ["Main"])
+        self.assertEqual(PyTake2._events.nodes, {})
+
+    def test_callbacks_removed(self):
+
+        def callbacks(node):
+            return [c for _, c in node.eventCallbacks() if c.__name__ == "_onNodeEvent"]
+
+        take = PyTake2.Take("A", include_node="/obj/geo1")
+        take.take_members
+        self.assertEqual(len(callbacks(self.geo1)), 1)
+
+        take.remove()
+        self.assertEqual(callbacks(self.geo1), [])
+
+    def test_own_edits_not_published(self):
+
+        PyTake2.checkScene()
+
+        a = PyTake2.Take("A", include_node="/obj/geo1")
+        a.includeParms([self.geo1.parm("tx")], include=False)
+        a.includeDisplayFlag(self.geo2)
+        a.setParmValues({self.geo1.parm("ty"): 2.0})
+        b, c = PyTake2.createTakes([{"name": "B", "parms": [self.geo2.parm("tx")]},
+                                    {"name": "C", "parent": 0}])
+        copies = a.copy(name="D", count=2)
+        c.setParent(a)
+        b.setName("E")
+        copies[0].remove()
+        with PyTake2.batch():
+            PyTake2.Take("F").includeParms([self.geo1.parm("tz")])
+        PyTake2.returnToMainTake()
+
+        self.assertEqual(PyTake2.checkScene(), [])
+        self.assertEqual(self.events, [])
+
+        # Changes made outside of PyTake2 after them are published
+        hou.hscript("takeset A; takeinclude /obj/geo2 ty; takeset Main")
+        self.assertEqual(PyTake2.checkScene(), [PyTake2.TAKE_CHANGED])
+        self.assertEqual(self.events, [(PyTake2.TAKE_CHANGED, ["A"])])
+
+    def test_nodes_watched_once(self):
+
+        node_class = type(self.geo1)
+        add_callback = node_class.addEventCallback
+        added = []
+
+        def addEventCallback(node, *args):
+            added.append(node.path())
+            return add_callback(node, *args)
+
+        take = PyTake2.Take("A", include_node="/obj/geo1")
+        PyTake2.returnToMainTake()
+
+        node_class.addEventCallback = addEventCallback
+        try:
+            for i in range(5):
+                PyTake2._invalidateTakes()
+                take.take_members
+                PyTake2.readAll()
+        finally:
+            node_class.addEventCallback = add_callback
+
+        self.assertEqual(added, [])
+        self.assertEqual(len(self.geo1.eventCallbacks()), 1)
+
+if __name__ == "__main__":
+
+    unittest.main()
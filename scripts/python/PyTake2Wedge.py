@@ -0,0 +1,254 @@
+import itertools
+import random
+
+import PyTake2
+
+#
+# Parameter wedges built on PyTake2 takes:
+#
+#     wedge = PyTake2Wedge.Wedge("wedge")
+#     wedge.addParm(hou.parm("/obj/geo1/tx"), values=[0.0, 0.5, 1.0])
+#     wedge.addParm(hou.parm("/obj/geo1/ty"), start=0.0, end=1.0, steps=5)
+#     wedge.create(progress=lambda done, total: ...)
+#
+# A take "wedge" is created with one child take per variant ( "wedge_0000",
+# "wedge_0001" ... ), each including the wedged parameters set to the variant's
+# values. Variants are generated lazily and created by chunks of batched hscript
+# calls, so memory use doesn't grow with the size of the wedge.
+# Calling create() again resumes a partially created wedge.
+#
+
+# Variants generation modes
+CARTESIAN = "cartesian"
+LATIN_HYPERCUBE = "latin_hypercube"
+LIST = "list"
+
+class Wedge(object):
+    '''
+        A parameter wedge.
+        name: (str) Name of the wedge's root take, variants are named name_0000, name_0001 ...
+        parent: (Take or str) Parent of the root take, if empty, parent take will be current take.
+        mode: (str) How variants are built from the parameters' values:
+                    CARTESIAN: every combination of the values.
+                    LATIN_HYPERCUBE: "samples" variants, each parameter's range is split in
+                                     "samples" strata which are all sampled once.
+                    LIST: the n-th variant uses the n-th value of every parameter.
+        samples: (int) Number of variants of a LATIN_HYPERCUBE wedge.
+        seed: (int) Random seed of a LATIN_HYPERCUBE wedge, the same seed gives the same variants.
+        chunk_size: (int) Number of takes created by each batch.
+    '''
+
+    def __init__(self, name="wedge", parent="", mode=CARTESIAN, samples=0,
+                 seed=0, chunk_size=500):
+
+        if not mode in (CARTESIAN, LATIN_HYPERCUBE, LIST):
+            raise WedgeError("Unknown wedge mode: " + str(mode))
+
+        if mode == LATIN_HYPERCUBE and samples < 1:
+            raise WedgeError("A latin hypercube wedge needs a number of samples.")
+
+        if isinstance(parent, PyTake2.Take):
+            parent = parent.getName()
+
+        self.name = PyTake2._checkName(name)
+        self.parent = parent
+        self.mode = mode
+        self.samples = samples
+        self.seed = seed
+        self.chunk_size = max(1, chunk_size)
+
+        # [(parm, values or None, (start, end) or None)]
+        self.parms = []
+
+    def addParm(self, parm, values=None, start=None, end=None, steps=None):
+        '''
+            Add a parameter ( hou.Parm, or hou.ParmTuple with tuples of values ) to the wedge.
+            values: (list) Values of the parameter.
+            start, end, steps: Range of the parameter, "steps" values from start to end,
+                               a LATIN_HYPERCUBE wedge samples the range without steps.
+        '''
+        if values is None and (start is None or end is None):
+            raise WedgeError("Parameter {0}: values or start and end are needed.".format(parm.path()))
+
+        if values is not None:
+            values = list(values)
+            if not values:
+                raise WedgeError("Parameter {0}: no values.".format(parm.path()))
+            parm_range = None
+
+        else:
+            parm_range = (start, end)
+            if self.mode != LATIN_HYPERCUBE:
+                if not steps or steps < 1:
+                    raise WedgeError("Parameter {0}: steps are needed.".format(parm.path()))
+                values = [_lerp(start, end, _ratio(i, steps)) for i in range(steps)]
+
+        if self.mode == LIST and self.parms and len(values) != len(self.parms[0][1]):
+            raise WedgeError("Parameter {0}: a list wedge needs the same number of "
+                             "values for all its parameters.".format(parm.path()))
+
+        self.parms.append((parm, values, parm_range))
+
+    def __len__(self):
+
+        if not self.parms:
+            return 0
+
+        if self.mode == LATIN_HYPERCUBE:
+            return self.samples
+
+        if self.mode == LIST:
+            return len(self.parms[0][1])
+
+        count = 1
+        for _, values, _ in self.parms:
+            count *= len(values)
+        return count
+
+    def variants(self):
+        '''
+            Generator of the wedge's variants, as tuples of values ( same order as
+            the parameters ).
+        '''
+        if not self.parms:
+            return iter([])
+
+        if self.mode == CARTESIAN:
+            return itertools.product(*[values for _, values, _ in self.parms])
+
+        if self.mode == LIST:
+            return zip(*[values for _, values, _ in self.parms])
+
+        return self._latinHypercube()
+
+    def _latinHypercube(self):
+
+        rng = random.Random(self.seed)
+        count = self.samples
+
+        # One shuffled list of strata per dimension, the components of
+        # a parm tuple's range are sampled independently.
+        strata = []
+        for parm, values, parm_range in self.parms:
+            dimensions = 1
+            if parm_range is not None and hasattr(parm_range[0], "__iter__"):
+                dimensions = len(parm_range[0])
+
+            orders = []
+            for _ in range(dimensions):
+                order = list(range(count))
+                rng.shuffle(order)
+                orders.append(order)
+            strata.append(orders)
+
+        for i in range(count):
+            variant = []
+            for (parm, values, parm_range), orders in zip(self.parms, strata):
+                samples = [(order[i] + rng.random()) / count for order in orders]
+
+                if parm_range is None:
+                    u = samples[0]
+                    variant.append(values[min(int(u * len(values)), len(values) - 1)])
+
+                elif hasattr(parm_range[0], "__iter__"):
+                    variant.append(tuple(_lerp(s, e, u) for s, e, u
+                                         in zip(parm_range[0], parm_range[1], samples)))
+
+                else:
+                    variant.append(_lerp(parm_range[0], parm_range[1], samples[0]))
+
+            yield tuple(variant)
+
+    def takeName(self, index, root=None):
+        '''
+            Return the name of the index-th variant's take.
+        '''
+        width = max(4, len(str(len(self) - 1)))
+        return "{0}_{1}".format(root or self.name, str(index).zfill(width))
+
+    def create(self, progress=None, resume=True):
+        '''
+            Create the takes of the wedge, return the number of takes created.
+            progress: (callable) Called after each chunk with ( number of variants done, total ).
+            resume: (bool) If the root take already exists, only the missing variants are
+                           created. If set to False, a new root take is created.
+        '''
+        total = len(self)
+        existing = set(PyTake2.ls(name_only=True))
+
+        if resume and self.name in existing:
+            root = self.name
+        else:
+            root = PyTake2.createTakes([{"name": self.name, "parent": self.parent}])[0].getName()
+            existing = set()
+
+        # The last take created before an interruption may be incomplete,
+        # its values are set again.
+        last_existing = None
+        if existing:
+            for i in range(total - 1, -1, -1):
+                if self.takeName(i, root) in existing:
+                    last_existing = i
+                    break
+
+        created = 0
+        done = 0
+        specs = []
+
+        for i, variant in enumerate(self.variants()):
+
+            name = self.takeName(i, root)
+            values = [(parm, value) for (parm, _, _), value in zip(self.parms, variant)]
+
+            if name in existing:
+                if i == last_existing:
+                    PyTake2._takeProxy(name).setParmValues(values)
+                done += 1
+                continue
+
+            specs.append({"name": name, "parent": root, "values": values})
+
+            if len(specs) >= self.chunk_size:
+                created += self._createChunk(specs)
+                done += len(specs)
+                specs = []
+                if progress is not None:
+                    progress(done, total)
+
+        if specs:
+            created += self._createChunk(specs)
+            done += len(specs)
+
+        if progress is not None:
+            progress(done, total)
+
+        return created
+
+    def _createChunk(self, specs):
+
+        takes = PyTake2.createTakes(specs)
+
+        for spec, take in zip(specs, takes):
+            if take.getName() != spec["name"]:
+                raise WedgeError("Take {0} was created as {1}, the name is "
+                                 "already used.".format(spec["name"], take.getName()))
+
+        return len(takes)
+
+def _ratio(i, steps):
+
+    if steps == 1:
+        return 0.0
+    return float(i) / (steps - 1)
+
+def _lerp(start, end, u):
+    '''
+        Interpolate numbers or tuples of numbers.
+    '''
+    if hasattr(start, "__iter__"):
+        return tuple(_lerp(s, e, u) for s, e in zip(start, end))
+
+    return start + (end - start) * u
+
+class WedgeError(PyTake2.TakeError):
+    pass